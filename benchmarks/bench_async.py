@@ -0,0 +1,153 @@
+# benchmarks/bench_async.py
+# Concurrent-request throughput and latency of the read endpoints served three ways:
+# gunicorn sync workers (build.sh), uvicorn with the sync DRF views, and uvicorn with the
+# async views from library/async_views.py (build_asgi.sh). Each server runs as a subprocess
+# against a seeded throwaway SQLite database.
+# To run paste in terminal: python -m benchmarks.bench_async --workers 2 --concurrency 32 --requests 2000
+import argparse
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+from .harness import BASE_DIR, Timer, fake_book, print_table, scratch_database, setup_django
+
+setup_django()
+
+from django.contrib.auth.models import User
+from django.db import connection
+from rest_framework_simplejwt.tokens import RefreshToken
+from library import stats
+from library.models import Book, Loan
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(kind, port, workers, database):
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{database}",
+        "DB_CONN_MAX_AGE": "0" if kind == "uvicorn" else "600",
+        "LIBRARY_CATALOG_CACHE": "false",  # Measure the views, not the response cache
+    }
+    if kind == "gunicorn":
+        command = [
+            sys.executable, "-m", "gunicorn", "library_main.wsgi:application",
+            "--workers", str(workers), "--bind", f"127.0.0.1:{port}", "--log-level", "warning",
+        ]
+    else:
+        command = [
+            sys.executable, "-m", "uvicorn", "library_main.asgi:application",
+            "--workers", str(workers), "--host", "127.0.0.1", "--port", str(port),
+            "--lifespan", "off", "--no-access-log", "--log-level", "warning",
+        ]
+    process = subprocess.Popen(command, cwd=BASE_DIR, env=env)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/api/library/async/books/?page_size=1")
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"{kind} did not start")
+
+
+async def fetch(port, path, headers):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    lines = [f"GET {path} HTTP/1.1", "Host: localhost", "Connection: close"]
+    lines += [f"{name}: {value}" for name, value in headers.items()]
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode())
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    return int(response.split(b" ", 2)[1])
+
+
+async def load(port, paths, headers, requests, concurrency):
+    timer, errors = Timer(), 0
+    queue = iter(range(requests))
+
+    async def client():
+        nonlocal errors
+        for number in queue:
+            path = paths[number % len(paths)]
+            start = time.perf_counter()
+            try:
+                status = await fetch(port, path, headers)
+            except OSError:
+                status = 0
+            timer.samples.append(time.perf_counter() - start)
+            errors += status != 200
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return timer, errors, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--books", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    with scratch_database():
+        Book.objects.bulk_create(
+            (Book(**fake_book(rng, i)) for i in range(args.books)), batch_size=2000
+        )
+        admin = User.objects.create_user(username="bench", password="bench", is_staff=True)
+        book_ids = list(Book.objects.values_list("id", flat=True)[:100])
+        Loan.objects.bulk_create(Loan(user=admin, book_id=rng.choice(book_ids), type=1) for _ in range(200))
+        stats.rebuild()
+        database = connection.settings_dict["NAME"]
+        headers = {"Authorization": f"Bearer {RefreshToken.for_user(admin).access_token}"}
+        reads = ["books/?page_size=20", *(f"books/{book_id}/" for book_id in book_ids[:10]),
+                 "loans/?page_size=20", "admin-dashboard/"]
+
+        setups = [
+            ("gunicorn sync", "gunicorn", ""),
+            ("uvicorn + sync views", "uvicorn", ""),
+            ("uvicorn + async views", "uvicorn", "async/"),
+        ]
+        rows = []
+        for label, kind, prefix in setups:
+            port = free_port()
+            process = start_server(kind, port, args.workers, database)
+            try:
+                paths = [f"/api/library/{prefix}{path}" for path in reads]
+                asyncio.run(load(port, paths, headers, min(100, args.requests), args.concurrency))  # Warm up
+                timer, errors, elapsed = asyncio.run(
+                    load(port, paths, headers, args.requests, args.concurrency)
+                )
+            finally:
+                process.terminate()
+                process.wait()
+            summary = timer.summary()
+            rows.append({
+                "server": label,
+                "req_per_s": args.requests / elapsed,
+                "p50_ms": summary["p50_ms"],
+                "p99_ms": summary["p99_ms"],
+                "errors": errors,
+            })
+        print_table(
+            f"{args.requests:,} reads, {args.concurrency} concurrent, {args.workers} worker(s) "
+            f"per server, {os.cpu_count()} CPU(s)",
+            rows,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# benchmarks/bench_auth.py
+# Queries and latency per authenticated loan request with the stock JWTAuthentication
+# (one `auth_user` SELECT per request) and with ClaimsJWTAuthentication (cached flags).
+# To run paste in terminal: python -m benchmarks.bench_auth --requests 300
+import argparse
+import contextlib
+from unittest import mock
+
+from .harness import Timer, print_table, scratch_database, setup_django
+
+setup_django()
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import Client
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import RefreshToken
+from library import authentication, summaries
+from library.authentication import ClaimsJWTAuthentication
+from library.models import Book, Loan
+
+
+class QueryLog:
+    """Records SQL through an execute wrapper; survives the per-request query log reset."""
+
+    def __init__(self):
+        self.sql = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.sql.append(sql)
+        return execute(sql, params, many, context)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=300)
+    args = parser.parse_args()
+
+    with scratch_database():
+        user = User.objects.create_user(username="bench", password="bench")
+        book = Book.objects.create(
+            name="Bench", author="Author", year_published=2000, category="Action",
+            inventory=args.requests * 4,
+        )
+        # Enough loans to list, and fewer than LIBRARY_MAX_ACTIVE_LOANS so borrows are admitted
+        Loan.objects.bulk_create(Loan(user=user, book=book, type=1) for _ in range(10))
+        summaries.rebuild()  # bulk_create skips the signals that keep the loan summary
+        token = RefreshToken.for_user(user).access_token
+        client = Client(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+        def borrow_and_return():
+            loan_id = client.post(f"/api/library/borrow_book/{book.id}/").json()["loan_id"]
+            client.post(f"/api/library/return_book/{loan_id}/")
+
+        endpoints = {
+            "GET /loans/": lambda: client.get("/api/library/loans/"),
+            "POST borrow_book + return_book": borrow_and_return,
+        }
+        modes = {
+            "JWTAuthentication (stock)": mock.patch.object(
+                ClaimsJWTAuthentication, "get_user", JWTAuthentication.get_user
+            ),
+            "ClaimsJWTAuthentication": contextlib.nullcontext(),
+        }
+
+        rows = []
+        for endpoint, run in endpoints.items():
+            for mode, patch in modes.items():
+                with patch:
+                    authentication.clear_cache()
+                    run()  # Warm up
+                    queries = QueryLog()
+                    with connection.execute_wrapper(queries):
+                        run()
+                    timer = Timer()
+                    for _ in range(args.requests):
+                        with timer.measure():
+                            run()
+                summary = timer.summary()
+                rows.append({
+                    "endpoint": endpoint,
+                    "auth": mode,
+                    "queries": len(queries.sql),
+                    "user_queries": sum('FROM "auth_user"' in sql for sql in queries.sql),
+                    "mean_ms": summary["mean_ms"],
+                    "p95_ms": summary["p95_ms"],
+                })
+        print_table("Authenticated loan requests", rows)
+
+
+if __name__ == "__main__":
+    main()
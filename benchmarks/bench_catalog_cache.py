@@ -0,0 +1,74 @@
+# benchmarks/bench_catalog_cache.py
+# Compares catalog reads with the response cache off, served from the cache, and revalidated
+# with If-None-Match (304), plus a read/write mix where borrows keep invalidating the cache.
+# To run paste in terminal: python -m benchmarks.bench_catalog_cache --books 20000 --requests 500
+import argparse
+import random
+
+from .harness import Timer, fake_book, print_table, scratch_database, setup_django
+
+setup_django()
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import Client, override_settings
+from library import inventory
+from library.models import Book
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--books", type=int, default=20000)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--write-every", type=int, default=20, help="Borrows per N reads in the mix")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    with scratch_database():
+        Book.objects.bulk_create(
+            (Book(**fake_book(rng, i)) for i in range(args.books)), batch_size=2000
+        )
+        user = User.objects.create_user(username="bench", password="bench")
+        book_ids = list(Book.objects.filter(inventory__gt=0).values_list("id", flat=True)[:200])
+        # A small set of hot URLs, as a storefront would see: first pages and popular books
+        urls = ["/api/library/books/", "/api/library/books/?ordering=-year_published"]
+        urls += [f"/api/library/books/{book_id}/" for book_id in book_ids[:20]]
+        plan = [rng.choice(urls) for _ in range(args.requests)]
+        client = Client()
+
+        def run(label, send):
+            cache.clear()
+            etags = {}
+            for url in urls:  # Warm up
+                etags[url] = client.get(url)["ETag"] if label != "cache off" else None
+            timer, statuses = Timer(), {}
+            for number, url in enumerate(plan, 1):
+                with timer.measure():
+                    response = send(url, etags)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+                if response.has_header("ETag"):
+                    etags[url] = response["ETag"]
+                if label == "read/write mix" and number % args.write_every == 0:
+                    inventory.put_back_copy(inventory.borrow(user, rng.choice(book_ids)).book_id)
+            status_mix = ", ".join(f"{code}: {count}" for code, count in sorted(statuses.items()))
+            return {"path": label, **timer.summary(), "statuses": status_mix}
+
+        rows = []
+        with override_settings(LIBRARY_CATALOG_CACHE=False):
+            rows.append(run("cache off", lambda url, etags: client.get(url)))
+        # Off by default on the local-memory cache; safe here because everything runs in one process
+        with override_settings(LIBRARY_CATALOG_CACHE=True):
+            rows.append(run("cache hit", lambda url, etags: client.get(url)))
+            rows.append(run(
+                "If-None-Match (304)",
+                lambda url, etags: client.get(url, HTTP_IF_NONE_MATCH=etags[url]),
+            ))
+            rows.append(run(
+                "read/write mix", lambda url, etags: client.get(url, HTTP_IF_NONE_MATCH=etags[url])
+            ))
+        print_table(f"Catalog reads over {args.books:,} books, {len(urls)} hot URLs", rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+# benchmarks/bench_db_pool.py
+# Connection-acquire latency under burst load (library/pool.py). `--concurrency` threads
+# arrive together, each checks out a connection, runs `SELECT 1`, holds it for `--hold-ms`
+# (the rest of the request) and gives it back; `--bursts` times with a pause in between.
+# Compared: a new connection per request (CONN_MAX_AGE=0), a pool as large as the burst and a
+# pool a quarter of that size, where requests queue for a connection.
+#
+# Uses the configured PostgreSQL database (DATABASE_URL) when there is one, otherwise SQLite
+# files, whose connections cost far less to open than a PostgreSQL login.
+# To run paste in terminal: python -m benchmarks.bench_db_pool --concurrency 32 --bursts 20
+import argparse
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from .harness import Timer, print_table, setup_django
+
+setup_django()
+
+from django.db import connections
+from library import pool
+
+
+def connector(directory):
+    wrapper = connections["default"]
+    if wrapper.vendor == "postgresql":
+        params = wrapper.get_connection_params()
+        return wrapper.vendor, lambda: wrapper.Database.connect(**params)
+    path = os.path.join(directory, "bench.sqlite3")
+    return "sqlite", lambda: sqlite3.connect(path, check_same_thread=False)
+
+
+class Direct:
+    """No pool: connect and hang up per request."""
+
+    def __init__(self, connect):
+        self.connect = connect
+        self.opened = 0
+
+    def acquire(self):
+        self.opened += 1
+        return self.connect()
+
+    def release(self, connection):
+        connection.close()
+
+    def close(self):
+        pass
+
+
+def burst_client(source, barrier, bursts, hold, pause, timer, failures):
+    for _ in range(bursts):
+        barrier.wait()
+        started = time.perf_counter()
+        try:
+            connection = source.acquire()
+        except pool.PoolTimeout:
+            failures.append(1)
+            continue
+        timer.samples.append(time.perf_counter() - started)
+        pool.health_check(connection)
+        time.sleep(hold)
+        source.release(connection)
+        time.sleep(pause)
+
+
+def measure(source, concurrency, bursts, hold, pause):
+    timer, failures = Timer(), []
+    barrier = threading.Barrier(concurrency)
+    threads = [
+        threading.Thread(
+            target=burst_client, args=(source, barrier, bursts, hold, pause, timer, failures)
+        )
+        for _ in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return timer.summary(), len(failures)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, default=32, help="Requests per burst.")
+    parser.add_argument("--bursts", type=int, default=20)
+    parser.add_argument("--hold-ms", type=float, default=5, help="Time a request keeps it.")
+    parser.add_argument("--pause-ms", type=float, default=50, help="Quiet time between bursts.")
+    parser.add_argument("--timeout", type=float, default=10, help="Pool checkout timeout.")
+    args = parser.parse_args()
+    hold, pause = args.hold_ms / 1000, args.pause_ms / 1000
+
+    with tempfile.TemporaryDirectory() as directory:
+        vendor, connect = connector(directory)
+        quarter = max(1, args.concurrency // 4)
+        sources = {
+            "connect per request": Direct(connect),
+            f"pool max_size={args.concurrency}": pool.ConnectionPool(
+                connect, alias="bench-full", max_size=args.concurrency, timeout=args.timeout
+            ),
+            f"pool max_size={quarter}": pool.ConnectionPool(
+                connect, alias="bench-quarter", max_size=quarter, timeout=args.timeout
+            ),
+        }
+        rows = []
+        for name, source in sources.items():
+            summary, timeouts = measure(source, args.concurrency, args.bursts, hold, pause)
+            source.close()
+            rows.append({
+                "mode": name,
+                "acquires": summary["calls"],
+                "p50_ms": summary["p50_ms"],
+                "p95_ms": summary["p95_ms"],
+                "p99_ms": summary["p99_ms"],
+                "opened": source.opened,
+                "timeouts": timeouts,
+            })
+    print_table(
+        f"Connection acquire on {vendor}: bursts of {args.concurrency} requests holding a "
+        f"connection for {args.hold_ms:g} ms",
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+# benchmarks/bench_import_users.py
+# Measures user provisioning throughput against the number of password-hashing processes,
+# next to the old one-user-at-a-time path (create + set_password + save per row).
+# To run paste in terminal: python -m benchmarks.bench_import_users --users 400 --workers 1 2 4 8
+import argparse
+import os
+import time
+
+from .harness import print_table, scratch_database, setup_django
+
+setup_django()
+
+from django.contrib.auth.models import User
+from library import importing
+
+
+def rows(prefix, count):
+    for index in range(count):
+        yield index + 1, {
+            "username": f"{prefix}{index}",
+            "password": f"pass-{index}-word",
+            "email": f"{prefix}{index}@example.com",
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=400)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument(
+        "--workers", type=int, nargs="+", default=sorted({1, 2, os.cpu_count() or 1})
+    )
+    args = parser.parse_args()
+
+    with scratch_database():
+        start = time.perf_counter()
+        for _, row in rows("serial", args.users):
+            user = User(username=row["username"], email=row["email"])
+            user.set_password(row["password"])
+            user.save()
+        elapsed = time.perf_counter() - start
+        results = [{"path": "serial save (old)", "workers": 1, "seconds": elapsed,
+                    "users_per_s": args.users / elapsed, "speedup": 1.0}]
+
+        for workers in args.workers:
+            report = importing.import_users(
+                rows(f"w{workers}_", args.users), batch_size=args.batch_size, workers=workers
+            )
+            results.append({
+                "path": "import_users",
+                "workers": workers,
+                "seconds": report.elapsed,
+                "users_per_s": report.written / report.elapsed,
+                "speedup": elapsed / report.elapsed,
+            })
+        print_table(f"Provisioning {args.users:,} users on {os.cpu_count()} CPU(s)", results)
+
+
+if __name__ == "__main__":
+    main()
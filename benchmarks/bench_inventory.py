@@ -0,0 +1,134 @@
+# benchmarks/bench_inventory.py
+# Multi-threaded contention benchmark for the inventory service (library/inventory.py).
+# Runs against a throwaway copy of the configured database.
+# To run paste in terminal: python -m benchmarks.bench_inventory --threads 8 --copies 200
+import argparse
+import itertools
+import threading
+import time
+
+from .harness import print_table, scratch_database, setup_django
+
+setup_django()
+
+from django.contrib.auth.models import User
+from django.db import OperationalError, connection, transaction
+from library import inventory
+from library.models import Book, Loan
+
+
+def legacy_borrow(user, book_id):
+    # The read-modify-write pattern the views used before the inventory service
+    book = Book.objects.get(id=book_id)
+    if book.inventory <= 0:
+        raise inventory.OutOfStock()
+    with transaction.atomic():
+        book.inventory -= 1
+        book.save()
+        Loan.objects.create(user=user, book=book, type=1, returned=False)
+
+
+def service_borrow(user, book_id):
+    inventory.borrow(user, book_id)
+
+
+STRATEGIES = {"legacy": legacy_borrow, "service": service_borrow}
+ROUNDS = itertools.count(1)  # Numbers each run's title: (name, author) is unique
+
+
+def run(strategy, users, copies, attempts_per_thread):
+    book = Book.objects.create(
+        name=f"Contended {strategy} {copies} #{next(ROUNDS)}",
+        author="Benchmark",
+        year_published=2000,
+        category="Mystery",
+        inventory=copies,
+    )
+    borrow = STRATEGIES[strategy]
+    barrier = threading.Barrier(len(users))
+    counts = {"borrowed": 0, "rejected": 0, "errors": 0}
+    lock = threading.Lock()
+
+    def worker(user):
+        local = {"borrowed": 0, "rejected": 0, "errors": 0}
+        try:
+            barrier.wait()
+            for _ in range(attempts_per_thread):
+                try:
+                    borrow(user, book.id)
+                    local["borrowed"] += 1
+                except inventory.OutOfStock:
+                    local["rejected"] += 1
+                except OperationalError:  # e.g. SQLite lock timeout
+                    local["errors"] += 1
+        finally:
+            connection.close()
+            with lock:
+                for key, value in local.items():
+                    counts[key] += value
+
+    threads = [threading.Thread(target=worker, args=(user,)) for user in users]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    book.refresh_from_db()
+    loans = Loan.objects.filter(book=book).count()
+    attempts = attempts_per_thread * len(users)
+    return {
+        "strategy": strategy,
+        "threads": len(users),
+        "copies": copies,
+        "attempts": attempts,
+        "loans": loans,
+        "final_inventory": book.inventory,
+        "oversold": max(0, loans - copies),
+        "errors": counts["errors"],
+        "ops_per_s": attempts / elapsed if elapsed else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--copies", type=int, default=200)
+    parser.add_argument("--last-copy-rounds", type=int, default=20)
+    parser.add_argument(
+        "--strategies", default="legacy,service", help="Comma separated: legacy,service"
+    )
+    args = parser.parse_args()
+
+    with scratch_database():
+        users = [
+            User.objects.create_user(username=f"bench{i}", password=None)
+            for i in range(args.threads)
+        ]
+        strategies = args.strategies.split(",")
+
+        # Throughput: more borrow attempts than copies, all threads on one title
+        attempts = max(1, (args.copies * 2) // args.threads)
+        rows = [run(strategy, users, args.copies, attempts) for strategy in strategies]
+        print_table("Contended borrows of a single title", rows)
+
+        # Last copy: every thread races for a single remaining copy
+        rows = []
+        for strategy in strategies:
+            results = [run(strategy, users, 1, 1) for _ in range(args.last_copy_rounds)]
+            rows.append(
+                {
+                    "strategy": strategy,
+                    "threads": args.threads,
+                    "rounds": len(results),
+                    "rounds_oversold": sum(1 for r in results if r["oversold"]),
+                    "total_oversold": sum(r["oversold"] for r in results),
+                    "errors": sum(r["errors"] for r in results),
+                }
+            )
+        print_table("Race for the last copy", rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+# benchmarks/bench_load.py
+# In-process load driver: `--concurrency` threads replay a weighted mix of catalog search,
+# borrow, return, loan listing and admin dashboard requests through the full middleware and
+# view stack for `--duration` seconds. Reports throughput and p50/p95/p99 per endpoint and
+# writes them as JSON (with the git commit) so runs can be compared between commits.
+#
+# By default a throwaway database is seeded with library/seeding.py (`--books`, `--users`,
+# `--loans`). With `--existing` the configured database is used as is, e.g. after
+# `manage.py seed_scale` on a local PostgreSQL; borrows and returns then change its data.
+# To run paste in terminal:
+#   python -m benchmarks.bench_load --concurrency 8 --duration 30 --output load.json
+#   python -m benchmarks.bench_load --concurrency 8 --duration 30 --compare load.json
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+from datetime import datetime, timezone
+
+from .harness import (
+    BASE_DIR, Timer, print_table, queue_sqlite_writers, scratch_database, setup_django,
+)
+
+setup_django()
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Max, Min
+from django.test import Client
+from django.test.utils import setup_test_environment
+from rest_framework_simplejwt.tokens import RefreshToken
+from library import seeding, stats
+from library.models import Book, Loan
+
+MIX = {"search": 40, "list_loans": 20, "borrow": 15, "return": 15, "dashboard": 10}
+PATRONS = 500  # Seeded users the virtual clients act as
+ADMIN = "load-admin"
+
+
+def parse_mix(text):
+    """`"search=40,borrow=15"` -> `{"search": 40, "borrow": 15}`."""
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in MIX:
+            raise argparse.ArgumentTypeError(
+                f"Unknown endpoint {name!r}, choose from {', '.join(MIX)}"
+            )
+        mix[name.strip()] = float(weight)
+    return mix
+
+
+class Workload:
+    """The shared state the virtual clients draw from: tokens, books and borrowed loans."""
+
+    def __init__(self, rng):
+        users = list(User.objects.filter(is_staff=False, is_active=True).order_by("pk")[:PATRONS])
+        if not users:
+            raise SystemExit("No patrons to act as; run `manage.py seed_scale --users ...` first.")
+        self.tokens = {
+            user.pk: f"Bearer {RefreshToken.for_user(user).access_token}" for user in users
+        }
+        patrons = list(self.tokens)
+        admin = User.objects.filter(username=ADMIN).first() or User.objects.create_user(
+            username=ADMIN, password=seeding.PASSWORD, is_staff=True
+        )
+        self.admin_token = f"Bearer {RefreshToken.for_user(admin).access_token}"
+        books = Book.objects.aggregate(first=Min("pk"), last=Max("pk"))
+        self.book_ids = (books["first"] or 0, books["last"] or 0)  # Gaps just answer 404
+        # Loans a return can close: the patrons' open loans, then whatever gets borrowed
+        self.open_loans = deque(
+            Loan.objects.filter(user_id__in=patrons, returned=False).values_list("user_id", "pk")
+        )
+        rng.shuffle(self.open_loans)
+        self.patrons = patrons
+
+
+class Recorder:
+    def __init__(self):
+        self.timers = {name: Timer() for name in MIX}
+        self.refused = dict.fromkeys(MIX, 0)
+        self.errors = dict.fromkeys(MIX, 0)
+        self.lock = threading.Lock()
+
+    def add(self, name, seconds, status):
+        self.timers[name].samples.append(seconds)
+        if status >= 400:
+            with self.lock:
+                if status >= 500:
+                    self.errors[name] += 1
+                else:
+                    self.refused[name] += 1  # Out of stock, overdue, loan limit: expected
+
+
+def request(client, workload, rng, name):
+    """Send one request of kind `name`; returns the response status."""
+    patron = rng.choice(workload.patrons)
+    auth = workload.tokens[patron]
+    if name == "search":
+        return client.get(
+            "/api/library/books/", {"search": rng.choice(seeding.WORDS)}, HTTP_AUTHORIZATION=auth
+        ).status_code
+    if name == "list_loans":
+        return client.get("/api/library/loans/", HTTP_AUTHORIZATION=auth).status_code
+    if name == "dashboard":
+        return client.get(
+            "/api/library/admin-dashboard/", HTTP_AUTHORIZATION=workload.admin_token
+        ).status_code
+    if name == "return":
+        try:
+            patron, loan_id = workload.open_loans.popleft()
+        except IndexError:
+            return None  # Nothing out on loan yet; the caller borrows instead
+        return client.post(
+            f"/api/library/return_book/{loan_id}/", HTTP_AUTHORIZATION=workload.tokens[patron]
+        ).status_code
+    response = client.post(
+        f"/api/library/borrow_book/{rng.randint(*workload.book_ids)}/", HTTP_AUTHORIZATION=auth
+    )
+    if response.status_code == 201:
+        workload.open_loans.append((patron, response.json()["loan_id"]))
+    return response.status_code
+
+
+def client_loop(workload, mix, seed, deadline, recorder):
+    rng = random.Random(seed)
+    client = Client()
+    names, weights = list(mix), list(mix.values())
+    try:
+        while time.perf_counter() < deadline:
+            name = rng.choices(names, weights)[0]
+            started = time.perf_counter()
+            try:
+                status = request(client, workload, rng, name)
+                if status is None:
+                    name = "borrow"
+                    status = request(client, workload, rng, name)
+            except Exception:
+                status = 599  # Counted as an error; the run goes on
+            if recorder is not None:
+                recorder.add(name, time.perf_counter() - started, status)
+    finally:
+        connection.close()
+
+
+def run(workload, mix, concurrency, seconds, seed, recorder=None):
+    deadline = time.perf_counter() + seconds
+    threads = [
+        threading.Thread(target=client_loop, args=(workload, mix, seed + i, deadline, recorder))
+        for i in range(concurrency)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - started
+
+
+def results(recorder, elapsed):
+    endpoints = {}
+    everything = Timer()
+    for name, timer in recorder.timers.items():
+        everything.samples += timer.samples
+        if timer.samples:
+            endpoints[name] = summarize(
+                timer, elapsed, recorder.refused[name], recorder.errors[name]
+            )
+    total = summarize(
+        everything, elapsed, sum(recorder.refused.values()), sum(recorder.errors.values())
+    )
+    return endpoints, total
+
+
+def summarize(timer, elapsed, refused, errors):
+    summary = timer.summary()
+    return {
+        "requests": summary["calls"],
+        "req_per_s": round(summary["calls"] / elapsed, 2),
+        "p50_ms": round(summary["p50_ms"], 3),
+        "p95_ms": round(summary["p95_ms"], 3),
+        "p99_ms": round(summary["p99_ms"], 3),
+        "refused": refused,
+        "errors": errors,
+    }
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, capture_output=True, text=True
+        ).stdout.strip()
+        dirty = bool(subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            cwd=BASE_DIR, capture_output=True, text=True,
+        ).stdout.strip())
+    except OSError:
+        return None, None
+    return commit or None, dirty
+
+
+def compare(baseline, report):
+    rows = []
+    for name, after in {**report["endpoints"], "total": report["total"]}.items():
+        before = baseline["endpoints"].get(name) if name != "total" else baseline["total"]
+        if not before:
+            continue
+        rows.append({
+            "endpoint": name,
+            "req_per_s": f"{before['req_per_s']:,.1f} -> {after['req_per_s']:,.1f}",
+            "req_per_s_%": (after["req_per_s"] / before["req_per_s"] - 1) * 100,
+            "p95_ms": f"{before['p95_ms']:,.2f} -> {after['p95_ms']:,.2f}",
+            "p95_%": (after["p95_ms"] / before["p95_ms"] - 1) * 100 if before["p95_ms"] else 0.0,
+        })
+    print_table(f"Against {baseline.get('commit')} ({baseline.get('timestamp')})", rows)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--existing", action="store_true", help="Use the configured database as is."
+    )
+    parser.add_argument("--books", default="5000", help="Seeded into the throwaway database.")
+    parser.add_argument("--users", default="1000")
+    parser.add_argument("--loans", default="50k")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=20, help="Measured seconds.")
+    parser.add_argument("--warmup", type=float, default=3, help="Unmeasured seconds first.")
+    parser.add_argument(
+        "--mix",
+        type=parse_mix,
+        default=MIX,
+        help="Weights, e.g. search=40,list_loans=20,borrow=15,return=15,dashboard=10.",
+    )
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write the results as JSON to this file.")
+    parser.add_argument("--compare", help="A previous --output file to compare against.")
+    args = parser.parse_args()
+    logging.getLogger("library.timing").setLevel(logging.WARNING)  # Keep the table readable
+
+    if args.existing:
+        queue_sqlite_writers(connection)
+        setup_test_environment(debug=False)  # Lets django.test.Client talk to the app
+    with nullcontext() if args.existing else scratch_database():
+        if not args.existing:
+            seeding.generate(
+                books=seeding.parse_size(args.books),
+                users=seeding.parse_size(args.users),
+                loans=seeding.parse_size(args.loans),
+                seed=args.seed,
+            )
+        counters = stats.read_counters()
+        workload = Workload(random.Random(args.seed))
+        connection.close()  # Each client thread opens its own connection
+
+        run(workload, args.mix, args.concurrency, args.warmup, args.seed)
+        recorder = Recorder()
+        elapsed = run(workload, args.mix, args.concurrency, args.duration, args.seed, recorder)
+        endpoints, total = results(recorder, elapsed)
+        vendor = connection.vendor
+
+    commit, dirty = git_commit()
+    report = {
+        "commit": commit,
+        "dirty": dirty,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "database": vendor,
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "concurrency": args.concurrency,
+        "duration_s": round(elapsed, 2),
+        "mix": args.mix,
+        "dataset": {name: counters[name] for name in (stats.BOOKS, stats.USERS, stats.LOANS)},
+        "endpoints": endpoints,
+        "total": total,
+    }
+    print_table(
+        f"{args.concurrency} clients for {elapsed:.1f}s on {vendor} "
+        f"({counters[stats.BOOKS]:,} books, {counters[stats.USERS]:,} users, "
+        f"{counters[stats.LOANS]:,} loans)",
+        [{"endpoint": name, **row} for name, row in {**endpoints, "total": total}.items()],
+    )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as stream:
+            json.dump(report, stream, indent=2)
+        print(f"\nResults written to {args.output}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as stream:
+            compare(json.load(stream), report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# benchmarks/bench_metrics.py
+# Cost of a hot-path metric update (library/metrics.py): a borrow counter, a labelled failure
+# counter and the per-request observation, in-process and in the multiprocess (mmap) mode that
+# gunicorn workers use. Each mode runs in its own interpreter, because prometheus_client picks
+# its storage when it is imported.
+# To run paste in terminal: python -m benchmarks.bench_metrics --updates 200000
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def measure(updates):
+    from .harness import setup_django
+
+    setup_django()
+    from types import SimpleNamespace
+    from library import metrics
+
+    request = SimpleNamespace(method="GET", resolver_match=SimpleNamespace(url_name="book-list"))
+    response = SimpleNamespace(status_code=200)
+    cases = {
+        "borrowed()": metrics.borrowed,
+        "borrow_failed(reason)": lambda: metrics.borrow_failed("out_of_stock"),
+        "cache_lookup(cache, result)": lambda: metrics.cache_lookup("catalog", "hit"),
+        "observe(request)": lambda: metrics.observe(request, response, 0.003, 2),
+    }
+    results = {}
+    for name, update in cases.items():
+        update()  # Create the labelled child and its file entry
+        started = time.perf_counter()
+        for _ in range(updates):
+            update()
+        results[name] = (time.perf_counter() - started) / updates * 1e6
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--updates", type=int, default=200000)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        print(json.dumps(measure(args.updates)))
+        return
+
+    from .harness import print_table
+
+    command = [sys.executable, "-m", "benchmarks.bench_metrics", "--child"]
+    command += ["--updates", str(args.updates)]
+    env = {key: value for key, value in os.environ.items() if key != "PROMETHEUS_MULTIPROC_DIR"}
+    runs = {}
+    with tempfile.TemporaryDirectory() as directory:
+        modes = {"in-process": {}, "multiprocess": {"PROMETHEUS_MULTIPROC_DIR": directory}}
+        for mode, extra in modes.items():
+            output = subprocess.run(
+                command, env={**env, **extra}, check=True, capture_output=True, text=True
+            ).stdout
+            runs[mode] = json.loads(output.splitlines()[-1])
+    print_table(
+        "Microseconds per update",
+        [
+            {"update": name, **{mode: run[name] for mode, run in runs.items()}}
+            for name in runs["in-process"]
+        ],
+    )
+
+
+if __name__ == "__main__":
+    main()
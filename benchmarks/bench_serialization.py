@@ -0,0 +1,93 @@
+# benchmarks/bench_serialization.py
+# Rows per second on one core for catalog and loan pages (library/fastread.py,
+# library/renderers.py): DRF serializers over model instances and the stdlib JSONRenderer,
+# against `.values()` rows with the compiled field mapping, rendered with the stdlib and with
+# orjson. "build" is fetching plus building the payload, "render" is JSON encoding only and
+# "total" both. Every path's JSON is checked against the serializers' before timing.
+# To run paste in terminal: python -m benchmarks.bench_serialization --rows 500 --rounds 50
+import argparse
+import time
+
+from .harness import print_table, scratch_database, setup_django
+
+setup_django()
+
+from rest_framework.renderers import JSONRenderer
+from library import fastread, renderers, seeding
+from library.models import Book, Loan
+from library.serializers import BookSerializer, LoanSerializer
+
+
+def rows_per_second(function, rows, rounds):
+    function()  # Warm up (compiled mappings, query caches)
+    started = time.perf_counter()
+    for _ in range(rounds):
+        function()
+    return rows * rounds / (time.perf_counter() - started)
+
+
+def compare(name, queryset, serializer_class, rounds):
+    rows = fastread.compile_serializer(serializer_class)
+    stdlib, fast = JSONRenderer(), renderers.FastJSONRenderer()
+
+    def serializer_data():
+        return serializer_class(list(queryset), many=True).data
+
+    def values_data():
+        return rows.represent(list(rows.values(queryset)))
+
+    expected = stdlib.render(serializer_data())
+    for render, build in ((stdlib.render, values_data), (fast.render, values_data)):
+        assert render(build()) == expected, f"{name}: output differs from the serializers"
+
+    count = len(serializer_data())
+    serialized, values = serializer_data(), values_data()
+    paths = [
+        ("serializer + stdlib JSON", serializer_data, stdlib.render, serialized),
+        (".values() + stdlib JSON", values_data, stdlib.render, values),
+        (".values() + orjson", values_data, fast.render, values),
+    ]
+    results = []
+    for label, build, render, data in paths:
+        results.append({
+            "page": name,
+            "path": label,
+            "build_rows_s": rows_per_second(build, count, rounds),
+            "render_rows_s": rows_per_second(lambda: render(data), count, rounds),
+            "total_rows_s": rows_per_second(lambda: render(build()), count, rounds),
+        })
+    baseline = results[0]["total_rows_s"]
+    for result in results:
+        result["speedup"] = f"{result['total_rows_s'] / baseline:.1f}x"
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=500, help="Rows per page.")
+    parser.add_argument("--rounds", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    with scratch_database():
+        seeding.generate(books=args.rows * 2, users=50, loans=args.rows * 2, seed=args.seed)
+        books = Book.objects.order_by("id")[: args.rows]
+        loans = (
+            Loan.objects.select_related("user", "book")
+            .only(
+                "id", "type", "loan_date", "return_date", "returned",
+                "user", "user__username", "book", "book__name", "book__image_url",
+            )
+            .order_by("id")[: args.rows]
+        )
+        results = compare("books", books, BookSerializer, args.rounds)
+        results += compare("loans", loans, LoanSerializer, args.rounds)
+    print_table(
+        f"Rows per second, one core, pages of {args.rows} "
+        f"(orjson {'installed' if renderers.orjson else 'missing: stdlib fallback'})",
+        results,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# benchmarks/bench_suggest.py
+# Compares type-ahead lookups: the old DRF SearchFilter scan, the full-text `/books/?search=`
+# and the prefix-index backed `/books/suggest/`.
+# To run paste in terminal: python -m benchmarks.bench_suggest --books 50000 --queries 300
+import argparse
+import random
+import time
+
+from .harness import Timer, fake_book, print_table, scratch_database, setup_django
+
+setup_django()
+
+from django.test import Client
+from rest_framework import filters
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from library import suggest
+from library.models import Book
+
+
+class LegacySearchView:
+    # What BookViewSet searched before library/search.py
+    search_fields = ["name", "author", "year_published", "category"]
+
+
+def legacy_search(factory, prefix):
+    request = Request(factory.get("/api/library/books/", {"search": prefix}))
+    queryset = filters.SearchFilter().filter_queryset(
+        request, Book.objects.all(), LegacySearchView()
+    )
+    return list(queryset)  # The old endpoint returned every match
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--books", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    with scratch_database():
+        Book.objects.bulk_create(
+            (Book(**fake_book(rng, i)) for i in range(args.books)), batch_size=2000
+        )
+        start = time.perf_counter()
+        index = suggest.build_index()
+        build_seconds = time.perf_counter() - start
+
+        words = [book.name.split()[0] for book in Book.objects.order_by("?")[:100]]
+        prefixes = [
+            rng.choice(words)[: rng.randint(2, 5)].lower() for _ in range(args.queries)
+        ]
+        client = Client()
+        factory = APIRequestFactory()
+        paths = {
+            "SearchFilter queryset (old)": lambda p: legacy_search(factory, p),
+            "GET /books/?search=": lambda p: client.get(
+                "/api/library/books/", {"search": p, "page_size": 10}
+            ),
+            "GET /books/suggest/?q=": lambda p: client.get(
+                "/api/library/books/suggest/", {"q": p}
+            ),
+            "PrefixIndex.lookup": lambda p: index.lookup(p, 10),
+        }
+
+        rows = []
+        for name, run in paths.items():
+            run(prefixes[0])  # Warm up
+            timer = Timer()
+            for prefix in prefixes:
+                with timer.measure():
+                    run(prefix)
+            rows.append({"path": name, **timer.summary()})
+        print_table(
+            f"Type-ahead over {args.books:,} books (index: {len(index):,} keys, "
+            f"built in {build_seconds:.2f}s)",
+            rows,
+        )
+
+
+if __name__ == "__main__":
+    main()
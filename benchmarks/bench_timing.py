@@ -0,0 +1,67 @@
+# benchmarks/bench_timing.py
+# Overhead of the request timing middleware (library/timing.py) on a loans page: sampling
+# off, the default 10% and every request, against the same requests without the middleware.
+# To run paste in terminal: python -m benchmarks.bench_timing --requests 500
+import argparse
+import logging
+
+from .harness import Timer, print_table, scratch_database, setup_django
+
+setup_django()
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.test import Client
+from django.test.utils import override_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from library import timing
+from library.models import Book, Loan
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--loans", type=int, default=50, help="Loans on the page.")
+    args = parser.parse_args()
+    logging.getLogger("library.timing").setLevel(logging.WARNING)  # Keep the table readable
+
+    with scratch_database():
+        user = User.objects.create_user(username="bench", password="bench")
+        book = Book.objects.create(
+            name="Bench", author="Author", year_published=2000, category="Action", inventory=1
+        )
+        Loan.objects.bulk_create(Loan(user=user, book=book, type=1) for _ in range(args.loans))
+        token = RefreshToken.for_user(user).access_token
+        without = [m for m in settings.MIDDLEWARE if m != "library.timing.ServerTimingMiddleware"]
+        modes = {
+            "no middleware": {"MIDDLEWARE": without},
+            "sample rate 0": {"LIBRARY_TIMING_SAMPLE_RATE": 0.0},
+            "sample rate 0.1": {"LIBRARY_TIMING_SAMPLE_RATE": 0.1},
+            "sample rate 1": {"LIBRARY_TIMING_SAMPLE_RATE": 1.0},
+        }
+
+        rows = []
+        for mode, overrides in modes.items():
+            with override_settings(**overrides):
+                client = Client(HTTP_AUTHORIZATION=f"Bearer {token}")
+                client.get("/api/library/loans/")  # Warm up
+                timer = Timer()
+                for _ in range(args.requests):
+                    with timer.measure():
+                        client.get("/api/library/loans/")
+            summary = timer.summary()
+            rows.append({
+                "mode": mode,
+                "mean_ms": summary["mean_ms"],
+                "p50_ms": summary["p50_ms"],
+                "p95_ms": summary["p95_ms"],
+            })
+        baseline = rows[0]["mean_ms"]
+        for row in rows:
+            row["overhead_%"] = (row["mean_ms"] / baseline - 1) * 100
+        print_table(f"GET /loans/ ({args.loans} loans per page)", rows)
+        print_table("Aggregates", timing.route_summaries())
+
+
+if __name__ == "__main__":
+    main()
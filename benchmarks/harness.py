@@ -0,0 +1,134 @@
+# benchmarks/harness.py
+# Shared helpers for the benchmark scripts: Django setup, a throwaway database and reporting.
+import os
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+def setup_django():
+    """Set up the Django environment the same way the insert_*.py scripts do."""
+    if str(BASE_DIR) not in sys.path:
+        sys.path.insert(0, str(BASE_DIR))
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "library_main.settings")
+    import django
+
+    django.setup()
+
+
+def queue_sqlite_writers(connection):
+    """IMMEDIATE transactions so concurrent SQLite writers queue instead of deadlocking."""
+    if connection.vendor == "sqlite":
+        options = connection.settings_dict.setdefault("OPTIONS", {})
+        options.setdefault("transaction_mode", "IMMEDIATE")
+        options.setdefault("timeout", 30)
+
+
+@contextmanager
+def scratch_database():
+    """
+    Create a throwaway test database next to the configured one (like `manage.py test`)
+    and destroy it afterwards, so benchmarks never touch real data.
+    """
+    from django.db import connections
+    from django.test.utils import (
+        setup_databases,
+        setup_test_environment,
+        teardown_databases,
+        teardown_test_environment,
+    )
+
+    connection = connections["default"]
+    tmp_dir = None
+    if connection.vendor == "sqlite":
+        # A file (not :memory:) so connections from several threads share the data
+        tmp_dir = tempfile.TemporaryDirectory()
+        connection.settings_dict["TEST"]["NAME"] = os.path.join(tmp_dir.name, "bench.sqlite3")
+        queue_sqlite_writers(connection)
+
+    setup_test_environment(debug=False)  # Lets django.test.Client talk to the app
+    old_config = setup_databases(verbosity=0, interactive=False)
+    try:
+        yield connection
+    finally:
+        teardown_databases(old_config, verbosity=0)
+        teardown_test_environment()
+        if tmp_dir is not None:
+            tmp_dir.cleanup()
+
+
+def fake_book(rng, index):
+    """A deterministic, plausible-looking book row for seeding benchmark data."""
+    # The vocabulary of `manage.py seed_scale`; imported here because it needs the app registry
+    from library.seeding import CATEGORIES, NAMES, WORDS
+
+    title = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 4))).title()
+    return {
+        "name": f"{title} {index}",
+        "author": f"{rng.choice(NAMES)} {rng.choice(WORDS).title()}son",
+        "year_published": rng.randint(1800, 2024),
+        "category": rng.choice(CATEGORIES),
+        "inventory": rng.randint(0, 5),
+    }
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class Timer:
+    """Collects per-call latencies in seconds."""
+
+    def __init__(self):
+        self.samples = []
+
+    @contextmanager
+    def measure(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.samples.append(time.perf_counter() - start)
+
+    def summary(self):
+        total = sum(self.samples)
+        return {
+            "calls": len(self.samples),
+            "mean_ms": total / len(self.samples) * 1000 if self.samples else 0.0,
+            "p50_ms": percentile(self.samples, 50) * 1000,
+            "p95_ms": percentile(self.samples, 95) * 1000,
+            "p99_ms": percentile(self.samples, 99) * 1000,
+        }
+
+
+def print_table(title, rows):
+    """Print a list of dicts as an aligned table."""
+    print(f"\n{title}")
+    if not rows:
+        print("  (no rows)")
+        return
+    columns = list(rows[0])
+    cells = [[_format(row.get(column)) for column in columns] for row in rows]
+    widths = [
+        max(len(column), *(len(line[i]) for line in cells))
+        for i, column in enumerate(columns)
+    ]
+    print("  " + "  ".join(column.ljust(widths[i]) for i, column in enumerate(columns)))
+    for line in cells:
+        print("  " + "  ".join(cell.ljust(widths[i]) for i, cell in enumerate(line)))
+
+
+def _format(value):
+    if isinstance(value, float):
+        return f"{value:,.2f}"
+    if isinstance(value, int):
+        return f"{value:,}"
+    return str(value)
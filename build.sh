@@ -4,4 +4,7 @@
 
 python manage.py migrate
 python manage.py collectstatic --noinput
+# Workers share Prometheus samples through files here (library/metrics.py); start clean
+export PROMETHEUS_MULTIPROC_DIR="${PROMETHEUS_MULTIPROC_DIR:-/tmp/library-metrics}"
+rm -rf "$PROMETHEUS_MULTIPROC_DIR" && mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
 exec gunicorn library.wsgi:application --bind 0.0.0.0:8000
\ No newline at end of file
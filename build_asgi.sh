@@ -0,0 +1,19 @@
+# build_asgi.sh
+# ASGI deployment profile: uvicorn serving library_main.asgi, for the async read endpoints
+# under /api/library/async/ (library/async_views.py). Sync DRF views keep working but run
+# one at a time per worker on Django's sync executor, so keep build.sh (gunicorn) for
+# write-heavy traffic and send catalog/loan/dashboard reads to the async routes.
+
+#!/bin/sh
+
+python manage.py migrate
+python manage.py collectstatic --noinput
+# Persistent connections are not reused across ASGI requests; open one per request instead
+export DB_CONN_MAX_AGE=0
+# Workers share Prometheus samples through files here (library/metrics.py); start clean
+export PROMETHEUS_MULTIPROC_DIR="${PROMETHEUS_MULTIPROC_DIR:-/tmp/library-metrics}"
+rm -rf "$PROMETHEUS_MULTIPROC_DIR" && mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+exec uvicorn library_main.asgi:application \
+    --host 0.0.0.0 --port "${PORT:-8000}" \
+    --workers "${WEB_CONCURRENCY:-2}" \
+    --lifespan off --no-access-log
@@ -0,0 +1,8 @@
+# gunicorn.conf.py
+# Read by gunicorn from the working directory (build.sh).
+from prometheus_client import multiprocess
+
+
+# Let the /metrics scrape drop a dead worker's live samples (library/metrics.py)
+def child_exit(server, worker):
+    multiprocess.mark_process_dead(worker.pid)
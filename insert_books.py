@@ -7,8 +7,7 @@ import django
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "library_main.settings")
 django.setup()
 
-from library.models import Book
-from library.serializers import BookSerializer
+from library.importing import import_books
 
 # List of books with real titles, authors, publication years, and cover image URLs
 books_data = [
@@ -115,15 +114,11 @@ books_data = [
         "image_url": "https://upload.wikimedia.org/wikipedia/en/thumb/1/1f/Educated_%28Tara_Westover%29.png/220px-Educated_%28Tara_Westover%29.png",
     },
 ]
-# Insert books into the database
-for book_data in books_data:
-    try:
-        book, created = Book.objects.get_or_create(name=book_data["name"], defaults=book_data)
-        if created:
-            print(f"✅ Book '{book_data['name']}' added successfully!")
-        else:
-            print(f"⚠️ Book '{book_data['name']}' already exists, skipping.")
-    except Exception as e:
-        print(f"❌ Error adding book '{book_data['name']}': {e}")
-
-print("🎉 Book insertion completed!")
+# Insert books into the database, skipping titles that already exist for the same author.
+# For large catalogs use: python manage.py import_books <file.csv|file.jsonl>
+report = import_books(
+    enumerate(books_data, 1),
+    update_existing=False,
+    on_reject=lambda line, row, errors: print(f"❌ Error adding book '{row.get('name')}': {errors}"),
+)
+print(f"🎉 Book insertion completed! {report.written} books written, {report.rejected} rejected.")
@@ -8,7 +8,7 @@ import django
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'library_main.settings')
 django.setup()
 
-from django.contrib.auth.models import User
+from library.importing import import_users
 
 # Define users to be added
 users_data = [
@@ -18,23 +18,10 @@ users_data = [
 ]
 
 
-# Insert users into the database
-for user_data in users_data:
-    try:
-        user, created = User.objects.get_or_create(username=user_data["username"], defaults={
-            "email": user_data["email"],
-            "first_name": user_data["first_name"],
-            "last_name": user_data["last_name"],
-            "is_staff": user_data["is_staff"]
-        })
-
-        if created:
-            user.set_password(user_data["password"])  # Properly hash the password
-            user.save()
-            print(f"✅ User '{user.username}' created successfully!")
-        else:
-            print(f"⚠️ User '{user.username}' already exists, skipping.")
-    except Exception as e:
-        print(f"❌ Error creating user '{user_data['username']}': {e}")
-
-print("🎉 User insertion completed!")
+# Insert users into the database, skipping usernames that already exist.
+# For large rosters use: python manage.py import_users <file.csv>
+report = import_users(
+    enumerate(users_data, 1),
+    on_reject=lambda line, row, errors: print(f"❌ Error creating user '{row.get('username')}': {errors}"),
+)
+print(f"🎉 User insertion completed! {report.written} created, {report.skipped} skipped.")
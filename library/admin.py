@@ -2,8 +2,10 @@
 from django.contrib import admin
 from django.contrib.auth.models import User
 from django.contrib.auth.admin import UserAdmin
+from django.db import transaction
 from django.forms import ValidationError
-from .models import Book, Loan
+from . import inventory
+from .models import Book, Hold, Loan, LoanArchive, OverdueEvent
 
 # Register User model in Django Admin
 if not admin.site.is_registered(User):
@@ -50,13 +52,14 @@ class LoanAdmin(admin.ModelAdmin):
 
     def save_model(self, request, obj, form, change):
         if not change:  # New loan is being created
-            if obj.book.inventory <= 0:
+            try:
+                # Reduces inventory and saves the loan in one transaction
+                inventory.issue_loan(obj)
+            except inventory.OutOfStock:
                 raise ValidationError("This book is out of stock.")
+            return
 
-            obj.book.inventory -= 1  # Reduce inventory when loan is made
-            obj.book.save(update_fields=["inventory"])
-
-        else:  # If modifying an existing loan
+        with transaction.atomic():  # If modifying an existing loan
             old_loan = Loan.objects.get(pk=obj.pk)
 
             # Prevent accidental modification of loan dates
@@ -67,7 +70,52 @@ class LoanAdmin(admin.ModelAdmin):
                 raise ValidationError("Loan date and return date cannot be changed.")
 
             if not old_loan.returned and obj.returned:  # Marking as returned
-                obj.book.inventory += 1
-                obj.book.save(update_fields=["inventory"])
+                try:
+                    inventory.close_loan(obj)
+                except inventory.AlreadyReturned:
+                    pass
+
+            super().save_model(request, obj, form, change)
+
+
+# Overdue events recorded by `manage.py sweep_overdue` (read-only)
+@admin.register(OverdueEvent)
+class OverdueEventAdmin(admin.ModelAdmin):
+    list_display = ("loan", "user", "book", "due_date", "detected_at")
+    list_filter = ("due_date", "detected_at")
+    search_fields = ("user__username", "book__name")
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+# Loans moved out of the Loan table by `manage.py archive_loans` (read-only)
+@admin.register(LoanArchive)
+class LoanArchiveAdmin(admin.ModelAdmin):
+    list_display = ("id", "user", "book", "loan_date", "return_date", "archived_at")
+    list_filter = ("loan_date",)
+    search_fields = ("user__username", "book__name")
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+# Hold queues (read-only: status changes go through library/inventory.py to move copies).
+# Deleting an open hold cancels it first (library/signals.py), passing on a copy set aside for it.
+@admin.register(Hold)
+class HoldAdmin(admin.ModelAdmin):
+    list_display = ("user", "book", "status", "created_at", "ready_until")
+    list_filter = ("status",)
+    search_fields = ("user__username", "book__name")
+
+    def has_add_permission(self, request):
+        return False
 
-        super().save_model(request, obj, form, change)
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,110 @@
+# library/archive.py
+# Loan history archival behind `manage.py archive_loans`. Returned loans older than
+# LIBRARY_ARCHIVE_AFTER_DAYS (by loan date) are moved from Loan to LoanArchive in batches,
+# each in its own short transaction, so the Loan table only holds active and recent loans
+# and its indexes stay small enough to live in memory. Archived loans keep their ids and
+# are read through /api/library/loan-history/ and /export/loan_history.<fmt>.
+#
+# On PostgreSQL LoanArchive is a table partitioned by `loan_date` range with one partition
+# per year, created on demand before rows for that year are moved. Date-range reads only
+# touch their years, and a year of history can be detached or dropped as a single table.
+# Other databases get a plain table with the same columns and indexes (migration 0011).
+#
+# Moving a loan leaves the dashboard counters alone: the loans total counts both tables.
+from datetime import date, timedelta
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils.timezone import now
+from .models import Loan, LoanArchive, OverdueEvent
+
+BATCH_SIZE = 5000
+TABLE = LoanArchive._meta.db_table
+FIELDS = ("id", "user_id", "book_id", "type", "loan_date", "return_date", "returned", "overdue")
+
+
+def archive_after_days():
+    return getattr(settings, "LIBRARY_ARCHIVE_AFTER_DAYS", 365)
+
+
+def partition_name(year):
+    return f"{TABLE}_y{year}"
+
+
+def ensure_partitions(years):
+    """Create the yearly partitions the next rows go to (PostgreSQL only)."""
+    if connection.vendor != "postgresql":
+        return
+    with connection.cursor() as cursor:
+        for year in sorted(set(years)):
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {partition_name(year)} PARTITION OF {TABLE} "
+                f"FOR VALUES FROM ('{date(year, 1, 1)}') TO ('{date(year + 1, 1, 1)}')"
+            )
+
+
+def delete_loans(ids):
+    """
+    DELETE the loans with these ids in one statement. Not `QuerySet.delete()`: the Loan
+    delete signals would count them as lost loans and recompute summaries that returned
+    loans never contributed to.
+    """
+    table = connection.ops.quote_name(Loan._meta.db_table)
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute(f"DELETE FROM {table} WHERE id = ANY(%s)", [ids])
+        else:
+            placeholders = ", ".join(["%s"] * len(ids))
+            cursor.execute(f"DELETE FROM {table} WHERE id IN ({placeholders})", ids)
+
+
+def cutoff_date(days, today=None):
+    return (today or now().date()) - timedelta(days=days)
+
+
+def candidates(cutoff):
+    return Loan.objects.filter(returned=True, loan_date__lt=cutoff)
+
+
+def archive_batch(loans, after, batch_size):
+    """
+    Move the next `batch_size` loans with an id above `after` to the archive.
+    Returns `(last_id, count)`, or None when nothing was left.
+    """
+    with transaction.atomic():
+        batch = list(
+            loans.filter(pk__gt=after)
+            .select_for_update()
+            .order_by("pk")
+            .values_list(*FIELDS)[:batch_size]
+        )
+        if not batch:
+            return None
+        ids = [row[0] for row in batch]
+        ensure_partitions(row[4].year for row in batch)
+        LoanArchive.objects.bulk_create(LoanArchive(**dict(zip(FIELDS, row))) for row in batch)
+        # Overdue events outlive their loan, as they do when a loan is deleted
+        OverdueEvent.objects.filter(loan_id__in=ids).update(loan=None)
+        delete_loans(ids)
+    return ids[-1], len(batch)
+
+
+def archive(older_than_days=None, today=None, batch_size=BATCH_SIZE, on_batch=None):
+    """
+    Move returned loans lent more than `older_than_days` ago (default
+    LIBRARY_ARCHIVE_AFTER_DAYS) to LoanArchive. `on_batch(moved_so_far)` is called after
+    each committed batch. Returns the number of loans moved.
+    """
+    days = archive_after_days() if older_than_days is None else older_than_days
+    loans = candidates(cutoff_date(days, today))
+    moved, after = 0, 0
+    while True:
+        result = archive_batch(loans, after, batch_size)
+        if result is None:
+            break
+        after, count = result
+        moved += count
+        if on_batch:
+            on_batch(moved)
+        if count < batch_size:
+            break
+    return moved
@@ -0,0 +1,157 @@
+# library/async_views.py
+# Async (native coroutine) versions of the read-heavy endpoints, for the uvicorn deployment.
+# DRF views are sync-only, so under ASGI every one of them runs on Django's single
+# thread-sensitive executor. These views await the ORM directly and reuse the sync API's
+# pieces (filters, keyset pagination, `.values()` rows or serializers, JSON renderer), so the
+# responses match the sync endpoints byte for byte.
+from functools import wraps
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from rest_framework import exceptions
+from rest_framework.request import Request
+from . import feed, routing, stats
+from .authentication import ClaimsJWTAuthentication
+from .models import Book
+from .renderers import FastJSONRenderer
+from .views import BookViewSet, LoanViewSet
+
+renderer = FastJSONRenderer()  # Every payload here is float-free (library/renderers.py)
+authenticator = ClaimsJWTAuthentication()
+
+
+def render(data, status=200):
+    return HttpResponse(renderer.render(data), status=status, content_type="application/json")
+
+
+def error_response(exc):
+    # Same payloads as DRF's exception handler
+    detail = exc.detail if isinstance(exc.detail, (list, dict)) else {"detail": exc.detail}
+    response = render(detail, status=exc.status_code)
+    if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+        response.status_code = 401
+        response["WWW-Authenticate"] = authenticator.authenticate_header(None)
+    return response
+
+
+def read_only(view):
+    """Answer methods other than GET and HEAD with the 405 DRF's views send."""
+
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method not in ("GET", "HEAD"):
+            response = error_response(exceptions.MethodNotAllowed(request.method))
+            response["Allow"] = "GET, HEAD"
+            return response
+        return await view(request, *args, **kwargs)
+
+    return wrapper
+
+
+async def api_request(request, require_user=False, require_staff=False):
+    """Wrap a Django request like DRF does, authenticating with the async JWT lookup."""
+    drf_request = Request(request, authenticators=[])
+    result = await authenticator.aauthenticate(drf_request)
+    if result is not None:
+        drf_request.user, drf_request.auth = result
+    user = drf_request.user
+    if (require_user or require_staff) and not user.is_authenticated:
+        raise exceptions.NotAuthenticated()
+    if require_staff and not user.is_staff:
+        raise exceptions.PermissionDenied()
+    return drf_request
+
+
+def viewset(view_class, request, action, **kwargs):
+    view = view_class(request=request, format_kwarg=None, action=action, kwargs=kwargs)
+    view.args = ()
+    return view
+
+
+async def paginated(view, queryset):
+    paginator = view.paginator
+    rows = view.fast_rows()
+    if rows is not None:
+        queryset = rows.values(queryset)
+    page = await paginator.apaginate_queryset(queryset, view.request, view=view)
+    data = rows.represent(page) if rows is not None else view.get_serializer(page, many=True).data
+    return render(paginator.get_paginated_response(data).data)
+
+
+# GET /async/books/ - same filters, ordering and pagination as /books/
+@read_only
+async def book_list(request):
+    try:
+        drf_request = await api_request(request)
+        view = viewset(BookViewSet, drf_request, "list")
+        with routing.replica_reads(drf_request):
+            return await paginated(view, view.filter_queryset(view.get_queryset()))
+    except exceptions.APIException as exc:
+        return error_response(exc)
+
+
+# GET /async/books/<id>/
+@read_only
+async def book_detail(request, pk):
+    try:
+        drf_request = await api_request(request)
+        view = viewset(BookViewSet, drf_request, "retrieve", pk=pk)
+        rows = view.fast_rows()
+        queryset = Book.objects.filter(pk=pk)
+        try:
+            with routing.replica_reads(drf_request):
+                book = await (rows.values(queryset) if rows is not None else queryset).aget()
+        except Book.DoesNotExist:
+            raise Http404
+        data = rows.represent([book])[0] if rows is not None else view.get_serializer(book).data
+        return render(data)
+    except Http404:
+        return render({"detail": "No Book matches the given query."}, status=404)
+    except exceptions.APIException as exc:
+        return error_response(exc)
+
+
+# GET /async/loans/ - the caller's loans (everyone's for admins), same filters as /loans/
+@read_only
+async def loan_list(request):
+    try:
+        drf_request = await api_request(request, require_user=True)
+        view = viewset(LoanViewSet, drf_request, "list")
+        return await paginated(view, view.filter_queryset(view.get_queryset()))
+    except exceptions.APIException as exc:
+        return error_response(exc)
+
+
+# GET /async/admin-dashboard/ (Admin Only)
+@read_only
+async def admin_dashboard(request):
+    try:
+        await api_request(request, require_staff=True)
+    except exceptions.APIException as exc:
+        return error_response(exc)
+    counters = await stats.aread_counters()
+    return render(
+        {
+            "users": counters[stats.USERS],
+            "books": counters[stats.BOOKS],
+            "loans": counters[stats.LOANS],
+            "active_loans": counters[stats.ACTIVE_LOANS],
+            "overdue_loans": await stats.aoverdue_loans_count(),
+            "copies_in_stock": counters[stats.COPIES_IN_STOCK],
+        }
+    )
+
+
+# GET /async/inventory-feed/ - Server-Sent Events with live `{book_id, inventory}` deltas.
+# Clients load the catalog once, then apply `inventory` events; a `resync` event means
+# deltas were missed and the catalog should be fetched again. ASGI only: under WSGI every
+# open stream would hold a worker thread.
+@read_only
+async def inventory_feed(request):
+    if not isinstance(request, ASGIRequest):
+        return render({"detail": "The inventory feed is served by the ASGI app only."}, status=501)
+    response = StreamingHttpResponse(
+        feed.EventStream(feed.subscribe()), content_type="text/event-stream"
+    )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # Stop nginx from buffering the stream
+    return response
@@ -0,0 +1,141 @@
+# library/authentication.py
+# JWT authentication without a `User` query on every request.
+# The user is built from the verified token's user id claim plus the username and account
+# flags (is_active, is_staff, is_superuser), cached per worker for LIBRARY_AUTH_CACHE_TTL
+# seconds, so a cache hit needs no query at all. Deactivating or demoting a user takes
+# effect within one TTL on other workers, and at once on the worker that saved the change.
+import threading
+import time
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models.constants import LOOKUP_SEP
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from . import metrics, timing
+
+FLAG_FIELDS = ("is_active", "is_staff", "is_superuser")
+MAX_ENTRIES = 10000
+
+_flags = {}  # user id -> (loaded_at, username, is_active, is_staff, is_superuser)
+_lock = threading.Lock()
+
+
+def cache_ttl():
+    return getattr(settings, "LIBRARY_AUTH_CACHE_TTL", 60)
+
+
+def forget_user(user_id):
+    """Drop a user's cached flags, e.g. after the account was saved or deleted."""
+    with _lock:
+        _flags.pop(user_id, None)
+
+
+def clear_cache():
+    with _lock:
+        _flags.clear()
+
+
+def flags_query(user_model, user_id):
+    return user_model.objects.filter(pk=user_id).values_list(user_model.USERNAME_FIELD, *FLAG_FIELDS)
+
+
+def remember_flags(user_id, row):
+    if row is None:
+        return None
+    entry = (time.monotonic(), *row)
+    with _lock:
+        if len(_flags) >= MAX_ENTRIES:
+            _flags.clear()
+        _flags[user_id] = entry
+    return entry
+
+
+def cached_flags(user_id):
+    entry = _flags.get(user_id)
+    if entry is None or time.monotonic() - entry[0] > cache_ttl():
+        metrics.cache_lookup("auth", "miss")
+        return None
+    metrics.cache_lookup("auth", "hit")
+    return entry
+
+
+def lazy_user(user_model, user_id, username, is_active, is_staff, is_superuser):
+    """
+    A real `User` instance with only the id, username and flags loaded. Every other field
+    is deferred, so it is fetched from the database only if a view actually reads it.
+    """
+    loaded = {
+        "id": user_id,
+        user_model.USERNAME_FIELD: username,
+        "is_active": is_active,
+        "is_staff": is_staff,
+        "is_superuser": is_superuser,
+    }
+    fields = [field.attname for field in user_model._meta.concrete_fields if field.attname in loaded]
+    return user_model.from_db(user_model.objects.db, fields, [loaded[name] for name in fields])
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    def authenticate(self, request):
+        with timing.measure("auth"):
+            return super().authenticate(request)
+
+    def get_user(self, validated_token):
+        user_model = get_user_model()
+        if self.needs_row(user_model):
+            return super().get_user(validated_token)
+        user_id = self.user_id(user_model, validated_token)
+        entry = cached_flags(user_id) or remember_flags(
+            user_id, flags_query(user_model, user_id).first()
+        )
+        return self.build_user(user_model, user_id, entry)
+
+    async def aauthenticate(self, request):
+        """`authenticate()` for async views: token checks are pure, the flag lookup is awaited."""
+        with timing.measure("auth"):
+            header = self.get_header(request)
+            if header is None:
+                return None
+            raw_token = self.get_raw_token(header)
+            if raw_token is None:
+                return None
+            validated_token = self.get_validated_token(raw_token)
+            return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        user_model = get_user_model()
+        if self.needs_row(user_model):
+            return await sync_to_async(super().get_user)(validated_token)
+        user_id = self.user_id(user_model, validated_token)
+        entry = cached_flags(user_id) or remember_flags(
+            user_id, await flags_query(user_model, user_id).afirst()
+        )
+        return self.build_user(user_model, user_id, entry)
+
+    @staticmethod
+    def needs_row(user_model):
+        # Revocation needs the password hash; keep the stock row lookup for that
+        return (
+            api_settings.CHECK_REVOKE_TOKEN
+            or api_settings.USER_ID_FIELD != user_model._meta.pk.attname
+            or LOOKUP_SEP in api_settings.USER_ID_FIELD
+        )
+
+    @staticmethod
+    def user_id(user_model, validated_token):
+        try:
+            return user_model._meta.pk.to_python(validated_token[api_settings.USER_ID_CLAIM])
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+    @staticmethod
+    def build_user(user_model, user_id, entry):
+        if entry is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        loaded_at, username, is_active, is_staff, is_superuser = entry
+        if api_settings.CHECK_USER_IS_ACTIVE and not is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return lazy_user(user_model, user_id, username, is_active, is_staff, is_superuser)
@@ -0,0 +1,127 @@
+# library/caching.py
+# Response cache for catalog reads (BookViewSet list/retrieve) on Django's cache framework.
+# A single global catalog version is bumped on every Book write, including inventory changes
+# from borrows and returns. Cached bodies and ETags embed the version, so a bump invalidates
+# everything at once and `If-None-Match` can be answered with a 304 without the database.
+# Run several workers against a shared cache backend (CACHE_BACKEND), otherwise each worker
+# only sees its own bumps; the cache is therefore off by default with the local-memory one.
+import hashlib
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_cache_control
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from . import metrics, routing
+
+VERSION_KEY = "library:catalog:version"
+MODIFIED_KEY = "library:catalog:modified"
+RESPONSE_KEY = "library:catalog:response:{version}:{digest}"
+
+
+def cache_enabled():
+    return getattr(settings, "LIBRARY_CATALOG_CACHE", False)
+
+
+def catalog_state():
+    """Return `(version, last_modified)`, starting a new version if the cache lost it."""
+    state = cache.get_many([VERSION_KEY, MODIFIED_KEY])
+    if VERSION_KEY in state and MODIFIED_KEY in state:
+        return state[VERSION_KEY], state[MODIFIED_KEY]
+    return bump_version()
+
+
+def bump_version():
+    modified = int(time.time())
+    try:
+        version = cache.incr(VERSION_KEY)
+    except ValueError:
+        # Never reuse a number a client may still hold in an ETag
+        version = time.time_ns()
+        cache.set(VERSION_KEY, version, timeout=None)
+    cache.set(MODIFIED_KEY, modified, timeout=None)
+    return version, modified
+
+
+def invalidate_catalog():
+    """
+    Bump the version now and again when the surrounding transaction commits, so responses
+    cached from data read while the write was in flight are invalidated as well.
+    """
+    bump_version()
+    if connection.in_atomic_block:
+        transaction.on_commit(bump_version)
+
+
+def request_digest(request):
+    material = f"{request.accepted_media_type}|{request.build_absolute_uri()}"
+    return hashlib.sha1(material.encode()).hexdigest()
+
+
+# Adds versioned caching, strong ETags and Last-Modified to a viewset's read actions
+class CatalogCacheMixin:
+    cached_actions = ("list", "retrieve")
+
+    def perform_authentication(self, request):
+        # Catalog reads are public: authenticate lazily so a 304 needs no user lookup
+        if self.action not in self.cached_actions:
+            super().perform_authentication(request)
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        if (
+            not cache_enabled()
+            or request.accepted_renderer.format != "json"
+            or routing.pinned_request(request)  # Reads their own writes from the primary
+        ):
+            return handler(request, *args, **kwargs)
+
+        # Read the version before the data: a write committing mid-request bumps it, so the
+        # entry stored below lands under a dead version instead of serving stale rows
+        version, modified = catalog_state()
+        digest = request_digest(request)
+        etag = f'"{version}-{digest[:16]}"'
+
+        if self.not_modified(request, etag, modified):
+            metrics.cache_lookup("catalog", "not_modified")
+            return self.with_validators(HttpResponseNotModified(), etag, modified)
+
+        key = RESPONSE_KEY.format(version=version, digest=digest)
+        cached = cache.get(key)
+        if cached is not None:
+            metrics.cache_lookup("catalog", "hit")
+            content, content_type = cached
+            return self.with_validators(HttpResponse(content, content_type=content_type), etag, modified)
+
+        metrics.cache_lookup("catalog", "miss")
+        response = handler(request, *args, **kwargs)
+        # Replica rows may predate the version: neither stored nor given an ETag to revalidate
+        if response.status_code == 200 and not routing.read_from_replica():
+            timeout = getattr(settings, "LIBRARY_CATALOG_CACHE_TIMEOUT", 300)
+            response.add_post_render_callback(
+                lambda rendered: cache.set(key, (rendered.content, rendered["Content-Type"]), timeout)
+            )
+            self.with_validators(response, etag, modified)
+        return response
+
+    @staticmethod
+    def not_modified(request, etag, modified):
+        if_none_match = request.META.get("HTTP_IF_NONE_MATCH")
+        if if_none_match:
+            return etag in parse_etags(if_none_match) or if_none_match.strip() == "*"
+        if_modified_since = parse_http_date_safe(request.META.get("HTTP_IF_MODIFIED_SINCE", ""))
+        return if_modified_since is not None and modified <= if_modified_since
+
+    @staticmethod
+    def with_validators(response, etag, modified):
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(modified)
+        # Clients may keep the body but must revalidate it with the ETag on every use
+        patch_cache_control(response, public=True, no_cache=True)
+        return response
@@ -0,0 +1,101 @@
+# library/exports.py
+# Streaming NDJSON/CSV exports of the catalog, loans and archived loan history for reporting jobs.
+# Rows come from `values_list(...).iterator(chunk_size=...)` (a server-side cursor on
+# PostgreSQL), are encoded without serializers and are written out in small batches, so
+# memory stays constant however many rows are exported.
+import csv
+import io
+import json
+from datetime import date
+from rest_framework import renderers
+from .models import Book, Loan, LoanArchive
+
+CHUNK_SIZE = 2000  # Rows fetched from the cursor per round trip
+FLUSH_ROWS = 500  # Rows encoded per chunk of the response body
+
+BOOK_COLUMNS = ("id", "name", "author", "year_published", "category", "inventory", "image_url")
+LOAN_COLUMNS = (
+    ("id", "id"),
+    ("user_id", "user_id"),
+    ("username", "user__username"),
+    ("book_id", "book_id"),
+    ("book_name", "book__name"),
+    ("type", "type"),
+    ("loan_date", "loan_date"),
+    ("return_date", "return_date"),
+    ("returned", "returned"),
+)
+
+CONTENT_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+def book_rows(queryset=None):
+    queryset = Book.objects.all() if queryset is None else queryset
+    return BOOK_COLUMNS, queryset.order_by("id").values_list(*BOOK_COLUMNS)
+
+
+def loan_rows(queryset=None):
+    """Loans with the borrower's username and the book name joined in."""
+    queryset = Loan.objects.all() if queryset is None else queryset
+    columns = tuple(name for name, _ in LOAN_COLUMNS)
+    return columns, queryset.order_by("id").values_list(*(path for _, path in LOAN_COLUMNS))
+
+
+def loan_history_rows(queryset=None):
+    """Archived loans (library/archive.py) in the loans export's columns."""
+    queryset = LoanArchive.objects.all() if queryset is None else queryset
+    return loan_rows(queryset)
+
+
+def _json_default(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f"Cannot export {type(value).__name__}")
+
+
+def stream_ndjson(columns, rows):
+    encode = json.JSONEncoder(ensure_ascii=False, default=_json_default).encode
+    lines = []
+    for row in rows.iterator(chunk_size=CHUNK_SIZE):
+        lines.append(encode(dict(zip(columns, row))))
+        # Flush the first row on its own so clients see a byte as soon as the query returns
+        if len(lines) >= FLUSH_ROWS or len(lines) == 1:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+def stream_csv(columns, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    yield buffer.getvalue()  # The header goes out before the query runs
+    pending = 0
+    for row in rows.iterator(chunk_size=CHUNK_SIZE):
+        if pending == 0:
+            buffer.seek(0)
+            buffer.truncate()
+        writer.writerow(row)
+        pending += 1
+        if pending >= FLUSH_ROWS:
+            yield buffer.getvalue()
+            pending = 0
+    if pending:
+        yield buffer.getvalue()
+
+
+STREAMERS = {"ndjson": stream_ndjson, "csv": stream_csv}
+
+
+# Lets export requests pass content negotiation whatever `Accept` says (text/csv, */*...).
+# The body is a StreamingHttpResponse; only error payloads are rendered, as JSON.
+class PassthroughRenderer(renderers.BaseRenderer):
+    media_type = "*/*"
+    format = "export"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data).encode() if data is not None else b""
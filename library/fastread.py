@@ -0,0 +1,179 @@
+# library/fastread.py
+# Fast path for read-only list and retrieve calls (LIBRARY_FAST_READS). A ModelSerializer
+# instantiates model objects and walks every field's get_attribute()/to_representation() for
+# every row. Here a serializer class is compiled once into `(key, column, converter)` triples,
+# and rows come straight from `.values()` dicts:
+# - text, integer, boolean, choice and primary-key fields are the database value itself, so
+#   they are copied as they are;
+# - other fields (dates, datetimes...) go through the serializer field's own
+#   `to_representation()`.
+# The rows are rendered with library/renderers.py, so a response is the regular serializer's
+# JSON byte for byte.
+#
+# Serializers with fields `.values()` cannot reproduce keep the regular path. That covers
+# method fields, nested serializers, custom `get_attribute()` and sources through a nullable
+# relation.
+from operator import itemgetter
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models
+from rest_framework import serializers
+from rest_framework.fields import Field
+from rest_framework.generics import get_object_or_404
+from rest_framework.permissions import BasePermission
+from rest_framework.relations import PrimaryKeyRelatedField, RelatedField
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from . import timing
+from .pagination import keyset_ordering
+from .renderers import FastJSONRenderer
+
+# Field representations that return a value of these model fields unchanged
+IDENTITY = {
+    serializers.CharField.to_representation: (models.CharField, models.TextField),
+    serializers.IntegerField.to_representation: (models.IntegerField,),
+    serializers.BooleanField.to_representation: (models.BooleanField,),
+    serializers.ChoiceField.to_representation: (models.Field,),
+    serializers.ReadOnlyField.to_representation: (models.Field,),
+}
+
+_compiled = {}
+
+
+def fast_reads_enabled():
+    return getattr(settings, "LIBRARY_FAST_READS", True)
+
+
+def model_field(model, attrs):
+    """The model field `attrs` (a serializer field's `source_attrs`) ends on, or None."""
+    if not attrs:
+        return None  # source="*"
+    for position, attr in enumerate(attrs):
+        try:
+            field = model._meta.get_field(attr)
+        except FieldDoesNotExist:
+            return None  # A property or method
+        if not field.concrete:
+            return None  # Reverse relations
+        if position == len(attrs) - 1:
+            return field
+        if not field.many_to_one and not field.one_to_one or field.null:
+            # Through a missing related object the serializer skips or nulls the key
+            return None
+        model = field.related_model
+
+
+class RowSerializer:
+    """A serializer class compiled for `.values()` rows."""
+
+    def __init__(self, serializer_class):
+        serializer = serializer_class()
+        model = serializer_class.Meta.model
+        self.keys, self.columns, self.converters = [], [], []
+        self.floats = False  # Whether a value may be a float (FastJSONRenderer cannot tell)
+        self.supported = True
+        for field in serializer.fields.values():
+            if field.write_only:
+                continue
+            target = model_field(model, field.source_attrs)
+            converter = self.converter(field, target)
+            if converter is False:
+                self.supported = False
+                return
+            self.keys.append(field.field_name)
+            self.columns.append("__".join(field.source_attrs))
+            if converter is not None:
+                self.converters.append((field.field_name, converter))
+            self.floats |= isinstance(target, (models.FloatField, models.DecimalField)) or (
+                isinstance(field, (serializers.FloatField, serializers.DecimalField))
+            )
+        if len(self.columns) == 1:
+            self.getter = lambda row, column=self.columns[0]: (row[column],)
+        else:
+            self.getter = itemgetter(*self.columns)
+
+    @staticmethod
+    def converter(field, target):
+        """None for a value copied as is, a callable, or False when unsupported."""
+        if target is None:
+            return False
+        if isinstance(field, PrimaryKeyRelatedField):
+            return None if target.is_relation and field.pk_field is None else False
+        if isinstance(field, (RelatedField, serializers.BaseSerializer)) or target.is_relation:
+            return False
+        if type(field).get_attribute is not Field.get_attribute:
+            return False
+        if isinstance(target, IDENTITY.get(type(field).to_representation, ())):
+            return None
+        return field.to_representation
+
+    def values(self, queryset):
+        """`queryset` as `.values()` rows, with the columns keyset pagination reads too."""
+        order_by = queryset.query.order_by or queryset.model._meta.ordering
+        extra = [
+            name for name in (field.lstrip("-") for field in keyset_ordering(order_by))
+            if name not in self.columns
+        ]
+        return queryset.values(*self.columns, *extra)
+
+    def represent(self, rows):
+        with timing.measure("serialize"):
+            keys, getter, converters = self.keys, self.getter, self.converters
+            data = [dict(zip(keys, getter(row))) for row in rows]
+            if converters:
+                for item in data:
+                    for key, converter in converters:
+                        value = item[key]
+                        if value is not None:  # Serializers render None without the field
+                            item[key] = converter(value)
+            return data
+
+
+def compile_serializer(serializer_class):
+    """The cached RowSerializer for `serializer_class`, or None if it is not supported."""
+    rows = _compiled.get(serializer_class)
+    if rows is None:
+        rows = _compiled.setdefault(serializer_class, RowSerializer(serializer_class))
+    return rows if rows.supported else None
+
+
+# Serves a viewset's list and retrieve actions from `.values()` rows (see above), and renders
+# its JSON with orjson when its serializer cannot produce floats.
+class FastReadMixin:
+    def fast_rows(self):
+        if not fast_reads_enabled():
+            return None
+        return compile_serializer(self.get_serializer_class())
+
+    def get_renderers(self):
+        renderers = super().get_renderers()
+        rows = self.fast_rows()
+        if rows is None or rows.floats:
+            return renderers
+        return [
+            FastJSONRenderer() if type(renderer) is JSONRenderer else renderer
+            for renderer in renderers
+        ]
+
+    def list(self, request, *args, **kwargs):
+        rows = self.fast_rows()
+        if rows is None:
+            return super().list(request, *args, **kwargs)
+        queryset = rows.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(rows.represent(page))
+        return Response(rows.represent(queryset))
+
+    def retrieve(self, request, *args, **kwargs):
+        rows = self.fast_rows()
+        # Object permissions may read attributes a `.values()` row does not have
+        if rows is None or any(
+            type(permission).has_object_permission is not BasePermission.has_object_permission
+            for permission in self.get_permissions()
+        ):
+            return super().retrieve(request, *args, **kwargs)
+        queryset = rows.values(self.filter_queryset(self.get_queryset()))
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        row = get_object_or_404(queryset, **{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        return Response(rows.represent([row])[0])
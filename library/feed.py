@@ -0,0 +1,246 @@
+# library/feed.py
+# Live inventory feed behind the SSE endpoint /api/library/async/inventory-feed/.
+# Stock changes (library/inventory.py, Book signals) call `books_changed()`; once the
+# transaction commits, the books' current inventory is read once and published through the
+# configured backend as `{"book_id": ..., "inventory": ...}` deltas (`null` inventory means
+# the book was deleted). Bulk changes publish a single `resync` event instead.
+#
+# Each worker process has one `broadcaster`. It renders every event to bytes once and hands
+# it to all connected clients with one thread-safe call per event loop, so publishing costs
+# the same for one client as for thousands. Backends (LIBRARY_INVENTORY_FEED):
+# - "local": in-process only. Right for one worker, and the stand-in for tests and dev.
+# - "postgres": NOTIFY on publish; every worker LISTENs on its own connection, so deltas
+#   reach clients of all workers and servers.
+# - "off": publish nothing.
+import asyncio
+import json
+import logging
+import threading
+from django.conf import settings
+from django.db import connection, connections, transaction
+from .models import Book
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "library_inventory"
+QUEUE_SIZE = 1000  # Events buffered per client before it is told to resync
+HEARTBEAT = 15  # Seconds between keep-alive comments on an idle stream
+RESYNC = ("resync", "{}")
+
+
+def render(event, data):
+    return f"event: {event}\ndata: {data}\n\n".encode()
+
+
+class Subscription:
+    """One connected client: a bounded queue of rendered events, read on its event loop."""
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+
+    def put(self, chunks):
+        for chunk in chunks:
+            try:
+                self.queue.put_nowait(chunk)
+            except asyncio.QueueFull:
+                # A client this far behind cannot catch up from deltas; have it refetch
+                while not self.queue.empty():
+                    self.queue.get_nowait()
+                self.queue.put_nowait(render(*RESYNC))
+                return
+
+    async def next(self, timeout):
+        """The next rendered event, or None after `timeout` seconds of silence."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class Broadcaster:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}  # event loop -> set of Subscriptions
+
+    def subscribe(self):
+        subscription = Subscription(asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers.setdefault(subscription.loop, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.loop)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.loop]
+
+    def has_subscribers(self):
+        return bool(self._subscribers)
+
+    def deliver(self, messages):
+        """Send `(event, data)` messages to every client. Safe to call from any thread."""
+        chunks = [render(event, data) for event, data in messages]
+        with self._lock:
+            loops = list(self._subscribers)
+        for loop in loops:
+            try:
+                loop.call_soon_threadsafe(self._fan_out, loop, chunks)
+            except RuntimeError:  # Loop already closed
+                pass
+
+    def _fan_out(self, loop, chunks):
+        with self._lock:
+            subscribers = list(self._subscribers.get(loop, ()))
+        for subscription in subscribers:
+            subscription.put(chunks)
+
+
+broadcaster = Broadcaster()
+
+
+class EventStream:
+    """
+    A client's SSE response body. Django calls `close()` when the response ends, including
+    when the client disconnects, which drops the subscription.
+    """
+
+    def __init__(self, subscription):
+        self.subscription = subscription
+        self.started = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self.started:
+            self.started = True
+            return b"retry: 5000\n" + render("ready", "{}")
+        chunk = await self.subscription.next(timeout=HEARTBEAT)
+        return chunk if chunk is not None else b": ping\n\n"
+
+    def close(self):
+        broadcaster.unsubscribe(self.subscription)
+
+
+class LocalBackend:
+    def wanted(self):
+        # Nobody to tell in this process: skip the post-commit read entirely
+        return broadcaster.has_subscribers()
+
+    def publish(self, messages):
+        broadcaster.deliver(messages)
+
+    def attach(self, loop):
+        pass
+
+
+class PostgresBackend:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loops = set()
+
+    def wanted(self):
+        return True
+
+    def publish(self, messages):
+        with connection.cursor() as cursor:
+            for event, data in messages:
+                cursor.execute("SELECT pg_notify(%s, %s)", [CHANNEL, f"{event}\n{data}"])
+
+    def attach(self, loop):
+        """Start this event loop's LISTEN connection the first time a client subscribes."""
+        with self._lock:
+            if loop in self._loops:
+                return
+            self._loops.add(loop)
+        loop.create_task(self._listen(loop))
+
+    def _connect(self):
+        wrapper = connections["default"]
+        raw = wrapper.Database.connect(**wrapper.get_connection_params())
+        raw.autocommit = True
+        with raw.cursor() as cursor:
+            cursor.execute(f"LISTEN {CHANNEL}")
+        return raw
+
+    async def _listen(self, loop):
+        reconnecting = False
+        while True:
+            try:
+                raw = await loop.run_in_executor(None, self._connect)
+            except Exception:
+                logger.exception("Inventory feed: cannot LISTEN, retrying in 5s")
+                await asyncio.sleep(5)
+                continue
+            readable = asyncio.Event()
+            loop.add_reader(raw.fileno(), readable.set)
+            try:
+                if reconnecting:  # Notifications sent while disconnected are lost
+                    broadcaster.deliver([RESYNC])
+                while True:
+                    await readable.wait()
+                    readable.clear()
+                    raw.poll()
+                    messages = [tuple(notify.payload.split("\n", 1)) for notify in raw.notifies]
+                    raw.notifies.clear()
+                    if messages:
+                        broadcaster.deliver(messages)
+            except Exception:
+                logger.exception("Inventory feed: LISTEN connection lost, reconnecting")
+            finally:
+                loop.remove_reader(raw.fileno())
+                raw.close()
+            reconnecting = True
+            await asyncio.sleep(1)
+
+
+BACKENDS = {"local": LocalBackend, "postgres": PostgresBackend}
+_backends = {}
+
+
+def get_backend():
+    """The configured backend (one instance per name), or None when the feed is off."""
+    name = getattr(settings, "LIBRARY_INVENTORY_FEED", "local")
+    if name not in BACKENDS:
+        return None
+    if name not in _backends:
+        _backends[name] = BACKENDS[name]()
+    return _backends[name]
+
+
+def subscribe():
+    """Register a client on the running event loop (from async code only)."""
+    backend = get_backend()
+    if backend is not None:
+        backend.attach(asyncio.get_running_loop())
+    return broadcaster.subscribe()
+
+
+def publish_inventory(book_ids):
+    backend = get_backend()
+    if backend is None or not backend.wanted():
+        return
+    stock = dict(Book.objects.filter(pk__in=book_ids).values_list("pk", "inventory"))
+    backend.publish([
+        ("inventory", json.dumps({"book_id": pk, "inventory": stock.get(pk)}))
+        for pk in book_ids
+    ])
+
+
+def books_changed(book_ids):
+    """Publish these books' inventory once the current transaction commits."""
+    backend = get_backend()
+    if backend is None or not backend.wanted():
+        return
+    book_ids = sorted(set(book_ids))
+    transaction.on_commit(lambda: publish_inventory(book_ids))
+
+
+def resync():
+    """Tell clients to refetch the catalog, after bulk changes too large to send as deltas."""
+    backend = get_backend()
+    if backend is not None and backend.wanted():
+        transaction.on_commit(lambda: backend.publish([RESYNC]))
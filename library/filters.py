@@ -0,0 +1,73 @@
+# library/filters.py
+from django.utils.dateparse import parse_date
+from rest_framework import filters
+from rest_framework.exceptions import ValidationError
+from rest_framework.settings import api_settings
+from .search import get_search_backend
+
+
+def parse_bool_param(value):
+    if value is None:
+        return None
+    value = value.strip().lower()
+    if value in ("true", "1", "yes"):
+        return True
+    if value in ("false", "0", "no"):
+        return False
+    raise ValueError(value)
+
+
+def parse_date_param(value):
+    if value is None:
+        return None
+    parsed = parse_date(value)
+    if parsed is None:
+        raise ValueError(value)
+    return parsed
+
+
+# Filters loans by `returned`, due-date window (`due_after`/`due_before`, inclusive),
+# loan-date window (`loaned_after`/`loaned_before`, inclusive) and, for admins, by `user`.
+class LoanFilter(filters.BaseFilterBackend):
+    def filter_queryset(self, request, queryset, view):
+        params = request.query_params
+        try:
+            returned = parse_bool_param(params.get("returned"))
+            due_after = parse_date_param(params.get("due_after"))
+            due_before = parse_date_param(params.get("due_before"))
+            loaned_after = parse_date_param(params.get("loaned_after"))
+            loaned_before = parse_date_param(params.get("loaned_before"))
+            user_id = int(params["user"]) if params.get("user") else None
+        except ValueError as exc:
+            raise ValidationError({"error": f"Invalid filter value: {exc}"})
+
+        if returned is not None:
+            queryset = queryset.filter(returned=returned)
+        if due_after is not None:
+            queryset = queryset.filter(return_date__gte=due_after)
+        if due_before is not None:
+            queryset = queryset.filter(return_date__lte=due_before)
+        if loaned_after is not None:
+            queryset = queryset.filter(loan_date__gte=loaned_after)
+        if loaned_before is not None:
+            queryset = queryset.filter(loan_date__lte=loaned_before)
+        if user_id is not None and request.user.is_staff:
+            queryset = queryset.filter(user_id=user_id)
+        return queryset
+
+
+# `?search=` over the catalog through the full-text backend in library/search.py.
+# Results are ordered by relevance unless the client asks for an explicit `?ordering=`.
+class CatalogSearchFilter(filters.SearchFilter):
+    def filter_queryset(self, request, queryset, view):
+        text = request.query_params.get(self.search_param, "").strip()
+        if not text:
+            return queryset
+
+        backend = get_search_backend(queryset.db)
+        queryset = backend.search(queryset, text)
+        if "search_rank" in queryset.query.annotations and not request.query_params.get(
+            api_settings.ORDERING_PARAM
+        ):
+            queryset = queryset.order_by("-search_rank")
+        return queryset
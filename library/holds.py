@@ -0,0 +1,86 @@
+# library/holds.py
+# FIFO hold queues for out-of-stock books. These helpers only move holds between states;
+# the stock side (taking copies, putting them back) stays in library/inventory.py, which
+# calls `allocate()` on every return path and `ready_holds()`/`fulfil()` on every borrow.
+#
+# A returned copy never reaches the shelf while a hold is waiting: it is given to the oldest
+# waiting hold in the same transaction, so patrons watch one small `my_holds` query instead
+# of polling the catalog for stock. Queue heads are locked with SKIP LOCKED where supported,
+# so concurrent returns of the same title hand their copies to different holds.
+from collections import Counter
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import Case, Count, IntegerField, OuterRef, Subquery, When
+from django.utils.timezone import now
+from .models import Hold
+
+
+def pickup_deadline():
+    return now().date() + timedelta(days=getattr(settings, "LIBRARY_HOLD_PICKUP_DAYS", 3))
+
+
+def allocate(returned):
+    """
+    Give returned copies (`{book_id: count}`) to the oldest waiting holds of each book.
+    Returns a Counter of the copies allocated per book; the rest belong on the shelf.
+    """
+    allocated = Counter()
+    waiting = set(
+        Hold.objects.filter(book_id__in=list(returned), status=Hold.WAITING)
+        .values_list("book_id", flat=True)
+        .distinct()
+    )
+    ready_until = pickup_deadline()
+    for book_id in sorted(waiting):
+        head = list(
+            Hold.objects.select_for_update(skip_locked=True)
+            .filter(book_id=book_id, status=Hold.WAITING)
+            .order_by("pk")
+            .values_list("pk", flat=True)[: returned[book_id]]
+        )
+        allocated[book_id] = Hold.objects.filter(pk__in=head, status=Hold.WAITING).update(
+            status=Hold.READY, ready_until=ready_until
+        )
+    return +allocated
+
+
+def ready_holds(user_id, book_ids):
+    """Lock a patron's holds that are ready for pickup among `book_ids`: `{book_id: hold_id}`."""
+    return {
+        book_id: pk
+        for pk, book_id in Hold.objects.select_for_update()
+        .filter(user_id=user_id, book_id__in=list(book_ids), status=Hold.READY)
+        .values_list("pk", "book_id")
+    }
+
+
+def fulfil(hold_ids):
+    Hold.objects.filter(pk__in=list(hold_ids), status=Hold.READY).update(status=Hold.FULFILLED)
+
+
+def queue_position():
+    # 1-based place of a waiting hold in its book's queue (served by hold_waiting_queue_idx)
+    return Subquery(
+        Hold.objects.filter(
+            book_id=OuterRef("book_id"), status=Hold.WAITING, pk__lte=OuterRef("pk")
+        )
+        .order_by()
+        .values("book_id")
+        .annotate(position=Count("pk"))
+        .values("position")[:1]
+    )
+
+
+def open_holds(user_id):
+    """A patron's waiting and ready holds, with queue positions for waiting ones, in one query."""
+    return (
+        Hold.objects.filter(user_id=user_id, status__in=Hold.OPEN)
+        .select_related("book")
+        .only("id", "status", "created_at", "ready_until", "book__id", "book__name")
+        .annotate(
+            position=Case(
+                When(status=Hold.WAITING, then=queue_position()), output_field=IntegerField()
+            )
+        )
+        .order_by("pk")
+    )
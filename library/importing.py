@@ -0,0 +1,237 @@
+# library/importing.py
+# Bulk imports shared by `manage.py import_books` / `import_users` and the insert_*.py scripts.
+# Rows are streamed in fixed-size chunks and validated with the API serializers' field rules.
+# Books are upserted with `bulk_create(update_conflicts=True)` keyed on (name, author); users
+# have their passwords hashed in a process pool and are inserted with `bulk_create`. Memory
+# stays flat and the database sees a few statements per chunk instead of several per row.
+import csv
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+from rest_framework import serializers
+from rest_framework.fields import SkipField, empty
+from rest_framework.validators import UniqueValidator
+from . import caching, feed, stats, suggest
+from .models import Book, LoanSummary
+from .serializers import BookSerializer, UserSerializer
+
+NATURAL_KEY = ("name", "author")
+# Not `inventory`: an existing title's shelf count also reflects copies out on loan and copies
+# set aside for holds, which the file knows nothing about. Stock changes go through the
+# inventory service (library/inventory.py).
+UPDATE_FIELDS = ("year_published", "category", "image_url")
+
+
+def chunked(rows, size):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def read_rows(stream, fmt):
+    """Yield `(line_number, row)` from a CSV (with header) or JSON Lines text stream."""
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            # CSV has no null: an empty cell means "use the model default"
+            yield reader.line_num, {key: value for key, value in row.items() if key and value != ""}
+    elif fmt == "jsonl":
+        for line_number, line in enumerate(stream, 1):
+            if line.strip():
+                try:
+                    yield line_number, json.loads(line)
+                except ValueError as exc:
+                    yield line_number, exc
+    else:
+        raise ValueError(f"Unsupported format: {fmt}")
+
+
+class ImportReport:
+    def __init__(self):
+        self.read = 0
+        self.written = 0
+        self.skipped = 0
+        self.rejected = 0
+        self.started = time.perf_counter()
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def rows_per_second(self):
+        return self.read / self.elapsed if self.elapsed else 0.0
+
+
+class RowValidator:
+    """
+    Runs a serializer's per-field validation without building a serializer per row.
+    Uniqueness checks are dropped: duplicates are resolved in bulk, not by a query per row.
+    """
+
+    def __init__(self, serializer):
+        self.fields = [field for field in serializer.fields.values() if not field.read_only]
+        for field in self.fields:
+            field.validators = [
+                validator for validator in field.validators
+                if not isinstance(validator, UniqueValidator)
+            ]
+
+    def __call__(self, row):
+        if not isinstance(row, dict):
+            raise serializers.ValidationError({"row": ["Expected an object."]})
+        data, errors = {}, {}
+        for field in self.fields:
+            try:
+                data[field.source] = field.run_validation(row.get(field.field_name, empty))
+            except SkipField:
+                pass
+            except serializers.ValidationError as exc:
+                errors[field.field_name] = exc.detail
+        if errors:
+            raise serializers.ValidationError(errors)
+        return data
+
+
+def validated(chunk, validate, report, on_reject):
+    for line_number, row in chunk:
+        report.read += 1
+        try:
+            if isinstance(row, Exception):
+                raise serializers.ValidationError({"row": [str(row)]})
+            yield validate(row)
+        except serializers.ValidationError as exc:
+            report.rejected += 1
+            if on_reject:
+                on_reject(line_number, row, exc.detail)
+
+
+def insert_new(model, rows, existing_keys, existing=None):
+    """
+    `bulk_create` the instances of `rows` (a dict keyed by natural key) whose key is not in
+    `existing_keys(keys)`, and return the inserted instances. A key taken by another writer
+    between the lookup and the insert fails the statement; the lookup then runs again, so
+    the result only ever covers rows this call wrote.
+    """
+    if existing is None:
+        existing = existing_keys(list(rows))
+    while True:
+        new = [instance for key, instance in rows.items() if key not in existing]
+        try:
+            with transaction.atomic():
+                model.objects.bulk_create(new)
+            return new
+        except IntegrityError:
+            retry = existing_keys(list(rows))
+            if retry == existing:
+                raise  # Not a key registered meanwhile
+            existing = retry
+
+
+def existing_books(keys):
+    names = {name for name, _ in keys}
+    found = Book.objects.filter(name__in=names).values_list(*NATURAL_KEY)
+    return set(found) & set(keys)
+
+
+def existing_usernames(usernames):
+    return set(User.objects.filter(username__in=usernames).values_list("username", flat=True))
+
+
+def import_books(rows, chunk_size=1000, update_existing=True, on_chunk=None, on_reject=None):
+    """
+    Import an iterable of `(line_number, row)`. Existing books (same name and author) are
+    updated except for their inventory, or left untouched with `update_existing=False`. `on_chunk(report)` is called
+    after every committed chunk and `on_reject(line_number, row, errors)` for invalid rows.
+    """
+    validate = RowValidator(BookSerializer())
+    report = ImportReport()
+    for chunk in chunked(rows, chunk_size):
+        books = {}
+        for data in validated(chunk, validate, report, on_reject):
+            # Last occurrence wins; one upsert statement may not touch the same row twice
+            books[(data["name"], data["author"])] = Book(**data)
+
+        with transaction.atomic():
+            if update_existing:
+                # The upsert does not say which rows it inserted: look the keys up first
+                existing = existing_books(list(books))
+                Book.objects.bulk_create(
+                    books.values(),
+                    update_conflicts=True,
+                    unique_fields=NATURAL_KEY,
+                    update_fields=UPDATE_FIELDS,
+                )
+                new = [book for key, book in books.items() if key not in existing]
+                report.written += len(books)
+            else:
+                new = insert_new(Book, books, existing_books)
+                report.written += len(new)
+                report.skipped += len(books) - len(new)
+            # bulk_create skips the Book signals that maintain the counters. Updated titles keep
+            # their inventory, so only the inserted books add copies.
+            stats.increment(stats.BOOKS, len(new))
+            stats.increment(stats.COPIES_IN_STOCK, sum(book.inventory for book in new))
+        if on_chunk:
+            on_chunk(report)
+
+    # The caches the Book signals would have dropped are dropped once at the end
+    suggest.invalidate_index()
+    caching.invalidate_catalog()
+    feed.resync()
+    return report
+
+
+def import_users(rows, batch_size=500, workers=None, on_batch=None, on_reject=None):
+    """
+    Import an iterable of `(line_number, row)` with UserSerializer fields. Usernames that
+    already exist are skipped with one `username IN (...)` lookup per batch. PBKDF2 hashing
+    dominates the cost, so passwords are hashed in a pool of `workers` processes (default:
+    one per CPU; `workers=1` hashes in this process).
+    """
+    validate = RowValidator(UserSerializer())
+    report = ImportReport()
+    workers = workers or os.cpu_count() or 1
+    # make_password is pickled by reference and needs only settings, never the app registry
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        for chunk in chunked(rows, batch_size):
+            users = {}
+            for data in validated(chunk, validate, report, on_reject):
+                if data["username"] in users:
+                    report.skipped += 1
+                users[data["username"]] = data
+            existing = existing_usernames(list(users))
+            new = [data for username, data in users.items() if username not in existing]
+            passwords = [data.pop("password") for data in new]
+            if pool:
+                chunksize = max(1, len(passwords) // (workers * 4))
+                hashes = pool.map(make_password, passwords, chunksize=chunksize)
+            else:
+                hashes = map(make_password, passwords)
+            hashed = {
+                data["username"]: User(password=password, **data)
+                for data, password in zip(new, hashes)
+            }
+            with transaction.atomic():
+                # Usernames registered since the lookup above are skipped as well
+                inserted = insert_new(User, hashed, existing_usernames, existing=set())
+                # bulk_create skips the User signals that count users and open their summaries
+                LoanSummary.objects.bulk_create(LoanSummary(user=user) for user in inserted)
+                stats.increment(stats.USERS, len(inserted))
+            report.written += len(inserted)
+            report.skipped += len(users) - len(inserted)
+            if on_batch:
+                on_batch(report)
+    finally:
+        if pool:
+            pool.shutdown()
+    return report
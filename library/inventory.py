@@ -0,0 +1,372 @@
+# library/inventory.py
+# Inventory service: the only place where book copies are taken off or put back on the shelf.
+# Every borrow and return path (API views, LoanSerializer, Django admin) goes through here so
+# stock changes are conditional UPDATEs that run in the same transaction as the loan write.
+# Returned copies go to waiting holds before the shelf (library/holds.py), and borrowing a
+# book with a hold ready for pickup takes the copy set aside for it.
+from collections import Counter
+from datetime import timedelta
+from functools import reduce
+from operator import or_
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, Q, Value, When
+from django.utils.timezone import now
+from . import caching, feed, holds, metrics, stats, summaries
+from .models import Book, Hold, Loan, LoanSummary
+
+
+class InventoryError(Exception):
+    """Base class for borrow and return failures raised by the inventory service."""
+
+
+class OutOfStock(InventoryError):
+    pass
+
+
+class OverdueLoans(InventoryError):
+    pass
+
+
+class AlreadyReturned(InventoryError):
+    pass
+
+
+class LoanLimitReached(InventoryError):
+    pass
+
+
+class InStock(InventoryError):
+    pass
+
+
+class AlreadyHeld(InventoryError):
+    pass
+
+
+class HoldClosed(InventoryError):
+    pass
+
+
+class BatchFailed(InventoryError):
+    """An all-or-nothing batch had failing items; nothing was applied."""
+
+    def __init__(self, results):
+        super().__init__("Some items could not be processed. Nothing was applied.")
+        self.results = results
+
+
+MAX_BATCH_SIZE = 50
+
+
+def due_date(loan_type):
+    return now().date() + timedelta(days=Loan.LOAN_DURATIONS.get(loan_type, 10))
+
+
+def has_overdue_loans(user_id):
+    summary = LoanSummary.objects.filter(pk=user_id).first()
+    if summary is None:
+        return Loan.objects.filter(
+            user_id=user_id, returned=False, return_date__lt=now().date()
+        ).exists()
+    return summary.is_overdue()
+
+
+def refuse(summary, check_overdue):
+    # Raise the reason a user's summary refused admission
+    if check_overdue and summary.is_overdue():
+        metrics.borrow_failed("overdue")
+        raise OverdueLoans("You have overdue books. Return them before borrowing more.")
+    metrics.borrow_failed("loan_limit")
+    raise LoanLimitReached(
+        f"You have reached the limit of {summaries.max_active_loans()} active loans."
+    )
+
+
+def take_copy(book_id):
+    """
+    Take one copy off the shelf with `UPDATE ... SET inventory = inventory - 1
+    WHERE id = ? AND inventory > 0`, so concurrent borrowers can never oversell.
+    """
+    updated = Book.objects.filter(pk=book_id, inventory__gt=0).update(
+        inventory=F("inventory") - 1
+    )
+    if not updated:
+        if not Book.objects.filter(pk=book_id).exists():
+            metrics.borrow_failed("not_found")
+            raise Book.DoesNotExist("Book matching query does not exist.")
+        metrics.borrow_failed("out_of_stock")
+        raise OutOfStock("This book is out of stock.")
+    stats.increment(stats.COPIES_IN_STOCK, -1)
+    caching.invalidate_catalog()  # Stock is part of the cached catalog responses
+    feed.books_changed([book_id])
+
+
+def put_back_copy(book_id):
+    shelve(Counter({book_id: 1}))
+
+
+def shelve(returned):
+    """
+    Put returned copies (`{book_id: count}`) back: first to the books' waiting holds, oldest
+    first, then the rest on the shelf with one set-based UPDATE. Returns the allocated Counter.
+    """
+    allocated = holds.allocate(returned)
+    shelf = Counter(returned) - allocated
+    if shelf:
+        Book.objects.filter(pk__in=shelf).update(
+            inventory=F("inventory") + Case(
+                *(When(pk=book_id, then=Value(count)) for book_id, count in shelf.items()),
+                default=Value(0),
+            )
+        )
+        stats.increment(stats.COPIES_IN_STOCK, sum(shelf.values()))
+        caching.invalidate_catalog()
+        feed.books_changed(shelf)
+    return allocated
+
+
+def issue_loan(loan, check_overdue=False, check_limit=None):
+    """
+    Save a new (unsaved) `Loan`, taking its copy in the same transaction. Admission is
+    checked against the user's `LoanSummary`: `check_overdue` blocks users with overdue
+    loans and `check_limit` (defaults to `check_overdue`) enforces LIBRARY_MAX_ACTIVE_LOANS.
+    """
+    if check_limit is None:
+        check_limit = check_overdue
+    with transaction.atomic():
+        if not loan.return_date:
+            loan.return_date = due_date(loan.type)
+        # Summary row first, then book, then counters: the lock order every path follows
+        admitted, summary = summaries.admit(
+            loan.user_id, 1, loan.return_date, check_overdue=check_overdue, check_limit=check_limit
+        )
+        if not admitted:
+            refuse(summary, check_overdue)
+        ready = holds.ready_holds(loan.user_id, [loan.book_id])
+        if ready:
+            holds.fulfil(ready.values())  # The copy was set aside for this patron on return
+        else:
+            take_copy(loan.book_id)
+        loan._summary_applied = True  # Tells the Loan post_save signal not to recount
+        loan.save()
+    metrics.borrowed()
+    return loan
+
+
+def borrow(user, book_id, loan_type=1, check_overdue=False, check_limit=None):
+    loan = Loan(user=user, book_id=book_id, type=loan_type, returned=False)
+    return issue_loan(loan, check_overdue=check_overdue, check_limit=check_limit)
+
+
+def close_loan(loan):
+    """
+    Mark a loan as returned and put its copy back. The `returned = false` guard makes
+    concurrent returns of the same loan count only once.
+    """
+    with transaction.atomic():
+        updated = Loan.objects.filter(pk=loan.pk, returned=False).update(returned=True)
+        if not updated:
+            metrics.return_failed("already_returned")
+            raise AlreadyReturned("This loan has already been returned.")
+        # Same order as borrows (summary, book, copies counter, loans counters) so they never deadlock
+        summaries.recompute([loan.user_id])
+        put_back_copy(loan.book_id)
+        stats.increment(stats.ACTIVE_LOANS, -1)
+    metrics.returned()
+    loan.returned = True
+    return loan
+
+
+def borrow_many(user, book_ids, loan_type=1, check_overdue=False, atomic=True, check_limit=None):
+    """
+    Borrow several books for one patron in a single transaction: one locked read of the
+    user's summary for admission, one locking read of the books, one set-based stock UPDATE
+    and one bulk INSERT of loans. Returns a result per requested book, in order; a book
+    listed twice borrows two copies. Items beyond the active-loan limit fail individually.
+    With `atomic=True` any failing item raises `BatchFailed` and nothing is applied.
+    """
+    if check_limit is None:
+        check_limit = check_overdue
+    limit = summaries.max_active_loans() if check_limit else None
+    results = []
+    with transaction.atomic():
+        summary = summaries.lock(user.id)
+        if check_overdue and summary.is_overdue():
+            metrics.borrow_failed("overdue")
+            raise OverdueLoans(
+                "You have overdue books. Return them before borrowing more."
+            )
+        slots = None if limit is None else max(limit - summary.active_loans, 0)
+        # Copies set aside for this patron's ready holds count as stock for them
+        ready = holds.ready_holds(user.id, set(book_ids))
+        # Lock in primary key order, like every other multi-row write, to avoid deadlocks
+        stock = dict(
+            Book.objects.select_for_update()
+            .filter(pk__in=set(book_ids))
+            .order_by("pk")
+            .values_list("pk", "inventory")
+        )
+        taken = Counter()
+        for book_id in book_ids:
+            if book_id not in stock:
+                metrics.borrow_failed("not_found")
+                results.append({"book_id": book_id, "error": "Book not found."})
+            elif stock[book_id] + (book_id in ready) - taken[book_id] < 1:
+                metrics.borrow_failed("out_of_stock")
+                results.append({"book_id": book_id, "error": "This book is out of stock."})
+            elif slots is not None and sum(taken.values()) >= slots:
+                metrics.borrow_failed("loan_limit")
+                results.append({
+                    "book_id": book_id,
+                    "error": f"You have reached the limit of {limit} active loans.",
+                })
+            else:
+                taken[book_id] += 1
+                results.append({"book_id": book_id})
+        if atomic and any("error" in result for result in results):
+            raise BatchFailed(results)
+        borrowed = [result for result in results if "error" not in result]
+        if not borrowed:
+            return results
+
+        return_date = due_date(loan_type)
+        admitted, summary = summaries.admit(
+            user.id, len(borrowed), return_date, check_overdue=check_overdue, check_limit=check_limit
+        )
+        if not admitted:  # Only if a concurrent borrow changed the (unlocked, on SQLite) row
+            refuse(summary, check_overdue)
+        claimed = Counter({book_id: 1 for book_id in ready if taken[book_id]})
+        holds.fulfil(ready[book_id] for book_id in claimed)
+        if taken - claimed:
+            _take_copies(taken - claimed)
+        loans = Loan.objects.bulk_create(
+            Loan(user=user, book_id=result["book_id"], type=loan_type,
+                 return_date=return_date, returned=False)
+            for result in borrowed
+        )
+        for result, loan in zip(borrowed, loans):
+            result["loan_id"] = loan.id
+        # bulk_create skips the Loan signals that maintain these counters
+        stats.increment(stats.LOANS, len(loans))
+        stats.increment(stats.ACTIVE_LOANS, len(loans))
+    metrics.borrowed(len(loans))
+    return results
+
+
+def _take_copies(taken):
+    # The per-row `inventory >= n` guard keeps this safe even where row locks are no-ops
+    updated = Book.objects.filter(
+        reduce(or_, (Q(pk=book_id, inventory__gte=count) for book_id, count in taken.items()))
+    ).update(
+        inventory=F("inventory") - Case(
+            *(When(pk=book_id, then=Value(count)) for book_id, count in taken.items()),
+            default=Value(0),
+        )
+    )
+    if updated != len(taken):
+        metrics.borrow_failed("out_of_stock")
+        raise OutOfStock("This book is out of stock.")
+    stats.increment(stats.COPIES_IN_STOCK, -sum(taken.values()))
+    caching.invalidate_catalog()
+    feed.books_changed(taken)
+
+
+def return_many(loan_ids, user=None, atomic=True):
+    """
+    Close several loans in one transaction with one UPDATE of the loans and one set-based
+    UPDATE of the books. `user` restricts the batch to that patron's loans. Returns a
+    result per distinct loan id; with `atomic=True` any failing item raises `BatchFailed`.
+    """
+    loan_ids = list(dict.fromkeys(loan_ids))
+    results = []
+    with transaction.atomic():
+        loans = Loan.objects.select_for_update().filter(pk__in=loan_ids).order_by("pk")
+        if user is not None:
+            loans = loans.filter(user=user)
+        rows = {
+            pk: (book_id, returned, user_id)
+            for pk, book_id, returned, user_id in loans.values_list(
+                "pk", "book_id", "returned", "user_id"
+            )
+        }
+        returned_books = Counter()
+        for loan_id in loan_ids:
+            if loan_id not in rows:
+                metrics.return_failed("not_found")
+                results.append({"loan_id": loan_id, "error": "Loan not found."})
+            elif rows[loan_id][1]:
+                metrics.return_failed("already_returned")
+                results.append({"loan_id": loan_id, "error": "This loan has already been returned."})
+            else:
+                returned_books[rows[loan_id][0]] += 1
+                results.append({"loan_id": loan_id})
+        if atomic and any("error" in result for result in results):
+            raise BatchFailed(results)
+        closing = [result["loan_id"] for result in results if "error" not in result]
+        if not closing:
+            return results
+
+        updated = Loan.objects.filter(pk__in=closing, returned=False).update(returned=True)
+        if updated != len(closing):
+            metrics.return_failed("already_returned")
+            raise AlreadyReturned("This loan has already been returned.")
+        # Same order as close_loan: loans, summaries, holds, books, then counters
+        summaries.recompute({rows[loan_id][2] for loan_id in closing})
+        shelve(returned_books)
+        stats.increment(stats.ACTIVE_LOANS, -len(closing))
+    metrics.returned(len(closing))
+    return results
+
+
+def place_hold(user, book_id):
+    """
+    Queue a patron for a book that is out of stock. The book row is locked while the hold is
+    added, so a concurrent return either sees this hold or has already restocked the shelf.
+    """
+    with transaction.atomic():
+        stock = (
+            Book.objects.select_for_update()
+            .filter(pk=book_id)
+            .values_list("inventory", flat=True)
+            .first()
+        )
+        if stock is None:
+            raise Book.DoesNotExist("Book matching query does not exist.")
+        if stock > 0:
+            raise InStock("This book is in stock. Borrow it instead.")
+        try:
+            with transaction.atomic():
+                return Hold.objects.create(user=user, book_id=book_id)
+        except IntegrityError:
+            raise AlreadyHeld("You already have a hold on this book.")
+
+
+def cancel_hold(hold_id, user=None):
+    """Cancel a waiting or ready hold. A copy set aside for it goes to the next hold or the shelf."""
+    with transaction.atomic():
+        holds_queryset = Hold.objects.select_for_update().filter(pk=hold_id)
+        if user is not None:
+            holds_queryset = holds_queryset.filter(user=user)
+        hold = holds_queryset.get()
+        if hold.status not in Hold.OPEN:
+            raise HoldClosed("This hold is no longer open.")
+        Hold.objects.filter(pk=hold.pk).update(status=Hold.CANCELLED)
+        if hold.status == Hold.READY:
+            shelve(Counter({hold.book_id: 1}))
+        hold.status = Hold.CANCELLED
+    return hold
+
+
+def expire_holds(today=None):
+    """Expire ready holds past their pickup date and pass their copies on. Returns the count."""
+    with transaction.atomic():
+        expired = list(
+            Hold.objects.select_for_update()
+            .filter(status=Hold.READY, ready_until__lt=today or now().date())
+            .order_by("pk")
+            .values_list("pk", "book_id")
+        )
+        if expired:
+            Hold.objects.filter(pk__in=[pk for pk, _ in expired]).update(status=Hold.EXPIRED)
+            shelve(Counter(book_id for _, book_id in expired))
+    return len(expired)
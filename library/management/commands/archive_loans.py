@@ -0,0 +1,52 @@
+# library/management/commands/archive_loans.py
+# To move old returned loans to the archive paste in terminal: python manage.py archive_loans
+# Run it nightly from cron; an interrupted run loses nothing and the next one carries on.
+import time
+from django.core.management.base import BaseCommand, CommandError
+from library import archive
+
+
+class Command(BaseCommand):
+    help = "Move returned loans older than LIBRARY_ARCHIVE_AFTER_DAYS into the loan archive."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--older-than-days",
+            type=int,
+            help="Archive returned loans lent more than this many days ago "
+            "(default: LIBRARY_ARCHIVE_AFTER_DAYS).",
+        )
+        parser.add_argument("--batch-size", type=int, default=archive.BATCH_SIZE)
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only count the loans that would be archived.",
+        )
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be positive.")
+        days = options["older_than_days"]
+        if days is None:
+            days = archive.archive_after_days()
+        if days < 0:
+            raise CommandError("--older-than-days cannot be negative.")
+
+        cutoff = archive.cutoff_date(days)
+        if options["dry_run"]:
+            count = archive.candidates(cutoff).count()
+            self.stdout.write(f"{count:,} loan(s) lent before {cutoff} would be archived.")
+            return
+
+        def on_batch(moved):
+            self.stdout.write(f"{moved:,} loans archived", ending="\r")
+            self.stdout.flush()
+
+        started = time.perf_counter()
+        moved = archive.archive(
+            older_than_days=days, batch_size=options["batch_size"], on_batch=on_batch
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"{moved:,} loan(s) lent before {cutoff} archived "
+            f"in {time.perf_counter() - started:.2f}s."
+        ))
@@ -0,0 +1,13 @@
+# library/management/commands/expire_holds.py
+# To release copies whose pickup window has passed paste in terminal: python manage.py expire_holds
+# Run it daily from cron, e.g. right after sweep_overdue.
+from django.core.management.base import BaseCommand
+from library import inventory
+
+
+class Command(BaseCommand):
+    help = "Expire holds not picked up in time and give their copies to the next hold or the shelf."
+
+    def handle(self, *args, **options):
+        expired = inventory.expire_holds()
+        self.stdout.write(self.style.SUCCESS(f"{expired} hold(s) expired."))
@@ -0,0 +1,78 @@
+# library/management/commands/import_books.py
+# To import a catalog paste in terminal: python manage.py import_books books.csv
+# Accepts CSV (with a header row) or JSON Lines; use "-" to read from standard input.
+import json
+import sys
+from pathlib import Path
+from django.core.management.base import BaseCommand, CommandError
+from library import importing
+
+
+class Command(BaseCommand):
+    help = "Stream books from a CSV or JSON Lines file into the catalog with chunked upserts."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help='CSV or JSON Lines file, or "-" for standard input.')
+        parser.add_argument(
+            "--format",
+            choices=["csv", "jsonl"],
+            help="Input format. Defaults to the file extension (.csv, .jsonl or .ndjson).",
+        )
+        parser.add_argument("--chunk-size", type=int, default=1000)
+        parser.add_argument(
+            "--skip-existing",
+            action="store_true",
+            help="Leave books that already exist (same name and author) untouched.",
+        )
+        parser.add_argument(
+            "--rejects",
+            help="Write rejected rows with their errors to this JSON Lines file.",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        fmt = options["format"] or {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl"}.get(
+            Path(path).suffix.lower()
+        )
+        if fmt is None:
+            raise CommandError("Cannot tell the format from the file name, pass --format.")
+        if options["chunk_size"] < 1:
+            raise CommandError("--chunk-size must be positive.")
+
+        stream = sys.stdin if path == "-" else open(path, newline="", encoding="utf-8")
+        rejects = open(options["rejects"], "w", encoding="utf-8") if options["rejects"] else None
+        shown = 0
+
+        def on_reject(line_number, row, errors):
+            nonlocal shown
+            if rejects:
+                rejects.write(json.dumps({"line": line_number, "row": row, "errors": errors}, default=str) + "\n")
+            elif shown < 20:
+                shown += 1
+                self.stderr.write(f"Line {line_number}: {json.dumps(errors, default=str)}")
+
+        def on_chunk(report):
+            self.stdout.write(
+                f"{report.read:,} rows read, {report.written:,} written, {report.skipped:,} "
+                f"skipped, {report.rejected:,} rejected ({report.rows_per_second:,.0f} rows/s)"
+            )
+
+        try:
+            report = importing.import_books(
+                importing.read_rows(stream, fmt),
+                chunk_size=options["chunk_size"],
+                update_existing=not options["skip_existing"],
+                on_chunk=on_chunk,
+                on_reject=on_reject,
+            )
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+            if rejects:
+                rejects.close()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {report.written:,} books from {report.read:,} rows in {report.elapsed:.1f}s "
+            f"({report.rows_per_second:,.0f} rows/s), {report.skipped:,} skipped, "
+            f"{report.rejected:,} rejected."
+        ))
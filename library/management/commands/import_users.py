@@ -0,0 +1,61 @@
+# library/management/commands/import_users.py
+# To import patrons paste in terminal: python manage.py import_users users.csv
+# CSV columns: username, password, email, first_name, last_name, is_staff ("-" reads standard input).
+import json
+import os
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from library import importing
+
+
+class Command(BaseCommand):
+    help = "Stream users from a CSV file, hashing passwords in parallel and inserting in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help='CSV file with a header row, or "-" for standard input.')
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Processes used for password hashing (default: one per CPU).",
+        )
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1 or options["workers"] < 1:
+            raise CommandError("--batch-size and --workers must be positive.")
+        path = options["path"]
+        stream = sys.stdin if path == "-" else open(path, newline="", encoding="utf-8")
+        shown = 0
+
+        def on_reject(line_number, row, errors):
+            nonlocal shown
+            if shown < 20:
+                shown += 1
+                self.stderr.write(f"Line {line_number}: {json.dumps(errors, default=str)}")
+
+        def on_batch(report):
+            self.stdout.write(
+                f"{report.read:,} rows read, {report.written:,} created, {report.skipped:,} "
+                f"skipped, {report.rejected:,} rejected ({report.rows_per_second:,.0f} rows/s)"
+            )
+
+        try:
+            report = importing.import_users(
+                importing.read_rows(stream, "csv"),
+                batch_size=options["batch_size"],
+                workers=options["workers"],
+                on_batch=on_batch,
+                on_reject=on_reject,
+            )
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        workers = options["workers"]
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {report.written:,} users in {report.elapsed:.1f}s on {workers} worker(s): "
+            f"{report.written / report.elapsed if report.elapsed else 0:,.1f} users/s, "
+            f"{report.written / report.elapsed / workers if report.elapsed else 0:,.1f} users/s per worker. "
+            f"{report.skipped:,} skipped, {report.rejected:,} rejected."
+        ))
@@ -0,0 +1,29 @@
+# library/management/commands/rebuild_loan_summaries.py
+# To rebuild the per-user loan summaries paste in terminal: python manage.py rebuild_loan_summaries
+from django.core.management.base import BaseCommand
+from library import summaries
+
+
+class Command(BaseCommand):
+    help = "Recount every user's loan summary (active loans, earliest due date) and report drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Only report drift, do not write the recounted values.",
+        )
+
+    def handle(self, *args, **options):
+        drifted = summaries.rebuild(dry_run=options["check"])
+        for user_id, stored, actual in drifted[:50]:
+            stored = "missing" if stored is None else f"{stored[0]} active, due {stored[1]}"
+            self.stdout.write(self.style.WARNING(
+                f"user {user_id}: {stored} -> {actual[0]} active, due {actual[1]}"
+            ))
+        if len(drifted) > 50:
+            self.stdout.write(f"... and {len(drifted) - 50} more.")
+        if options["check"]:
+            self.stdout.write(f"{len(drifted)} summary(ies) drifted, nothing written.")
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Summaries rebuilt, {len(drifted)} corrected."))
@@ -0,0 +1,31 @@
+# library/management/commands/rebuild_stats.py
+# To rebuild the dashboard counters paste in terminal: python manage.py rebuild_stats
+from django.core.management.base import BaseCommand
+from library import stats
+
+
+class Command(BaseCommand):
+    help = "Recount the admin dashboard counters from the tables and report any drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Only report drift, do not write the recounted values.",
+        )
+
+    def handle(self, *args, **options):
+        results = stats.rebuild(dry_run=options["check"])
+        drifted = 0
+        for name, (stored, actual) in results.items():
+            if stored == actual:
+                self.stdout.write(f"{name}: {actual}")
+            else:
+                drifted += 1
+                self.stdout.write(
+                    self.style.WARNING(f"{name}: {stored} -> {actual} (drift {actual - stored:+d})")
+                )
+        if options["check"]:
+            self.stdout.write(f"{drifted} counter(s) drifted, nothing written.")
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Counters rebuilt, {drifted} corrected."))
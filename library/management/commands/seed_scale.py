@@ -0,0 +1,74 @@
+# library/management/commands/seed_scale.py
+# To seed a load-test database paste in terminal: python manage.py seed_scale --books 1M --users 100k --loans 10M
+# Appends synthetic rows; never run it against a database with real patrons.
+from django.core.management.base import BaseCommand, CommandError
+from library import seeding
+
+
+def size(text):
+    try:
+        return seeding.parse_size(text)
+    except ValueError as exc:
+        raise CommandError(str(exc))
+
+
+class Command(BaseCommand):
+    help = "Append synthetic books, users and loans with batched COPY/INSERTs for load testing."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--books", type=size, default=0, help="e.g. 5000, 100k or 1M.")
+        parser.add_argument("--users", type=size, default=0)
+        parser.add_argument("--loans", type=size, default=0)
+        parser.add_argument(
+            "--active-share",
+            type=float,
+            default=0.05,
+            help="Share of loans not returned yet (default 0.05).",
+        )
+        parser.add_argument(
+            "--overdue-share",
+            type=float,
+            default=0.02,
+            help="Share of those active loans that are past due (default 0.02).",
+        )
+        parser.add_argument(
+            "--seed", type=int, default=42, help="Random seed; same seed, same rows."
+        )
+        parser.add_argument("--batch-size", type=int, default=10000)
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be positive.")
+        for option in ("active_share", "overdue_share"):
+            if not 0 <= options[option] <= 1:
+                raise CommandError(f"--{option.replace('_', '-')} must be between 0 and 1.")
+        if not (options["books"] or options["users"] or options["loans"]):
+            raise CommandError("Nothing to seed, pass --books, --users and/or --loans.")
+
+        def on_batch(table, report):
+            self.stdout.write(
+                f"{table}: {report.rows[table]:,} rows ({report.elapsed:.1f}s)", ending="\r"
+            )
+            self.stdout.flush()
+
+        try:
+            report = seeding.generate(
+                books=options["books"],
+                users=options["users"],
+                loans=options["loans"],
+                active_share=options["active_share"],
+                overdue_share=options["overdue_share"],
+                seed=options["seed"],
+                batch_size=options["batch_size"],
+                on_batch=on_batch,
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        total = sum(report.rows.values())
+        written = ", ".join(f"{count:,} {table}s" for table, count in report.rows.items())
+        self.stdout.write("")
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {written} in {report.elapsed:.1f}s ({total / report.elapsed:,.0f} rows/s). "
+            f'Seeded users log in with password "{seeding.PASSWORD}".'
+        ))
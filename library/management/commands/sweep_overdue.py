@@ -0,0 +1,42 @@
+# library/management/commands/sweep_overdue.py
+# To flag newly overdue loans paste in terminal: python manage.py sweep_overdue
+# Run it daily from cron, or keep it running with --interval (seconds between sweeps).
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from library import overdue
+
+
+class Command(BaseCommand):
+    help = "Mark loans that became overdue since the last sweep and record overdue events."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=overdue.BATCH_SIZE)
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Ignore the watermark and re-check every active loan.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=0,
+            help="Keep running and sweep again every INTERVAL seconds.",
+        )
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be positive.")
+        full = options["full"]
+        while True:
+            started = time.perf_counter()
+            marked = overdue.sweep(batch_size=options["batch_size"], full=full)
+            self.stdout.write(self.style.SUCCESS(
+                f"{marked} loan(s) marked overdue in {time.perf_counter() - started:.2f}s, "
+                f"watermark {overdue.watermark()}."
+            ))
+            if options["interval"] <= 0:
+                return
+            full = False
+            close_old_connections()
+            time.sleep(options["interval"])
@@ -0,0 +1,177 @@
+# library/metrics.py
+# Prometheus metrics, scraped at /metrics in the text exposition format.
+# `MetricsMiddleware` records every request: a latency histogram and a status counter per URL
+# name from library/urls.py, plus a histogram of SQL queries per request. The inventory
+# service counts borrows and returns and their failures by reason. The catalog and JWT-flag
+# caches count hits and misses. Stock gauges (active loans, copies in stock) are read from
+# the maintained counters (library/stats.py) at scrape time, so they are exact across workers.
+#
+# With PROMETHEUS_MULTIPROC_DIR set (build.sh, build_asgi.sh), every worker writes its
+# samples to memory-mapped files in that directory and a scrape merges all of them, so
+# any gunicorn or uvicorn worker can answer for the whole server.
+# Labelled children are cached, so a hot-path update is a dict lookup plus the increment.
+import os
+import time
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from prometheus_client.core import GaugeMetricFamily
+from . import stats
+
+REQUEST_LATENCY = Histogram(
+    "library_request_duration_seconds",
+    "Request latency by URL name.",
+    ["view", "method"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+RESPONSES = Counter(
+    "library_responses", "Responses by URL name and status code.", ["view", "method", "status"]
+)
+REQUEST_QUERIES = Histogram(
+    "library_request_db_queries",
+    "SQL queries run per request, by URL name.",
+    ["view"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100),
+)
+LOANS_BORROWED = Counter("library_loans_borrowed", "Loans issued.")
+LOANS_RETURNED = Counter("library_loans_returned", "Loans returned.")
+BORROW_FAILURES = Counter("library_borrow_failures", "Refused borrows by reason.", ["reason"])
+RETURN_FAILURES = Counter("library_return_failures", "Refused returns by reason.", ["reason"])
+CACHE_REQUESTS = Counter(
+    "library_cache_requests", "Cache lookups by cache and result.", ["cache", "result"]
+)
+
+_children = {}
+_queries = ContextVar("library_request_queries", default=None)
+
+
+def child(metric, *labels):
+    key = (metric, labels)
+    value = _children.get(key)
+    if value is None:
+        value = _children[key] = metric.labels(*labels)
+    return value
+
+
+def borrowed(count=1):
+    if count:
+        LOANS_BORROWED.inc(count)
+
+
+def returned(count=1):
+    if count:
+        LOANS_RETURNED.inc(count)
+
+
+def borrow_failed(reason, count=1):
+    """`reason`: out_of_stock, overdue, loan_limit or not_found."""
+    child(BORROW_FAILURES, reason).inc(count)
+
+
+def return_failed(reason, count=1):
+    """`reason`: already_returned or not_found."""
+    child(RETURN_FAILURES, reason).inc(count)
+
+
+def cache_lookup(cache, result):
+    child(CACHE_REQUESTS, cache, result).inc()
+
+
+def count_query(execute, sql, params, many, context):
+    """Database execute wrapper counting the current request's queries."""
+    counter = _queries.get()
+    if counter is not None:
+        counter[0] += 1
+    return execute(sql, params, many, context)
+
+
+def instrument(connection):
+    if count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_query)
+
+
+def observe(request, response, duration, queries):
+    match = getattr(request, "resolver_match", None)
+    view = (match.url_name if match is not None else None) or "unmatched"
+    child(REQUEST_LATENCY, view, request.method).observe(duration)
+    child(RESPONSES, view, request.method, str(response.status_code)).inc()
+    child(REQUEST_QUERIES, view).observe(queries)
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        started, queries = time.perf_counter(), [0]
+        token = _queries.set(queries)
+        try:
+            response = self.get_response(request)
+        finally:
+            _queries.reset(token)
+        observe(request, response, time.perf_counter() - started, queries[0])
+        return response
+
+    async def __acall__(self, request):
+        started, queries = time.perf_counter(), [0]
+        token = _queries.set(queries)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _queries.reset(token)
+        observe(request, response, time.perf_counter() - started, queries[0])
+        return response
+
+
+class StockCollector:
+    """Gauges read from the maintained counters at scrape time (one small query)."""
+
+    def collect(self):
+        counters = stats.read_counters()
+        for name, help_text in (
+            (stats.ACTIVE_LOANS, "Loans currently out."),
+            (stats.COPIES_IN_STOCK, "Copies on the shelf."),
+            (stats.BOOKS, "Titles in the catalog."),
+            (stats.USERS, "Registered users."),
+        ):
+            yield GaugeMetricFamily(f"library_{name}", help_text, value=counters[name])
+
+
+_stock_registry = CollectorRegistry()
+_stock_registry.register(StockCollector())
+
+
+def exposition():
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry) + generate_latest(_stock_registry)
+
+
+# GET /metrics - Prometheus text format. With LIBRARY_METRICS_TOKEN set, scrapers must send
+# it as a bearer token (`authorization` in the Prometheus scrape config).
+def metrics_view(request):
+    token = getattr(settings, "LIBRARY_METRICS_TOKEN", "")
+    if token and request.headers.get("Authorization") != f"Bearer {token}":
+        return HttpResponse("Unauthorized\n", status=401, content_type="text/plain")
+    return HttpResponse(exposition(), content_type=CONTENT_TYPE_LATEST)
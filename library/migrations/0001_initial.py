@@ -0,0 +1,41 @@
+# Generated by Django 5.1.6 on 2026-10-18 17:39
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Book',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('author', models.CharField(max_length=255)),
+                ('year_published', models.IntegerField()),
+                ('category', models.CharField(choices=[('Romance', 'romance'), ('Action', 'action'), ('Mystery', 'mystery'), ('Sci-Fi', 'sci-fi'), ('Fantasy', 'fantasy'), ('Non-Fiction', 'non-fiction')], default='Romance', max_length=50)),
+                ('inventory', models.PositiveIntegerField(default=1)),
+                ('image_url', models.URLField(blank=True, default='https://png.pngtree.com/png-clipart/20230917/original/pngtree-no-image-available-icon-flatvector-illustration-thumbnail-graphic-illustration-vector-png-image_12323920.png', max_length=500, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Loan',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type', models.IntegerField(choices=[(1, '10 days'), (2, '5 days'), (3, '2 days')])),
+                ('loan_date', models.DateField(auto_now_add=True)),
+                ('return_date', models.DateField(blank=True, null=True)),
+                ('returned', models.BooleanField(default=False)),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='library.book')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,85 @@
+# Full-text search index for the book catalog, see library/search.py.
+# The SQL is frozen here: library/search.py may change without rewriting this migration.
+
+from django.db import migrations
+
+POSTGRES_SQL = [
+    """
+    ALTER TABLE library_book ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(name, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(author, '')), 'B') ||
+        setweight(to_tsvector('simple', coalesce(category, '')), 'C')
+    ) STORED
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS library_book_search_vector_idx
+    ON library_book USING GIN (search_vector)
+    """,
+]
+
+DROP_POSTGRES_SQL = [
+    "ALTER TABLE library_book DROP COLUMN IF EXISTS search_vector",
+]
+
+SQLITE_SQL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS library_book_fts USING fts5(
+        name, author, category,
+        content='library_book', content_rowid='id',
+        tokenize='porter unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS library_book_fts_ai AFTER INSERT ON library_book BEGIN
+        INSERT INTO library_book_fts(rowid, name, author, category)
+        VALUES (new.id, new.name, new.author, new.category);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS library_book_fts_ad AFTER DELETE ON library_book BEGIN
+        INSERT INTO library_book_fts(library_book_fts, rowid, name, author, category)
+        VALUES ('delete', old.id, old.name, old.author, old.category);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS library_book_fts_au
+    AFTER UPDATE OF name, author, category ON library_book BEGIN
+        INSERT INTO library_book_fts(library_book_fts, rowid, name, author, category)
+        VALUES ('delete', old.id, old.name, old.author, old.category);
+        INSERT INTO library_book_fts(rowid, name, author, category)
+        VALUES (new.id, new.name, new.author, new.category);
+    END
+    """,
+    # Index the books that already exist
+    "INSERT INTO library_book_fts(library_book_fts) VALUES ('rebuild')",
+]
+
+DROP_SQLITE_SQL = [
+    "DROP TRIGGER IF EXISTS library_book_fts_ai",
+    "DROP TRIGGER IF EXISTS library_book_fts_ad",
+    "DROP TRIGGER IF EXISTS library_book_fts_au",
+    "DROP TABLE IF EXISTS library_book_fts",
+]
+
+
+def run_for_vendor(statements):
+    def operation(apps, schema_editor):
+        for sql in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(sql)
+
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("library", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_for_vendor({"postgresql": POSTGRES_SQL, "sqlite": SQLITE_SQL}),
+            run_for_vendor({"postgresql": DROP_POSTGRES_SQL, "sqlite": DROP_SQLITE_SQL}),
+        ),
+    ]
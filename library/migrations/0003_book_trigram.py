@@ -0,0 +1,37 @@
+# Trigram indexes backing the database fallback of the suggest endpoint (PostgreSQL only)
+
+from django.db import migrations
+
+TRIGRAM_SQL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS library_book_name_trgm_idx "
+    "ON library_book USING GIN (UPPER(name::text) gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS library_book_author_trgm_idx "
+    "ON library_book USING GIN (UPPER(author::text) gin_trgm_ops)",
+]
+
+DROP_TRIGRAM_SQL = [
+    "DROP INDEX IF EXISTS library_book_name_trgm_idx",
+    "DROP INDEX IF EXISTS library_book_author_trgm_idx",
+]
+
+
+def run_on_postgres(statements):
+    def operation(apps, schema_editor):
+        if schema_editor.connection.vendor != "postgresql":
+            return
+        for sql in statements:
+            schema_editor.execute(sql)
+
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("library", "0002_book_search"),
+    ]
+
+    operations = [
+        migrations.RunPython(run_on_postgres(TRIGRAM_SQL), run_on_postgres(DROP_TRIGRAM_SQL)),
+    ]
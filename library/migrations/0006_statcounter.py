@@ -0,0 +1,52 @@
+# Generated by Django 5.1.6 on 2026-10-18 17:46
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum
+
+SHARDS = 8  # library.stats.SHARDS at the time of this migration
+
+
+def seed_counters(apps, schema_editor):
+    # Initial values counted from the existing tables (see library/stats.py)
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split("."))
+    Book = apps.get_model("library", "Book")
+    Loan = apps.get_model("library", "Loan")
+    StatCounter = apps.get_model("library", "StatCounter")
+    db = schema_editor.connection.alias  # The database being migrated, not the router's pick
+    counters = {
+        "users": User.objects.using(db).count(),
+        "books": Book.objects.using(db).count(),
+        "loans": Loan.objects.using(db).count(),
+        "active_loans": Loan.objects.using(db).filter(returned=False).count(),
+        "copies_in_stock": Book.objects.using(db).aggregate(copies=Sum("inventory"))["copies"] or 0,
+    }
+    StatCounter.objects.using(db).bulk_create(
+        StatCounter(name=name, shard=shard, value=value if shard == 0 else 0)
+        for name, value in counters.items()
+        for shard in range(SHARDS)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0005_hot_path_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50)),
+                ('shard', models.PositiveSmallIntegerField(default=0)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('name', 'shard'), name='statcounter_name_shard_uniq')],
+            },
+        ),
+        migrations.RunPython(seed_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.1.6 on 2026-10-18 19:02
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def check_duplicates(apps, schema_editor):
+    # Fail with a readable message instead of an IntegrityError from the constraint
+    Book = apps.get_model("library", "Book")
+    duplicates = list(
+        Book.objects.using(schema_editor.connection.alias)
+        .values("name", "author")
+        .annotate(copies=Count("id"))
+        .filter(copies__gt=1)[:10]
+    )
+    if duplicates:
+        listed = "; ".join(f"{row['name']!r} by {row['author']!r}" for row in duplicates)
+        raise RuntimeError(
+            f"Merge duplicate books (same name and author) before migrating: {listed}"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0006_statcounter'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='book',
+            constraint=models.UniqueConstraint(fields=('name', 'author'), name='book_name_author_uniq'),
+        ),
+        # Lookups by name use the leading column of the constraint's index
+        migrations.RemoveIndex(
+            model_name='book',
+            name='book_name_idx',
+        ),
+    ]
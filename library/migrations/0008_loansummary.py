@@ -0,0 +1,51 @@
+# Generated by Django 5.1.6 on 2026-10-18 20:31
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def seed_summaries(apps, schema_editor):
+    # One row per user, counted from the existing loans (see library/summaries.py)
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split("."))
+    Loan = apps.get_model("library", "Loan")
+    LoanSummary = apps.get_model("library", "LoanSummary")
+    db = schema_editor.connection.alias  # The database being migrated, not the router's pick
+    active = {
+        row["user_id"]: row
+        for row in Loan.objects.using(db).filter(returned=False)
+        .values("user_id")
+        .annotate(active=Count("id"), earliest=Min("return_date"))
+    }
+    LoanSummary.objects.using(db).bulk_create(
+        (
+            LoanSummary(
+                user_id=user_id,
+                active_loans=active.get(user_id, {}).get("active", 0),
+                earliest_due=active.get(user_id, {}).get("earliest"),
+            )
+            for user_id in User.objects.using(db).values_list("id", flat=True).iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0007_book_name_author_uniq'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LoanSummary',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='loan_summary', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('active_loans', models.PositiveIntegerField(default=0)),
+                ('earliest_due', models.DateField(blank=True, null=True)),
+            ],
+        ),
+        migrations.RunPython(seed_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 5.1.6 on 2026-10-18 18:28
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+# Range-partitioned by loan_date on PostgreSQL (see library/archive.py), a plain table elsewhere.
+# The primary key of a partitioned table must contain the partition key.
+POSTGRES_TABLE_SQL = """
+CREATE TABLE library_loanarchive (
+    id bigint NOT NULL,
+    user_id integer NOT NULL REFERENCES auth_user (id) DEFERRABLE INITIALLY DEFERRED,
+    book_id bigint NOT NULL REFERENCES library_book (id) DEFERRABLE INITIALLY DEFERRED,
+    type integer NOT NULL,
+    loan_date date NOT NULL,
+    return_date date NULL,
+    returned boolean NOT NULL,
+    overdue boolean NOT NULL,
+    archived_at timestamp with time zone NOT NULL,
+    PRIMARY KEY (id, loan_date)
+) PARTITION BY RANGE (loan_date)
+"""
+# Catches rows whose year has no partition yet; `archive.ensure_partitions()` keeps it empty
+POSTGRES_DEFAULT_PARTITION_SQL = (
+    "CREATE TABLE library_loanarchive_default PARTITION OF library_loanarchive DEFAULT"
+)
+# Drops the partitions with it
+DROP_POSTGRES_TABLE_SQL = "DROP TABLE IF EXISTS library_loanarchive CASCADE"
+
+
+def create_archive_table(apps, schema_editor):
+    model = apps.get_model("library", "LoanArchive")
+    if schema_editor.connection.vendor != "postgresql":
+        schema_editor.create_model(model)
+        return
+    schema_editor.execute(POSTGRES_TABLE_SQL)
+    schema_editor.execute(POSTGRES_DEFAULT_PARTITION_SQL)
+    for index in model._meta.indexes:
+        schema_editor.add_index(model, index)  # Created on every partition
+
+
+def drop_archive_table(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        schema_editor.delete_model(apps.get_model("library", "LoanArchive"))
+        return
+    schema_editor.execute(DROP_POSTGRES_TABLE_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0010_hold'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(state_operations=[migrations.CreateModel(
+            name='LoanArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('type', models.IntegerField(choices=[(1, '10 days'), (2, '5 days'), (3, '2 days')])),
+                ('loan_date', models.DateField()),
+                ('return_date', models.DateField(blank=True, null=True)),
+                ('returned', models.BooleanField(default=True)),
+                ('overdue', models.BooleanField(default=False)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='library.book')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'id'], name='loan_archive_user_idx'), models.Index(fields=['loan_date'], name='loan_archive_loan_date_idx')],
+            },
+        )]),
+        migrations.RunPython(create_archive_table, drop_archive_table),
+    ]
@@ -28,13 +28,41 @@ class Book(models.Model):
         max_length=500, null=True, blank=True, default=DEFAULT_IMAGE_URL
     )
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["category", "year_published"], name="book_category_year_idx"),
+        ]
+        constraints = [
+            # Natural key used by the bulk import upsert (library/importing.py). Its index also
+            # serves lookups by `name` (leading column)
+            models.UniqueConstraint(fields=["name", "author"], name="book_name_author_uniq"),
+        ]
+
     def __str__(self):
         return f"{self.name} by: {self.author}, category: {dict(self.CATEGORY_CHOICES).get(self.category, 'Unknown')} ({self.inventory} copies available)"
 
 
+# A row of the SQLite FTS5 catalog index kept in sync by triggers (see library/search.py).
+# Unmanaged and never queried on other databases; it only lets the ORM join the index to Book.
+class BookSearchEntry(models.Model):
+    book = models.OneToOneField(
+        Book,
+        primary_key=True,
+        db_column="rowid",
+        db_constraint=False,
+        on_delete=models.DO_NOTHING,
+        related_name="search_entry",
+    )
+
+    class Meta:
+        managed = False
+        db_table = "library_book_fts"
+
+
 # Tracks book loans with a user, book reference, loan type (duration), loan date, return date, and whether it was returned
 class Loan(models.Model):
     LOAN_CHOICES = [(1, "10 days"), (2, "5 days"), (3, "2 days")]
+    LOAN_DURATIONS = {1: 10, 2: 5, 3: 2}  # Mapping type to days
 
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     book = models.ForeignKey(Book, on_delete=models.CASCADE)
@@ -42,16 +70,164 @@ class Loan(models.Model):
     loan_date = models.DateField(auto_now_add=True)
     return_date = models.DateField(blank=True, null=True)
     returned = models.BooleanField(default=False)  # Tracks if book is returned
+    overdue = models.BooleanField(default=False)  # Set by `manage.py sweep_overdue`, never cleared
+
+    class Meta:
+        indexes = [
+            # Per-user overdue check done on every borrow
+            models.Index(
+                fields=["user", "returned", "return_date"], name="loan_user_returned_due_idx"
+            ),
+            # Active loans only: small, and serves overdue scans and "not returned" filters
+            models.Index(
+                fields=["return_date"],
+                condition=models.Q(returned=False),
+                name="loan_active_due_idx",
+            ),
+        ]
 
     def save(self, *args, **kwargs):
 
         if not self.return_date:  # Only set if return_date is not already provided
-            loan_durations = {1: 10, 2: 5, 3: 2}  # Mapping type to days
             self.return_date = now().date() + timedelta(
-                days=loan_durations.get(self.type, 10)
+                days=self.LOAN_DURATIONS.get(self.type, 10)
             )
 
         super().save(*args, **kwargs)  # Call parent save method
 
     def __str__(self):
         return f"{self.user} borrowed: {self.book} (Returned: {self.returned}, Due: {self.return_date})"
+
+
+# A returned loan moved out of the hot Loan table by `manage.py archive_loans` (see
+# library/archive.py). Keeps the loan's id. On PostgreSQL the table is partitioned by
+# `loan_date` range, one partition per year (migration 0011_loanarchive).
+class LoanArchive(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+")
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name="+")
+    type = models.IntegerField(choices=Loan.LOAN_CHOICES)
+    loan_date = models.DateField()
+    return_date = models.DateField(blank=True, null=True)
+    returned = models.BooleanField(default=True)
+    overdue = models.BooleanField(default=False)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "id"], name="loan_archive_user_idx"),
+            models.Index(fields=["loan_date"], name="loan_archive_loan_date_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.user} borrowed: {self.book} on {self.loan_date} (archived)"
+
+
+# A patron's place in the FIFO queue for an out-of-stock book (see library/holds.py).
+# Returned copies go to the oldest waiting hold instead of the shelf; the hold is then
+# ready for pickup until `ready_until`, and borrowing the book fulfils it.
+class Hold(models.Model):
+    WAITING = "waiting"
+    READY = "ready"
+    FULFILLED = "fulfilled"
+    CANCELLED = "cancelled"
+    EXPIRED = "expired"
+    STATUS_CHOICES = [
+        (WAITING, "waiting"),
+        (READY, "ready for pickup"),
+        (FULFILLED, "fulfilled"),
+        (CANCELLED, "cancelled"),
+        (EXPIRED, "expired"),
+    ]
+    OPEN = (WAITING, READY)
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="holds")
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name="holds")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=WAITING)
+    created_at = models.DateTimeField(auto_now_add=True)
+    ready_until = models.DateField(blank=True, null=True)  # Pickup deadline once ready
+
+    class Meta:
+        indexes = [
+            # Queue head lookup on every return: oldest waiting hold of a book
+            models.Index(
+                fields=["book", "id"],
+                condition=models.Q(status="waiting"),
+                name="hold_waiting_queue_idx",
+            ),
+            models.Index(fields=["user", "status"], name="hold_user_status_idx"),
+            models.Index(
+                fields=["ready_until"],
+                condition=models.Q(status="ready"),
+                name="hold_ready_until_idx",
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "book"],
+                condition=models.Q(status__in=["waiting", "ready"]),
+                name="hold_one_open_per_user_book",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user} holds {self.book} ({self.status})"
+
+
+# Named counters maintained alongside inserts and deletes (see library/stats.py), so the
+# admin dashboard never has to COUNT(*) large tables. Each counter is spread over a few
+# shard rows so concurrent transactions rarely wait on the same row lock.
+class StatCounter(models.Model):
+    name = models.CharField(max_length=50)
+    shard = models.PositiveSmallIntegerField(default=0)
+    value = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["name", "shard"], name="statcounter_name_shard_uniq")
+        ]
+
+    def __str__(self):
+        return f"{self.name}[{self.shard}]: {self.value}"
+
+
+# Per-user totals maintained with every borrow and return (see library/summaries.py), so
+# borrow admission is one primary-key UPDATE instead of a scan of the user's loans.
+# The overdue flag is derived from `earliest_due`, since it changes with the date alone.
+class LoanSummary(models.Model):
+    user = models.OneToOneField(
+        User, primary_key=True, on_delete=models.CASCADE, related_name="loan_summary"
+    )
+    active_loans = models.PositiveIntegerField(default=0)
+    earliest_due = models.DateField(blank=True, null=True)  # Of the active loans
+
+    def is_overdue(self, today=None):
+        return self.earliest_due is not None and self.earliest_due < (today or now().date())
+
+    def __str__(self):
+        return f"{self.user}: {self.active_loans} active, earliest due {self.earliest_due}"
+
+
+# One row per loan found overdue by the sweeper (see library/overdue.py), for notices and
+# reports. Compact and append-only; it outlives the loan so reports stay complete.
+class OverdueEvent(models.Model):
+    loan = models.ForeignKey(Loan, null=True, on_delete=models.SET_NULL, related_name="+")
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+")
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name="+")
+    due_date = models.DateField()
+    detected_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["detected_at"], name="overdue_event_detected_idx")]
+
+    def __str__(self):
+        return f"Loan {self.loan_id} of {self.user_id} overdue since {self.due_date}"
+
+
+# Progress marker of an incremental background job: every item up to `value` is processed.
+class Watermark(models.Model):
+    name = models.CharField(max_length=50, primary_key=True)
+    value = models.DateField()
+
+    def __str__(self):
+        return f"{self.name}: {self.value}"
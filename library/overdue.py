@@ -0,0 +1,79 @@
+# library/overdue.py
+# Incremental overdue sweep behind `manage.py sweep_overdue`. A loan becomes overdue the day
+# after its due date, so each run only has to look at active loans due between the previous
+# run's date (the watermark) and yesterday. That range is read from the partial
+# loan_active_due_idx index, which never contains returned loans, so the cost of a run
+# follows the number of newly overdue loans, not the size of the loan history.
+#
+# Loans are marked (`Loan.overdue`) and recorded as `OverdueEvent` rows in keyset-ordered
+# batches, each in its own short transaction. The watermark only moves once the whole range
+# is done, so an interrupted run is simply resumed by the next one.
+from django.db import transaction
+from django.db.models import Q
+from django.utils.timezone import now
+from .models import Loan, OverdueEvent, Watermark
+
+WATERMARK = "overdue_sweep"
+BATCH_SIZE = 1000
+
+
+def watermark():
+    """First due date not yet swept, or None before the first run."""
+    return Watermark.objects.filter(name=WATERMARK).values_list("value", flat=True).first()
+
+
+def pending(since, today):
+    # Same predicate as loan_active_due_idx (returned=False), so the index serves the range
+    loans = Loan.objects.filter(returned=False, overdue=False, return_date__lt=today)
+    if since is not None:
+        loans = loans.filter(return_date__gte=since)
+    return loans
+
+
+def mark_batch(loans, after, batch_size):
+    """
+    Mark the next `batch_size` loans after the `(return_date, pk)` cursor as overdue and
+    record their events. Returns `(cursor, count)`, or None when nothing was left.
+    """
+    if after is not None:
+        due, pk = after
+        loans = loans.filter(Q(return_date__gt=due) | Q(return_date=due, pk__gt=pk))
+    with transaction.atomic():
+        batch = list(
+            loans.select_for_update()
+            .order_by("return_date", "pk")
+            .values_list("pk", "user_id", "book_id", "return_date")[:batch_size]
+        )
+        if not batch:
+            return None
+        Loan.objects.filter(pk__in=[row[0] for row in batch]).update(overdue=True)
+        OverdueEvent.objects.bulk_create(
+            OverdueEvent(loan_id=pk, user_id=user_id, book_id=book_id, due_date=due)
+            for pk, user_id, book_id, due in batch
+        )
+    return (batch[-1][3], batch[-1][0]), len(batch)
+
+
+def sweep(today=None, batch_size=BATCH_SIZE, full=False, on_batch=None):
+    """
+    Flag every loan that became overdue since the last sweep. `full=True` ignores the
+    watermark, e.g. after loans were created with a due date already in the past.
+    `on_batch(marked_so_far)` is called after each committed batch. Returns the count.
+    """
+    today = today or now().date()
+    stored = watermark()
+    loans = pending(None if full else stored, today)
+    marked, after = 0, None
+    while True:
+        result = mark_batch(loans, after, batch_size)
+        if result is None:
+            break
+        after, count = result
+        marked += count
+        if on_batch:
+            on_batch(marked)
+        if count < batch_size:
+            break
+    if stored is None or stored < today:
+        Watermark.objects.update_or_create(name=WATERMARK, defaults={"value": today})
+    return marked
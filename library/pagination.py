@@ -0,0 +1,268 @@
+# library/pagination.py
+import base64
+import json
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+def keyset_ordering(order_by, tiebreaker="id"):
+    """
+    Turn a queryset's `order_by` into a keyset ordering that always ends with the
+    unique `tiebreaker` column, so every row has a distinct position.
+    """
+    ordering = []
+    for field in order_by:
+        if not isinstance(field, str) or field.lstrip("-") == "?":
+            continue  # Expressions and random ordering cannot be used as a keyset
+        if field.lstrip("-") == "pk":
+            field = field.replace("pk", tiebreaker)
+        ordering.append(field)
+        if field.lstrip("-") == tiebreaker:
+            return ordering  # Anything after a unique column never breaks a tie
+    ordering.append(tiebreaker)
+    return ordering
+
+
+def column_fields(model, ordering):
+    """
+    Map each column of `ordering` to `(model_field, nullable)`, following `__` relations.
+    Columns that are not model fields (annotations) are left out: the database handles them.
+    """
+    columns = {}
+    for field in ordering:
+        name = field.lstrip("-")
+        current, nullable = model, False
+        try:
+            for attr in name.split("__"):
+                model_field = current._meta.get_field(attr)
+                nullable |= model_field.null
+                current = model_field.related_model
+        except (FieldDoesNotExist, AttributeError):
+            continue
+        columns[name] = (model_field, nullable)
+    return columns
+
+
+def nullable_columns(model, ordering):
+    """The columns of `ordering` that can hold NULL."""
+    return {name for name, (_, nullable) in column_fields(model, ordering).items() if nullable}
+
+
+def cursor_values(model, ordering, values):
+    """
+    Convert decoded cursor values with their columns' `to_python()`, so a tampered cursor is
+    refused here rather than by the database. Raises `ValueError` for unusable values.
+    """
+    columns = column_fields(model, ordering)
+    converted = []
+    for field, value in zip(ordering, values):
+        name = field.lstrip("-")
+        if name not in columns:
+            converted.append(value)
+            continue
+        model_field, nullable = columns[name]
+        if value is None:
+            if not nullable:
+                raise ValueError(f"{name} cannot be null.")
+            converted.append(None)
+            continue
+        if isinstance(value, (list, dict)):
+            raise ValueError(f"Invalid {name} value.")
+        try:
+            converted.append(model_field.to_python(value))
+        except (TypeError, ValidationError) as exc:
+            raise ValueError(f"Invalid {name} value.") from exc
+    return converted
+
+
+def keyset_order_by(ordering, nullable=(), reverse=False):
+    """
+    `ordering` as `order_by()` arguments, inverted with `reverse`. NULLs in a `nullable`
+    column come after every value (before them with `reverse`), in either direction.
+    """
+    expressions = []
+    for field in ordering:
+        descending = field.startswith("-") != reverse
+        name = field.lstrip("-")
+        if name in nullable:
+            column = F(name)
+            order = column.desc if descending else column.asc
+            expressions.append(order(nulls_first=True) if reverse else order(nulls_last=True))
+        else:
+            expressions.append(f"-{name}" if descending else name)
+    return expressions
+
+
+def keyset_filter(ordering, values, reverse=False, nullable=()):
+    """
+    Build the `(k1, k2, ..., id) > (v1, v2, ..., vN)` predicate for the given ordering,
+    honouring the direction of each column. With `reverse` the rows before the
+    position are selected instead. NULLs in a `nullable` column sort last, as in
+    `keyset_order_by`.
+    """
+    condition = Q()
+    equal = Q()
+    for field, value in zip(ordering, values):
+        name = field.lstrip("-")
+        if value is None:
+            # Nothing sorts after NULL; going back, every value sorts before it
+            if reverse:
+                condition |= equal & Q(**{f"{name}__isnull": False})
+            equal &= Q(**{f"{name}__isnull": True})
+            continue
+        descending = field.startswith("-") != reverse
+        lookup = "lt" if descending else "gt"
+        beyond = Q(**{f"{name}__{lookup}": value})
+        if name in nullable and not reverse:
+            beyond |= Q(**{f"{name}__isnull": True})
+        condition |= equal & beyond
+        equal &= Q(**{name: value})
+    return condition
+
+
+def row_value(row, field):
+    # Rows can be model instances or `.values()` dicts
+    name = field.lstrip("-")
+    if isinstance(row, dict):
+        return row[name]
+    for attr in name.split("__"):
+        row = getattr(row, attr)
+    return row
+
+
+def encode_cursor(ordering, values, reverse=False):
+    payload = {"o": ordering, "v": values}
+    if reverse:
+        payload["r"] = 1
+    data = json.dumps(payload, cls=DjangoJSONEncoder, separators=(",", ":"))
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token, ordering):
+    """
+    Decode a cursor produced by `encode_cursor`. Returns `(values, reverse)` or
+    raises `ValueError` if the cursor is malformed or was built for another ordering.
+    """
+    try:
+        data = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        payload = json.loads(data)
+        values = payload["v"]
+        reverse = bool(payload.get("r"))
+    except (TypeError, ValueError, KeyError, AttributeError):
+        raise ValueError("Malformed cursor.")
+    if payload.get("o") != ordering or len(values) != len(ordering):
+        raise ValueError("Cursor does not match the requested ordering.")
+    return values, reverse
+
+
+# Cursor pagination on a stable (ordering key, id) keyset: no COUNT(*) and no OFFSET,
+# so every page costs the same index range scan however deep the client pages.
+class KeysetPagination(BasePagination):
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = "page_size"
+    max_page_size = 500
+    cursor_query_param = "cursor"
+    tiebreaker = "id"
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self._page_queryset(queryset, request)
+        return self._set_page(list(queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """`paginate_queryset` for async views, fetching the page with the async ORM."""
+        queryset = self._page_queryset(queryset, request)
+        return self._set_page([row async for row in queryset])
+
+    def _page_queryset(self, queryset, request):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        order_by = queryset.query.order_by or queryset.model._meta.ordering
+        self.ordering = keyset_ordering(order_by, self.tiebreaker)
+        self.has_next = self.has_previous = False
+
+        self.values, self.reverse = None, False
+        token = request.query_params.get(self.cursor_query_param)
+        if token:
+            try:
+                values, self.reverse = decode_cursor(token, self.ordering)
+                self.values = cursor_values(queryset.model, self.ordering, values)
+            except ValueError:
+                raise NotFound(self.invalid_cursor_message)
+
+        nullable = nullable_columns(queryset.model, self.ordering)
+        queryset = queryset.order_by(*keyset_order_by(self.ordering, nullable, self.reverse))
+        if self.values is not None:
+            queryset = queryset.filter(
+                keyset_filter(self.ordering, self.values, self.reverse, nullable)
+            )
+
+        # Fetch one extra row to know whether another page follows
+        return queryset[: self.page_size + 1]
+
+    def _set_page(self, results):
+        has_more = len(results) > self.page_size
+        results = results[: self.page_size]
+
+        if self.reverse:
+            results.reverse()
+            self.has_previous = has_more
+            self.has_next = True
+        else:
+            self.has_next = has_more
+            self.has_previous = self.values is not None
+
+        self.page = results
+        return results
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "next": self.get_next_link(),
+                "previous": self.get_previous_link(),
+                "results": data,
+            }
+        )
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True,
+                cutoff=self.max_page_size,
+            )
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self._link(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self._link(self.page[0], reverse=True)
+
+    def _link(self, row, reverse):
+        values = [row_value(row, field) for field in self.ordering]
+        token = encode_cursor(self.ordering, values, reverse)
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, token)
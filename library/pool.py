@@ -0,0 +1,257 @@
+# library/pool.py
+# Per-process database connection pool behind the "library.pooled_postgresql" backend
+# (DB_POOL=true, see settings). Django then closes its connection at the end of every request
+# as with CONN_MAX_AGE=0, but closing hands the connection back here instead of hanging up,
+# and the next request (in any thread of the worker) checks out an idle one.
+#
+# - At most `max_size` connections per process; a checkout beyond that waits up to `timeout`
+#   seconds for one to come back, then raises PoolTimeout.
+# - With `check` (CONN_HEALTH_CHECKS) every checkout runs `SELECT 1` first, so a connection
+#   dropped by a database restart, failover or PgBouncer is replaced before a query fails.
+# - Connections older than `max_lifetime`, or idle for `max_idle` beyond the first
+#   `min_size`, are closed, so quiet workers do not keep idle server connections around.
+# - A connection that comes back inside a transaction is rolled back; a broken one is closed.
+#
+# The pool is plain DB-API and imports nothing from Django's models, because the database
+# backend loads it before the apps are ready. Its Prometheus metrics land in the default
+# registry and therefore on /metrics (library/metrics.py), per worker or summed across
+# workers in multiprocess mode.
+import threading
+import time
+from collections import deque
+from prometheus_client import Counter, Gauge, Histogram
+
+ACQUIRE_SECONDS = Histogram(
+    "library_db_pool_acquire_seconds",
+    "Time to check a connection out of the pool, waits and new connections included.",
+    ["alias"],
+    buckets=(0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1, 2.5, 10),
+)
+TIMEOUTS = Counter(
+    "library_db_pool_timeouts", "Checkouts that gave up waiting for a connection.", ["alias"]
+)
+OPENED = Counter("library_db_pool_connections_opened", "Connections opened.", ["alias"])
+CLOSED = Counter(
+    "library_db_pool_connections_closed",
+    "Connections closed by reason: lifetime, idle, broken or health_check.",
+    ["alias", "reason"],
+)
+CONNECTIONS = Gauge(
+    "library_db_pool_connections",
+    "Open connections by state (idle, in_use).",
+    ["alias", "state"],
+    multiprocess_mode="livesum",
+)
+WAITING = Gauge(
+    "library_db_pool_waiting",
+    "Checkouts waiting for a connection.",
+    ["alias"],
+    multiprocess_mode="livesum",
+)
+
+# conn.info.transaction_status, the same numbers in psycopg2 and psycopg 3
+STATUS_IDLE = 0
+STATUS_UNKNOWN = 4
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class _Entry:
+    __slots__ = ("connection", "created", "released")
+
+    def __init__(self, connection, now):
+        self.connection = connection
+        self.created = now
+        self.released = now
+
+
+def health_check(connection):
+    cursor = connection.cursor()
+    try:
+        cursor.execute("SELECT 1")
+    finally:
+        cursor.close()
+
+
+def _reset(connection):
+    """Make a returned connection reusable; False when it has to be closed instead."""
+    if getattr(connection, "closed", False):
+        return False
+    info = getattr(connection, "info", None)
+    status = info.transaction_status if info is not None else None
+    if status == STATUS_UNKNOWN:
+        return False  # The server connection is gone
+    if status != STATUS_IDLE:
+        connection.rollback()  # Left inside a transaction, or a DB-API driver without `info`
+    return True
+
+
+class ConnectionPool:
+    def __init__(
+        self, connect, alias="default", min_size=0, max_size=10, timeout=10.0,
+        max_lifetime=1800.0, max_idle=300.0, check=False,
+    ):
+        self.connect = connect
+        self.alias = alias
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.max_idle = max_idle
+        self.check = check
+        self._idle = deque()  # Most recently returned on the right
+        self._in_use = {}
+        self._opening = 0
+        self._waiting = 0
+        self.opened = 0  # Connections opened over the pool's life
+        self._available = threading.Condition(threading.Lock())
+        self._acquire_seconds = ACQUIRE_SECONDS.labels(alias)
+        self._idle_gauge = CONNECTIONS.labels(alias, "idle")
+        self._in_use_gauge = CONNECTIONS.labels(alias, "in_use")
+        self._waiting_gauge = WAITING.labels(alias)
+
+    @property
+    def size(self):
+        """Connections open or being opened (call under the lock)."""
+        return len(self._idle) + len(self._in_use) + self._opening
+
+    def stats(self):
+        with self._available:
+            return {
+                "idle": len(self._idle),
+                "in_use": len(self._in_use),
+                "opening": self._opening,
+                "waiting": self._waiting,
+            }
+
+    def acquire(self):
+        """Check out a connection: an idle one, a new one while under `max_size`, or wait."""
+        started = time.monotonic()
+        deadline = started + self.timeout
+        while True:
+            stale = []
+            try:
+                entry = self._take(deadline, stale)
+            finally:
+                self._discard(stale)
+            if entry is None:
+                entry = self._open()
+            elif self.check and not self._healthy(entry):
+                continue
+            self._acquire_seconds.observe(time.monotonic() - started)
+            return entry.connection
+
+    def release(self, connection):
+        """Return a checked-out connection; it is rolled back or closed as needed."""
+        with self._available:
+            entry = self._in_use.pop(id(connection), None)
+        if entry is None:
+            return  # Not ours (e.g. after `close()`): nothing to hand back
+        self._in_use_gauge.dec()
+        try:
+            reusable = _reset(connection)
+        except Exception:
+            reusable = False
+        now = time.monotonic()
+        if not reusable or now - entry.created >= self.max_lifetime:
+            self._close(entry, "broken" if not reusable else "lifetime")
+            with self._available:
+                self._available.notify()  # Room for a new connection
+            return
+        entry.released = now
+        with self._available:
+            self._idle.append(entry)
+            self._idle_gauge.inc()
+            self._available.notify()
+
+    def close(self):
+        """Close the idle connections; checked-out ones are closed when they come back."""
+        with self._available:
+            idle, self._idle = list(self._idle), deque()
+            self.max_lifetime = 0
+        self._idle_gauge.dec(len(idle))
+        for entry in idle:
+            self._close(entry, "lifetime")
+
+    def _take(self, deadline, stale):
+        """An idle entry, or None to open a new one. Collects expired entries in `stale`."""
+        with self._available:
+            while True:
+                now = time.monotonic()
+                # Oldest first: idle beyond `max_idle` while above `min_size`
+                while (
+                    self._idle
+                    and now - self._idle[0].released >= self.max_idle
+                    and self.size > self.min_size
+                ):
+                    stale.append(self._idle.popleft())
+                    self._idle_gauge.dec()
+                while self._idle:
+                    entry = self._idle.pop()  # Most recently used: warm, and lets others idle out
+                    self._idle_gauge.dec()
+                    if now - entry.created >= self.max_lifetime:
+                        stale.append(entry)
+                        continue
+                    self._in_use[id(entry.connection)] = entry
+                    self._in_use_gauge.inc()
+                    return entry
+                if self.size < self.max_size:
+                    self._opening += 1
+                    return None
+                remaining = deadline - now
+                if remaining <= 0:
+                    TIMEOUTS.labels(self.alias).inc()
+                    raise PoolTimeout(
+                        f"No database connection for {self.alias!r} within {self.timeout}s "
+                        f"({self.max_size} in use)"
+                    )
+                self._waiting += 1
+                self._waiting_gauge.inc()
+                try:
+                    self._available.wait(remaining)
+                finally:
+                    self._waiting -= 1
+                    self._waiting_gauge.dec()
+
+    def _open(self):
+        try:
+            connection = self.connect()
+        except BaseException:
+            with self._available:
+                self._opening -= 1
+                self._available.notify()
+            raise
+        entry = _Entry(connection, time.monotonic())
+        with self._available:
+            self._opening -= 1
+            self.opened += 1
+            self._in_use[id(connection)] = entry
+        OPENED.labels(self.alias).inc()
+        self._in_use_gauge.inc()
+        return entry
+
+    def _healthy(self, entry):
+        try:
+            health_check(entry.connection)
+        except Exception:
+            with self._available:
+                self._in_use.pop(id(entry.connection), None)
+                self._available.notify()
+            self._in_use_gauge.dec()
+            self._close(entry, "health_check")
+            return False
+        return True
+
+    def _discard(self, stale):
+        now = time.monotonic()
+        for entry in stale:
+            self._close(entry, "lifetime" if now - entry.created >= self.max_lifetime else "idle")
+
+    def _close(self, entry, reason):
+        CLOSED.labels(self.alias, reason).inc()
+        try:
+            entry.connection.close()
+        except Exception:
+            pass  # Already gone
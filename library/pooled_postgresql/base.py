@@ -0,0 +1,83 @@
+# library/pooled_postgresql/base.py
+# Django's PostgreSQL backend with connections checked out of a per-process pool
+# (library/pool.py) instead of opened per request. Enabled by DB_POOL=true (settings), which
+# sets ENGINE to this package, CONN_MAX_AGE to 0 and the pool limits under the "POOL" key.
+# Works with psycopg2, the driver the rest of the project uses, and with psycopg 3.
+import os
+import threading
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.postgresql import base
+from django.db.backends.postgresql.psycopg_any import IsolationLevel, is_psycopg3
+from django.db.utils import NO_DB_ALIAS
+from django.utils.asyncio import async_unsafe
+from library import pool
+
+_pools = {}  # alias -> (pid, database name, ConnectionPool)
+_pools_lock = threading.Lock()
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def connection_pool(self):
+        options = self.settings_dict.get("POOL")
+        if self.alias == NO_DB_ALIAS or not options:
+            return None  # Maintenance connections (e.g. creating the test database)
+        with _pools_lock:
+            pid, name, current = _pools.get(self.alias, (None, None, None))
+            # A pool built before gunicorn forked is not ours, and the test runner renames
+            # the database after the system checks may already have connected
+            if pid != os.getpid() or name != self.settings_dict["NAME"]:
+                if current is not None and pid == os.getpid():
+                    current.close()
+                if self.settings_dict.get("CONN_MAX_AGE", 0) != 0:
+                    raise ImproperlyConfigured("A pooled database needs CONN_MAX_AGE = 0.")
+                conn_params = self.get_connection_params()
+                current = pool.ConnectionPool(
+                    lambda: self._open_pooled(conn_params),
+                    alias=self.alias,
+                    check=self.settings_dict["CONN_HEALTH_CHECKS"],
+                    **(options if isinstance(options, dict) else {}),
+                )
+                _pools[self.alias] = (os.getpid(), self.settings_dict["NAME"], current)
+        return current
+
+    def _open_pooled(self, conn_params):
+        connection = self.Database.connect(**conn_params)
+        if not is_psycopg3:
+            # As Django does: skip psycopg2's JSON decoding round trip (JSONField decodes)
+            base.psycopg2.extras.register_default_jsonb(conn_or_curs=connection, loads=lambda x: x)
+        return connection
+
+    @async_unsafe
+    def get_new_connection(self, conn_params):
+        connection_pool = self.connection_pool()
+        if connection_pool is None:
+            return super().get_new_connection(conn_params)
+        isolation_level = self.settings_dict["OPTIONS"].get("isolation_level")
+        try:
+            self.isolation_level = IsolationLevel(
+                IsolationLevel.READ_COMMITTED if isolation_level is None else isolation_level
+            )
+        except ValueError:
+            raise ImproperlyConfigured(
+                f"Invalid transaction isolation level {isolation_level} specified."
+            )
+        try:
+            connection = connection_pool.acquire()
+        except pool.PoolTimeout as error:
+            raise self.Database.OperationalError(str(error)) from error
+        if isolation_level is not None:
+            connection.isolation_level = self.isolation_level
+        return connection
+
+    def _close(self):
+        connection_pool = self.connection_pool()
+        if connection_pool is None or self.connection is None:
+            return super()._close()
+        with self.wrap_database_errors:
+            connection_pool.release(self.connection)
+        self.connection = None  # Handed back, even when closed inside an atomic block
+
+    def close_if_health_check_failed(self):
+        if self.connection_pool() is not None:
+            return  # Checked at checkout (library/pool.py)
+        return super().close_if_health_check_failed()
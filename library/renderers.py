@@ -0,0 +1,44 @@
+# library/renderers.py
+# JSON rendering with orjson, producing exactly the bytes DRF's JSONRenderer writes: compact
+# separators, UTF-8 without `\u` escapes except for U+2028/U+2029, and DRF's encoder for
+# datetimes, decimals, lazy strings and the like. Whatever orjson refuses (integers beyond
+# 64 bits, non-string keys, lone surrogates), indented output and a missing orjson fall back
+# to DRF's stdlib path.
+#
+# orjson writes some floats differently from Python (`1e-05` becomes `0.00001`), so this is
+# not a project-wide default: views opt in when their payloads cannot hold floats (the fast
+# read paths in library/fastread.py).
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # Optional speed-up (requirements.txt); DRF's renderer does the work
+    orjson = None
+
+if orjson is not None:
+    # Dates and times go through DRF's encoder (`Z` suffix, millisecond precision)
+    OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+
+LINE_SEPARATOR = "\u2028".encode()
+PARAGRAPH_SEPARATOR = "\u2029".encode()
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None
+            or data is None
+            or self.ensure_ascii
+            or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            content = orjson.dumps(data, default=self.encoder_class().default, option=OPTIONS)
+        except TypeError:  # orjson.JSONEncodeError
+            return super().render(data, accepted_media_type, renderer_context)
+        # Escaped like DRF does, so the output is a strict JavaScript subset
+        if LINE_SEPARATOR in content or PARAGRAPH_SEPARATOR in content:
+            content = content.replace(LINE_SEPARATOR, b"\\u2028")
+            content = content.replace(PARAGRAPH_SEPARATOR, b"\\u2029")
+        return content
@@ -0,0 +1,160 @@
+# library/routing.py
+# Optional read replica (DATABASE_REPLICA_URL -> the "replica" alias, LIBRARY_READ_REPLICAS).
+# Reads go to a replica only inside views marked as safe for it: catalog list/detail and
+# search (`ReplicaReadsMixin` on BookViewSet, the async book views) and exports
+# (`read_database()`). Everything else, every write and every read inside a transaction
+# stays on the primary, so the borrow/return paths never decide anything on lagging data.
+#
+# Read-your-writes: a successful write request pins its user to the primary for
+# LIBRARY_REPLICA_STICKY_SECONDS (`ReadYourWritesMiddleware`), so a patron who just borrowed
+# sees the new stock and loan even while the replica lags. Pins live in the Django cache;
+# use a shared cache backend when running several workers.
+#
+# The alias is chosen on a request's first query, not up front, so catalog responses served
+# from the response cache (library/caching.py) need no authentication unless a replica is
+# configured. The response cache only stores bodies read from the primary and is bypassed for
+# pinned users: a lagging replica's rows cached under a freshly bumped catalog version would
+# otherwise be served to everyone, the writer included.
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from rest_framework.permissions import SAFE_METHODS
+
+PIN_KEY = "library:replica:pin:{user_id}"
+
+_scope = ContextVar("library_replica_scope", default=None)
+
+
+def replicas():
+    return getattr(settings, "LIBRARY_READ_REPLICAS", [])
+
+
+def sticky_seconds():
+    return getattr(settings, "LIBRARY_REPLICA_STICKY_SECONDS", 5)
+
+
+def pin(user_id):
+    """Keep this user's reads on the primary for the stickiness window."""
+    if replicas() and sticky_seconds() > 0:
+        cache.set(PIN_KEY.format(user_id=user_id), True, timeout=sticky_seconds())
+
+
+def is_pinned(user_id):
+    return cache.get(PIN_KEY.format(user_id=user_id)) is not None
+
+
+def pinned_request(request):
+    """Whether a replica is configured and this request's user is pinned to the primary."""
+    if not replicas():
+        return False
+    user = getattr(request, "user", None)
+    return user is not None and user.is_authenticated and is_pinned(user.pk)
+
+
+def read_database(request):
+    """The alias a safe read for this request may use: a replica, unless the user is pinned."""
+    if not replicas() or pinned_request(request):
+        return DEFAULT_DB_ALIAS
+    return random.choice(replicas())
+
+
+def read_from_replica():
+    """Whether the reads of the current replica scope went to a replica."""
+    scope = _scope.get()
+    return scope is not None and scope.alias not in (None, DEFAULT_DB_ALIAS)
+
+
+class ReadScope:
+    def __init__(self, request):
+        self.request = request
+        self.alias = None
+
+    def database(self):
+        if self.alias is None:
+            # Queries run while deciding (lazy JWT authentication) go to the primary
+            self.alias = DEFAULT_DB_ALIAS
+            self.alias = read_database(self.request)
+        return self.alias
+
+
+@contextmanager
+def replica_reads(request):
+    """Let the reads inside this block use a replica (when one is configured)."""
+    token = _scope.set(ReadScope(request) if replicas() else None)
+    try:
+        yield
+    finally:
+        _scope.reset(token)
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        scope = _scope.get()
+        if scope is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return scope.database()
+
+    def db_for_write(self, model, **hints):
+        # Also for objects that were read from a replica
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True  # Replicas hold the same rows as the primary
+        return None
+
+
+# Serves a viewset's safe `replica_actions` from a replica. DRF calls `initial()` and
+# `finalize_response()` around every handler, so the scope covers exactly one request.
+class ReplicaReadsMixin:
+    replica_actions = ("list", "retrieve")
+
+    def initial(self, request, *args, **kwargs):
+        if request.method in SAFE_METHODS and self.action in self.replica_actions:
+            self._replica_scope = _scope.set(ReadScope(request) if replicas() else None)
+        super().initial(request, *args, **kwargs)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = self.__dict__.pop("_replica_scope", None)
+        if token is not None:
+            _scope.reset(token)
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class ReadYourWritesMiddleware:
+    """Pins users to the primary after a successful write request (POST, PUT, PATCH, DELETE)."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        response = self.get_response(request)
+        self.process_response(request, response)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        self.process_response(request, response)
+        return response
+
+    @staticmethod
+    def process_response(request, response):
+        if request.method in SAFE_METHODS or response.status_code >= 400 or not replicas():
+            return
+        # DRF copies the user it authenticated (JWT) onto the Django request
+        user = getattr(request, "user", None)
+        if user is not None and user.is_authenticated:
+            pin(user.pk)
@@ -0,0 +1,210 @@
+# library/search.py
+# Pluggable full-text search backends for the book catalog.
+# PostgreSQL uses a generated, GIN-indexed `tsvector` column; SQLite uses an FTS5 table kept in
+# sync by triggers. Both are created by migration 0002_book_search.
+import re
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import BooleanField, FloatField, Q
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+from .models import Book, BookSearchEntry
+
+TOKEN_RE = re.compile(r"[^\W_]+")
+
+BOOK_TABLE = Book._meta.db_table
+FTS_TABLE = BookSearchEntry._meta.db_table
+SEARCH_VECTOR_COLUMN = "search_vector"
+
+
+def parse_query(text):
+    """
+    Split a search string into text terms and years. Every token, numbers included, is a text
+    term so titles like "Fahrenheit 451" still match; numeric tokens of up to four digits are
+    also candidate years for the integer `year_published` column.
+    """
+    terms = TOKEN_RE.findall(text.lower())
+    years = [int(token) for token in terms if token.isdigit() and len(token) <= 4]
+    return terms, years
+
+
+class BaseSearchBackend:
+    # Whether `search()` annotates a `search_rank` (higher is more relevant)
+    ranked = False
+
+    def search(self, queryset, text):
+        terms, years = parse_query(text)
+        if not terms:
+            return queryset
+        if not years:
+            return self.match(queryset, terms)
+
+        # A number may be a year or part of a title ("Catch 22", "1984"): a book matches when
+        # all terms match its text, or when it was published in one of the years and the
+        # remaining words match. The OR goes through id subqueries, so results are unranked.
+        matches = queryset.model._default_manager.using(queryset.db)
+        words = [term for term in terms if not (term.isdigit() and len(term) <= 4)]
+        in_years = Q(year_published__in=years)
+        if words:
+            in_years &= Q(pk__in=self.match(matches, words).values("pk"))
+        return queryset.filter(Q(pk__in=self.match(matches, terms).values("pk")) | in_years)
+
+    def match(self, queryset, terms):
+        raise NotImplementedError
+
+
+# Portable fallback: one case-insensitive LIKE per term, no index and no ranking
+class LikeSearchBackend(BaseSearchBackend):
+    fields = ("name", "author", "category")
+
+    def match(self, queryset, terms):
+        for term in terms:
+            condition = Q()
+            for field in self.fields:
+                condition |= Q(**{f"{field}__icontains": term})
+            queryset = queryset.filter(condition)
+        return queryset
+
+
+# PostgreSQL: `search_vector @@ to_tsquery(...)` served by a GIN index, ranked with ts_rank
+class PostgresSearchBackend(BaseSearchBackend):
+    ranked = True
+    config = "english"
+
+    def match(self, queryset, terms):
+        # Every term is a prefix so partially typed words still match
+        tsquery = " & ".join(f"{term}:*" for term in terms)
+        vector = f'"{BOOK_TABLE}"."{SEARCH_VECTOR_COLUMN}"'
+        query = f"to_tsquery('{self.config}', %s)"
+        return queryset.filter(
+            RawSQL(f"{vector} @@ {query}", [tsquery], output_field=BooleanField())
+        ).annotate(
+            search_rank=RawSQL(
+                f"ts_rank({vector}, {query})", [tsquery], output_field=FloatField()
+            )
+        )
+
+
+# SQLite: FTS5 external-content table over name/author/category, ranked with bm25.
+# The index is joined through the unmanaged BookSearchEntry model so bm25() is computed once
+# per matching row instead of re-running MATCH in a correlated subquery.
+class SQLiteSearchBackend(BaseSearchBackend):
+    ranked = True
+    weights = "10.0, 5.0, 1.0"  # name, author, category
+
+    def match(self, queryset, terms):
+        match = " ".join(f'"{term}"*' for term in terms)
+        return (
+            queryset.filter(search_entry__isnull=False)  # INNER JOIN on the FTS table
+            .filter(RawSQL(f'"{FTS_TABLE}" MATCH %s', [match], output_field=BooleanField()))
+            .annotate(
+                # bm25() is lower-is-better, negate it so every backend sorts rank descending
+                search_rank=RawSQL(
+                    f'-bm25("{FTS_TABLE}", {self.weights})', [], output_field=FloatField()
+                )
+            )
+        )
+
+
+VENDOR_BACKENDS = {
+    "postgresql": PostgresSearchBackend,
+    "sqlite": SQLiteSearchBackend,
+}
+
+
+def get_search_backend(using=DEFAULT_DB_ALIAS):
+    """
+    Return the search backend for a database alias. `LIBRARY_SEARCH_BACKEND` (a dotted path)
+    overrides the choice made from the database vendor.
+    """
+    path = getattr(settings, "LIBRARY_SEARCH_BACKEND", None)
+    if path:
+        return import_string(path)()
+    return VENDOR_BACKENDS.get(connections[using].vendor, LikeSearchBackend)()
+
+
+POSTGRES_INSTALL_SQL = [
+    f"""
+    ALTER TABLE {BOOK_TABLE} ADD COLUMN IF NOT EXISTS {SEARCH_VECTOR_COLUMN} tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(name, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(author, '')), 'B') ||
+        setweight(to_tsvector('simple', coalesce(category, '')), 'C')
+    ) STORED
+    """,
+    f"""
+    CREATE INDEX IF NOT EXISTS {BOOK_TABLE}_search_vector_idx
+    ON {BOOK_TABLE} USING GIN ({SEARCH_VECTOR_COLUMN})
+    """,
+]
+
+POSTGRES_UNINSTALL_SQL = [
+    f"ALTER TABLE {BOOK_TABLE} DROP COLUMN IF EXISTS {SEARCH_VECTOR_COLUMN}",
+]
+
+SQLITE_TABLE_SQL = f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        name, author, category,
+        content='{BOOK_TABLE}', content_rowid='id',
+        tokenize='porter unicode61 remove_diacritics 2'
+    )
+"""
+
+SQLITE_TRIGGERS_SQL = {
+    f"{FTS_TABLE}_ai": f"""
+        CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON {BOOK_TABLE} BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, name, author, category)
+            VALUES (new.id, new.name, new.author, new.category);
+        END
+    """,
+    f"{FTS_TABLE}_ad": f"""
+        CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON {BOOK_TABLE} BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, author, category)
+            VALUES ('delete', old.id, old.name, old.author, old.category);
+        END
+    """,
+    # Only text columns: inventory updates on every borrow never touch the index
+    f"{FTS_TABLE}_au": f"""
+        CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE OF name, author, category ON {BOOK_TABLE} BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, author, category)
+            VALUES ('delete', old.id, old.name, old.author, old.category);
+            INSERT INTO {FTS_TABLE}(rowid, name, author, category)
+            VALUES (new.id, new.name, new.author, new.category);
+        END
+    """,
+}
+
+
+def install(connection):
+    """
+    Create the search index for the connection's vendor. Idempotent: it also runs after
+    every `migrate`, because SQLite drops triggers whenever a migration rebuilds the table.
+    """
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            for sql in POSTGRES_INSTALL_SQL:
+                cursor.execute(sql)
+        elif connection.vendor == "sqlite":
+            cursor.execute(SQLITE_TABLE_SQL)
+            cursor.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = %s",
+                [BOOK_TABLE],
+            )
+            existing = {row[0] for row in cursor.fetchall()}
+            missing = [name for name in SQLITE_TRIGGERS_SQL if name not in existing]
+            for name in missing:
+                cursor.execute(SQLITE_TRIGGERS_SQL[name])
+            if missing:
+                # Writes may have happened without the triggers, re-index from the table
+                cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def uninstall(connection):
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            for sql in POSTGRES_UNINSTALL_SQL:
+                cursor.execute(sql)
+        elif connection.vendor == "sqlite":
+            for name in SQLITE_TRIGGERS_SQL:
+                cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+            cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
@@ -0,0 +1,199 @@
+# library/seeding.py
+# Synthetic data at scale for load tests (`manage.py seed_scale`, benchmarks/bench_load.py).
+# Rows are generated as plain tuples from a seeded random generator and written in batches
+# without building model instances: with PostgreSQL `COPY ... FROM STDIN`, elsewhere one
+# `executemany` INSERT per batch. Every user shares one precomputed password hash, so a
+# hundred thousand users cost one PBKDF2 run instead of hours of hashing.
+#
+# The bulk writes skip the model signals, so the dashboard counters, loan summaries and the
+# catalog caches are rebuilt once at the end, the same way library/importing.py does it.
+import csv
+import io
+import random
+import re
+import time
+from datetime import timedelta
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils.timezone import now
+from . import caching, feed, stats, suggest, summaries
+from .models import Book, Loan
+
+WORDS = (
+    "shadow river night garden silver winter empire secret ocean queen storm light "
+    "dragon city stone fire glass forest iron crown wolf star dream mountain letter "
+    "island hunter spring kingdom memory sword paper engine harbor orchard compass "
+    "lantern valley summer voyage mirror thunder cedar raven marble whisper falcon"
+).split()
+NAMES = (
+    "Ada Alan Grace Linus Mary Ken Barbara Donald Edsger Frances Margaret John "
+    "Tim Radia Ivan Leslie Sophie Niklaus Dennis Jean Hedy Katherine"
+).split()
+CATEGORIES = [key for key, _ in Book.CATEGORY_CHOICES]
+PASSWORD = "seed-password"  # Every seeded user's password
+USERNAME = "seed{}"
+HISTORY_DAYS = 730  # Returned loans are spread over this many past days
+SIZE_RE = re.compile(r"^(\d+(?:\.\d+)?)([kKmM]?)$")
+
+
+def parse_size(text):
+    """`"1M"` -> 1000000, `"100k"` -> 100000, `"250"` -> 250."""
+    match = SIZE_RE.match(str(text).strip().replace("_", ""))
+    if not match:
+        raise ValueError(f"Not a row count: {text!r} (use e.g. 5000, 100k or 1M)")
+    number, suffix = match.groups()
+    return int(float(number) * {"": 1, "k": 1_000, "m": 1_000_000}[suffix.lower()])
+
+
+def write_rows(model, columns, rows):
+    """Insert tuples into `model`'s table in one statement (COPY on PostgreSQL)."""
+    table = connection.ops.quote_name(model._meta.db_table)
+    names = ", ".join(connection.ops.quote_name(column) for column in columns)
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(rows)
+            buffer.seek(0)
+            cursor.copy_expert(f"COPY {table} ({names}) FROM STDIN WITH (FORMAT csv)", buffer)
+        else:
+            placeholders = ", ".join(["%s"] * len(columns))
+            cursor.executemany(f"INSERT INTO {table} ({names}) VALUES ({placeholders})", rows)
+
+
+class SeedReport:
+    def __init__(self):
+        self.rows = {}
+        self.started = time.perf_counter()
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+
+def _write(model, columns, rows, batch_size, report, on_batch):
+    name = model._meta.model_name
+    report.rows.setdefault(name, 0)
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            with transaction.atomic():
+                write_rows(model, columns, batch)
+            report.rows[name] += len(batch)
+            batch = []
+            if on_batch:
+                on_batch(name, report)
+    if batch:
+        with transaction.atomic():
+            write_rows(model, columns, batch)
+        report.rows[name] += len(batch)
+        if on_batch:
+            on_batch(name, report)
+
+
+def _next_id(model):
+    return (model.objects.aggregate(top=Max("pk"))["top"] or 0) + 1
+
+
+def book_rows(rng, start, count):
+    for number in range(start, start + count):
+        title = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 4))).title()
+        yield (
+            f"{title} {number}",  # The number keeps (name, author) unique
+            f"{rng.choice(NAMES)} {rng.choice(WORDS).title()}son",
+            rng.randint(1800, 2024),
+            rng.choice(CATEGORIES),
+            rng.randint(0, 5),
+            Book.DEFAULT_IMAGE_URL,
+        )
+
+
+def user_rows(start, count, password_hash):
+    joined = connection.ops.adapt_datetimefield_value(now())
+    for number in range(start, start + count):
+        username = USERNAME.format(number)
+        yield (
+            username, password_hash, "", "", f"{username}@example.com",
+            False, False, True, joined, None,
+        )
+
+
+def loan_rows(rng, count, user_ids, book_ids, active_share, overdue_share):
+    today = now().date()
+    durations = Loan.LOAN_DURATIONS
+    adapt = connection.ops.adapt_datefield_value
+    for _ in range(count):
+        loan_type = rng.randint(1, 3)
+        active = rng.random() < active_share
+        if not active:
+            loan_date = today - timedelta(days=rng.randint(0, HISTORY_DAYS))
+        elif rng.random() < overdue_share:
+            loan_date = today - timedelta(days=durations[loan_type] + rng.randint(1, 30))
+        else:  # Still within its loan period, so the patron may borrow more
+            loan_date = today - timedelta(days=rng.randint(0, durations[loan_type]))
+        yield (
+            rng.choice(user_ids),
+            rng.choice(book_ids),
+            loan_type,
+            adapt(loan_date),
+            adapt(loan_date + timedelta(days=durations[loan_type])),
+            not active,
+            False,
+        )
+
+
+def generate(
+    books=0, users=0, loans=0, active_share=0.05, overdue_share=0.02, seed=42, batch_size=10000,
+    on_batch=None,
+):
+    """
+    Append `books`, `users` and `loans` synthetic rows. Loans go to random existing users
+    and books (seeded ones included); `active_share` of them are not returned yet, and
+    `overdue_share` of those are past due.
+    Returns a SeedReport; `on_batch(table, report)` is called after every committed batch.
+    """
+    rng = random.Random(seed)
+    report = SeedReport()
+    if books:
+        _write(
+            Book,
+            ["name", "author", "year_published", "category", "inventory", "image_url"],
+            book_rows(rng, _next_id(Book), books),
+            batch_size, report, on_batch,
+        )
+    if users:
+        _write(
+            User,
+            [
+                "username", "password", "first_name", "last_name", "email",
+                "is_superuser", "is_staff", "is_active", "date_joined", "last_login",
+            ],
+            user_rows(_next_id(User), users, make_password(PASSWORD)),
+            batch_size, report, on_batch,
+        )
+    if loans:
+        user_ids = list(User.objects.values_list("pk", flat=True))
+        book_ids = list(Book.objects.values_list("pk", flat=True))
+        if not user_ids or not book_ids:
+            raise ValueError("Loans need at least one user and one book.")
+        _write(
+            Loan,
+            ["user_id", "book_id", "type", "loan_date", "return_date", "returned", "overdue"],
+            loan_rows(rng, loans, user_ids, book_ids, active_share, overdue_share),
+            batch_size, report, on_batch,
+        )
+
+    # The writes skipped the signals: recount and drop the derived caches once at the end
+    stats.rebuild()
+    if users or loans:
+        summaries.rebuild()  # Seeded users get their summary row even without loans
+    if books:
+        suggest.invalidate_index()
+        caching.invalidate_catalog()
+        feed.resync()
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")  # Fresh planner statistics before anyone measures
+    return report
@@ -1,10 +1,11 @@
 # library/serializers.py
-from .models import Book, Loan
+from . import inventory
+from .timing import TimedSerializerMixin
+from .models import Book, Hold, Loan, LoanArchive
 from django.contrib.auth.models import User
-from django.utils.timezone import now
+from django.db import transaction
 from rest_framework import serializers
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
-from datetime import date, timedelta
 
 
 # Custom serializer for generating JWT tokens with additional user information.
@@ -18,7 +19,7 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
 
 
 # Serializes user data, including additional fields for admin management.
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
 
     class Meta:
@@ -49,14 +50,14 @@ class UserSerializer(serializers.ModelSerializer):
 
 
 # Serializes and deserializes book data.
-class BookSerializer(serializers.ModelSerializer):
+class BookSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Book
         fields = "__all__"
 
 
 # Serializes and deserializes loan data.
-class LoanSerializer(serializers.ModelSerializer):
+class LoanSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     user_name = serializers.CharField(source="user.username", read_only=True)
     book_name = serializers.CharField(source="book.name", read_only=True)
     book_image_url = serializers.CharField(source="book.image_url", read_only=True)
@@ -81,34 +82,64 @@ class LoanSerializer(serializers.ModelSerializer):
         Override create method to ensure `return_date` is set correctly based on loan type
         and decrease the book inventory when a loan is made.
         """
-        book = validated_data["book"]
-        if book.inventory <= 0:
+        # Set by LoanViewSet for patrons borrowing for themselves; staff may skip admission
+        check_overdue = validated_data.pop("check_overdue", False)
+        # Return date is always derived from the loan type
+        validated_data["return_date"] = inventory.due_date(validated_data.get("type"))
+        try:
+            return inventory.issue_loan(Loan(**validated_data), check_overdue=check_overdue)
+        except inventory.OutOfStock:
             raise serializers.ValidationError({"error": "This book is out of stock."})
-
-        # Reduce inventory
-        book.inventory -= 1
-        book.save()
-
-        # Set return date based on loan type
-        loan_type = validated_data.get("type")
-        loan_durations = {1: 10, 2: 5, 3: 2}
-        validated_data["return_date"] = now().date() + timedelta(
-            days=loan_durations.get(loan_type, 10)
-        )
-
-        return super().create(validated_data)
+        except (inventory.OverdueLoans, inventory.LoanLimitReached) as exc:
+            raise serializers.ValidationError({"error": str(exc)})
 
     def update(self, instance, validated_data):
         """
         Override update method to allow marking books as returned.
         """
-        if (
-            "returned" in validated_data
-            and validated_data["returned"] is True
-            and not instance.returned
-        ):
-            instance.returned = True
-            instance.book.inventory += 1  # Increase inventory when returned
-            instance.book.save()
-
-        return super().update(instance, validated_data)
+        with transaction.atomic():
+            if (
+                "returned" in validated_data
+                and validated_data["returned"] is True
+                and not instance.returned
+            ):
+                try:
+                    inventory.close_loan(instance)  # Increase inventory when returned
+                except inventory.AlreadyReturned:
+                    instance.returned = True
+
+            return super().update(instance, validated_data)
+
+
+# Read-only view of a patron's hold; `position` is annotated by holds.open_holds()
+class HoldSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    book_name = serializers.CharField(source="book.name", read_only=True)
+    position = serializers.IntegerField(read_only=True, allow_null=True)
+
+    class Meta:
+        model = Hold
+        fields = ["id", "book", "book_name", "status", "position", "created_at", "ready_until"]
+        read_only_fields = fields
+
+
+# Archived loans (library/archive.py), read-only
+class LoanArchiveSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    user_name = serializers.CharField(source="user.username", read_only=True)
+    book_name = serializers.CharField(source="book.name", read_only=True)
+
+    class Meta:
+        model = LoanArchive
+        fields = [
+            "id",
+            "user",
+            "user_name",
+            "book",
+            "book_name",
+            "type",
+            "loan_date",
+            "return_date",
+            "returned",
+            "overdue",
+            "archived_at",
+        ]
+        read_only_fields = fields
@@ -0,0 +1,124 @@
+# library/signals.py
+from django.contrib.auth.models import User
+from django.db import connections, transaction
+from django.db.migrations.recorder import MigrationRecorder
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_init, post_migrate, post_save, pre_delete
+from django.dispatch import receiver
+from . import (
+    authentication, caching, feed, inventory, metrics, search, stats, suggest, summaries, timing,
+)
+from .models import Book, Hold, Loan, LoanArchive, LoanSummary
+
+
+# Count queries per request for library/metrics.py and the sampled timings of library/timing.py
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    metrics.instrument(connection)
+    timing.instrument(connection)
+
+
+# Re-create the catalog search index if a migration rebuilt the book table
+@receiver(post_migrate)
+def ensure_search_index(sender, app_config=None, using="default", **kwargs):
+    if app_config is None or app_config.label != "library":
+        return
+    connection = connections[using]
+    applied = MigrationRecorder(connection).applied_migrations()
+    if ("library", "0002_book_search") in applied:
+        search.install(connection)
+
+
+# Remember the loaded inventory so a later save can adjust the copies counter by the difference.
+# Read from __dict__: touching a deferred field here would cost a query per instance.
+@receiver(post_init, sender=Book)
+def remember_inventory(sender, instance, **kwargs):
+    instance._saved_inventory = instance.__dict__.get("inventory")
+
+
+@receiver(post_save, sender=Book)
+def book_saved(sender, instance, created, update_fields=None, **kwargs):
+    inventory = instance.__dict__.get("inventory")
+    if created:
+        stats.increment(stats.BOOKS)
+        stats.increment(stats.COPIES_IN_STOCK, inventory or 0)
+        feed.books_changed([instance.pk])
+    elif instance._saved_inventory is not None and inventory is not None:
+        if update_fields is None or "inventory" in update_fields:
+            stats.increment(stats.COPIES_IN_STOCK, inventory - instance._saved_inventory)
+            if inventory != instance._saved_inventory:
+                feed.books_changed([instance.pk])
+    instance._saved_inventory = inventory
+    caching.invalidate_catalog()
+    # Keep this worker's suggestion index in step with committed book changes
+    transaction.on_commit(lambda: suggest.book_saved(instance))
+
+
+@receiver(post_delete, sender=Book)
+def book_deleted(sender, instance, **kwargs):
+    stats.increment(stats.BOOKS, -1)
+    stats.increment(stats.COPIES_IN_STOCK, -(instance.__dict__.get("inventory") or 0))
+    caching.invalidate_catalog()
+    book_id = instance.pk
+    feed.books_changed([book_id])
+    transaction.on_commit(lambda: suggest.book_deleted(book_id))
+
+
+# Returns are counted by the inventory service, which closes loans with a conditional UPDATE
+@receiver(post_save, sender=Loan)
+def loan_saved(sender, instance, created, **kwargs):
+    if created:
+        stats.increment(stats.LOANS)
+        if not instance.returned:
+            stats.increment(stats.ACTIVE_LOANS)
+    # Loans issued by the inventory service were already added to the summary on admission
+    if not getattr(instance, "_summary_applied", False):
+        summaries.recompute([instance.user_id])
+    instance._summary_applied = False
+
+
+@receiver(post_delete, sender=Loan)
+def loan_deleted(sender, instance, **kwargs):
+    stats.increment(stats.LOANS, -1)
+    if not instance.returned:
+        stats.increment(stats.ACTIVE_LOANS, -1)
+    # In a User cascade the summary is deleted as well: recomputing would recreate it mid-delete
+    origin = kwargs.get("origin")
+    if isinstance(origin, User) or getattr(origin, "model", None) is User:
+        return
+    summaries.recompute([instance.user_id])
+
+
+# Archived loans are returned and still count toward the loans total (library/archive.py)
+@receiver(post_delete, sender=LoanArchive)
+def archived_loan_deleted(sender, instance, **kwargs):
+    stats.increment(stats.LOANS, -1)
+
+
+# A hold deleted while open (directly or in a User cascade) is cancelled first, so a copy set
+# aside for it goes to the next hold or the shelf. In a Book cascade the copy goes with the book.
+@receiver(pre_delete, sender=Hold)
+def hold_deleted(sender, instance, **kwargs):
+    origin = kwargs.get("origin")
+    if isinstance(origin, Book) or getattr(origin, "model", None) is Book:
+        return
+    if instance.status in Hold.OPEN:
+        try:
+            inventory.cancel_hold(instance.pk)
+        except inventory.HoldClosed:
+            pass
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    if created:
+        stats.increment(stats.USERS)
+        LoanSummary.objects.create(user=instance)
+    # Deactivation and staff changes apply to this worker's cached JWT users at once
+    authentication.forget_user(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    stats.increment(stats.USERS, -1)
+    authentication.forget_user(instance.pk)
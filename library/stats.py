@@ -0,0 +1,108 @@
+# library/stats.py
+# Maintained counters for the admin dashboard. Model signals (library/signals.py) and the
+# inventory service adjust them in the same transaction as the rows they count; bulk writes
+# that bypass signals call `increment()` themselves. `manage.py rebuild_stats` recounts
+# everything from the tables to repair drift.
+#
+# Every counter is split over SHARDS rows and each increment picks one at random, so borrows
+# and returns running in parallel seldom queue on the same row lock. Reads sum the shards.
+import random
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils.timezone import now
+from .models import Book, Loan, LoanArchive, StatCounter
+
+USERS = "users"
+BOOKS = "books"
+LOANS = "loans"
+ACTIVE_LOANS = "active_loans"
+COPIES_IN_STOCK = "copies_in_stock"
+
+COUNTERS = (USERS, BOOKS, LOANS, ACTIVE_LOANS, COPIES_IN_STOCK)
+SHARDS = 8
+
+
+def increment(name, delta=1):
+    if not delta:
+        return
+    shard = random.randrange(SHARDS)
+    updated = StatCounter.objects.filter(name=name, shard=shard).update(
+        value=F("value") + delta
+    )
+    if not updated:
+        # Shard rows are seeded by migration 0006; re-create one if it was flushed
+        StatCounter.objects.get_or_create(name=name, shard=shard)
+        StatCounter.objects.filter(name=name, shard=shard).update(value=F("value") + delta)
+
+
+def read_counters():
+    values = dict.fromkeys(COUNTERS, 0)
+    values.update(
+        StatCounter.objects.filter(name__in=COUNTERS)
+        .values("name")
+        .annotate(total=Sum("value"))
+        .values_list("name", "total")
+    )
+    return values
+
+
+async def aread_counters():
+    values = dict.fromkeys(COUNTERS, 0)
+    async for name, total in (
+        StatCounter.objects.filter(name__in=COUNTERS)
+        .values("name")
+        .annotate(total=Sum("value"))
+        .values_list("name", "total")
+    ):
+        values[name] = total
+    return values
+
+
+def overdue_loans(today=None):
+    # Depends on today's date so it cannot be maintained on write; the partial
+    # loan_active_due_idx index keeps this to a scan of active loans only
+    return Loan.objects.filter(returned=False, return_date__lt=today or now().date())
+
+
+def overdue_loans_count():
+    return overdue_loans().count()
+
+
+async def aoverdue_loans_count():
+    return await overdue_loans().acount()
+
+
+def count_from_tables():
+    books = Book.objects.aggregate(copies=Sum("inventory"))
+    return {
+        USERS: User.objects.count(),
+        BOOKS: Book.objects.count(),
+        LOANS: Loan.objects.count() + LoanArchive.objects.count(),  # Archived loans count too
+        ACTIVE_LOANS: Loan.objects.filter(returned=False).count(),
+        COPIES_IN_STOCK: books["copies"] or 0,
+    }
+
+
+def rebuild(dry_run=False):
+    """
+    Recount every counter from the tables. Returns `{name: (stored, actual)}`.
+    Shard rows are locked first so concurrent increments queue behind the rebuild.
+    """
+    with transaction.atomic():
+        for name in COUNTERS:
+            for shard in range(SHARDS):
+                StatCounter.objects.get_or_create(name=name, shard=shard)
+        stored = dict.fromkeys(COUNTERS, 0)
+        for name, value in (
+            StatCounter.objects.select_for_update()
+            .filter(name__in=COUNTERS)
+            .values_list("name", "value")
+        ):
+            stored[name] += value
+        actual = count_from_tables()
+        if not dry_run:
+            StatCounter.objects.filter(name__in=COUNTERS).exclude(shard=0).update(value=0)
+            for name, value in actual.items():
+                StatCounter.objects.filter(name=name, shard=0).update(value=value)
+    return {name: (stored[name], actual[name]) for name in COUNTERS}
@@ -0,0 +1,205 @@
+# library/suggest.py
+# Type-ahead suggestions for book titles and authors.
+# Each worker keeps an in-process prefix index (a sorted array searched with bisect) built
+# lazily from `Book`, kept current by the Book save/delete signals and refreshed in the
+# background every LIBRARY_SUGGEST_INDEX_TTL seconds to pick up writes made by other workers.
+# With LIBRARY_SUGGEST_INDEX = False the database is queried instead (trigram-indexed on PostgreSQL).
+import bisect
+import threading
+import time
+import unicodedata
+from django.conf import settings
+from django.db import connections
+from django.db.models import Q
+from .models import Book
+
+MAX_KEY_LENGTH = 32  # Longer queries are matched on the first 32 characters, then re-checked
+SCAN_FACTOR = 20  # Candidates scanned per requested suggestion before ranking
+
+
+def normalize(text):
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return " ".join(text.lower().split())
+
+
+def word_starts(text):
+    """Yield every suffix of `text` that begins at a word, e.g. "the hobbit", "hobbit"."""
+    start = 0
+    while start < len(text):
+        yield start, text[start:]
+        space = text.find(" ", start)
+        if space == -1:
+            return
+        start = space + 1
+
+
+class PrefixIndex:
+    """
+    Sorted array of keys (normalized word-start suffixes of titles and authors, truncated to
+    MAX_KEY_LENGTH) with a parallel array of `(type, value, book_id, at_start)` entries.
+    A lookup is one bisect plus a short forward scan.
+    """
+
+    def __init__(self):
+        self._keys = []
+        self._entries = []
+        self._book_keys = {}  # book_id -> keys, so a book can be removed again
+        self._lock = threading.Lock()
+        self.built_at = None
+
+    def __len__(self):
+        return len(self._keys)
+
+    @staticmethod
+    def _rows(book_id, name, author):
+        for kind, value in (("title", name), ("author", author)):
+            for position, suffix in word_starts(normalize(value)):
+                yield suffix[:MAX_KEY_LENGTH], (kind, value, book_id, position == 0)
+
+    def build(self, books):
+        """Replace the whole index from an iterable of `(id, name, author)`."""
+        rows, book_keys = [], {}
+        for book_id, name, author in books:
+            book_rows = list(self._rows(book_id, name, author))
+            book_keys[book_id] = [key for key, _ in book_rows]
+            rows.extend(book_rows)
+        rows.sort(key=lambda row: row[0])
+        keys = [key for key, _ in rows]
+        entries = [entry for _, entry in rows]
+        with self._lock:
+            self._keys, self._entries, self._book_keys = keys, entries, book_keys
+            self.built_at = time.monotonic()
+
+    def add(self, book_id, name, author):
+        with self._lock:
+            self._remove(book_id)
+            rows = list(self._rows(book_id, name, author))
+            for key, entry in rows:
+                index = bisect.bisect_right(self._keys, key)
+                self._keys.insert(index, key)
+                self._entries.insert(index, entry)
+            self._book_keys[book_id] = [key for key, _ in rows]
+
+    def remove(self, book_id):
+        with self._lock:
+            self._remove(book_id)
+
+    def _remove(self, book_id):
+        for key in self._book_keys.pop(book_id, ()):
+            index = bisect.bisect_left(self._keys, key)
+            while index < len(self._keys) and self._keys[index] == key:
+                if self._entries[index][2] == book_id:
+                    del self._keys[index]
+                    del self._entries[index]
+                    break
+                index += 1
+
+    def lookup(self, query, limit=10):
+        query = normalize(query)
+        if not query:
+            return []
+        prefix = query[:MAX_KEY_LENGTH]
+        candidates = []
+        with self._lock:
+            keys, entries = self._keys, self._entries
+            index = bisect.bisect_left(keys, prefix)
+            while index < len(keys) and len(candidates) < limit * SCAN_FACTOR:
+                if not keys[index].startswith(prefix):
+                    break
+                entry = entries[index]
+                if len(query) <= MAX_KEY_LENGTH or query in normalize(entry[1]):
+                    candidates.append(entry)
+                index += 1
+        return rank(candidates, limit)
+
+
+def rank(candidates, limit):
+    # Whole-value prefix matches first, then shorter values, one suggestion per value
+    candidates.sort(key=lambda entry: (not entry[3], len(entry[1]), entry[1]))
+    results, seen = [], set()
+    for kind, value, book_id, _ in candidates:
+        if (kind, value) in seen:
+            continue
+        seen.add((kind, value))
+        result = {"type": kind, "value": value}
+        if kind == "title":
+            result["book_id"] = book_id
+        results.append(result)
+        if len(results) == limit:
+            break
+    return results
+
+
+_index = PrefixIndex()
+_refreshing = threading.Lock()
+
+
+def index_enabled():
+    return getattr(settings, "LIBRARY_SUGGEST_INDEX", True)
+
+
+def invalidate_index():
+    """Force a rebuild on next use, e.g. after bulk writes that bypass model signals."""
+    _index.built_at = None
+
+
+def build_index():
+    _index.build(Book.objects.values_list("id", "name", "author").iterator(chunk_size=5000))
+    return _index
+
+
+def get_index():
+    """Return the worker's index, building it on first use and refreshing it when stale."""
+    if _index.built_at is None:
+        with _refreshing:
+            if _index.built_at is None:
+                build_index()
+    elif time.monotonic() - _index.built_at > getattr(settings, "LIBRARY_SUGGEST_INDEX_TTL", 300):
+        if _refreshing.acquire(blocking=False):
+            # Keep serving the current index while a fresh one is built
+            threading.Thread(target=_background_refresh, daemon=True).start()
+    return _index
+
+
+def _background_refresh():
+    try:
+        build_index()
+    finally:
+        connections.close_all()
+        _refreshing.release()
+
+
+def book_saved(book):
+    if _index.built_at is not None:
+        _index.add(book.id, book.name, book.author)
+
+
+def book_deleted(book_id):
+    if _index.built_at is not None:
+        _index.remove(book_id)
+
+
+def suggest_from_database(query, limit=10):
+    """
+    Fallback without the in-process index. On PostgreSQL the case-insensitive LIKEs are
+    served by the pg_trgm GIN indexes created in migration 0003_book_trigram.
+    """
+    query = " ".join(query.split())
+    if not query:
+        return []
+    candidates = []
+    for kind, field in (("title", "name"), ("author", "author")):
+        condition = Q(**{f"{field}__istartswith": query}) | Q(**{f"{field}__icontains": f" {query}"})
+        for book_id, value in (
+            Book.objects.filter(condition).values_list("id", field)[: limit * SCAN_FACTOR]
+        ):
+            at_start = normalize(value).startswith(normalize(query))
+            candidates.append((kind, value, book_id, at_start))
+    return rank(candidates, limit)
+
+
+def suggest(query, limit=10):
+    if index_enabled():
+        return get_index().lookup(query, limit)
+    return suggest_from_database(query, limit)
@@ -0,0 +1,128 @@
+# library/summaries.py
+# Maintained per-user loan summaries (`LoanSummary`): active loan count and earliest due date.
+# Borrow admission is a single conditional UPDATE on the summary's primary key, like
+# `inventory.take_copy`, so the overdue block and the LIBRARY_MAX_ACTIVE_LOANS limit hold
+# under concurrency without scanning the user's loans. Returns and any other loan change
+# recompute the row from the (user, returned, return_date) index.
+# `manage.py rebuild_loan_summaries [--check]` repairs or reports drift.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce
+from django.utils.timezone import now
+from .models import Loan, LoanSummary
+
+
+def max_active_loans():
+    """The per-user limit, or None when unlimited (LIBRARY_MAX_ACTIVE_LOANS = 0)."""
+    return getattr(settings, "LIBRARY_MAX_ACTIVE_LOANS", 20) or None
+
+
+def _active_loans(user_ref):
+    return Loan.objects.filter(user_id=user_ref, returned=False)
+
+
+def _earliest_due_subquery():
+    return Subquery(
+        _active_loans(OuterRef("pk"))
+        .exclude(return_date=None)
+        .order_by("return_date")
+        .values("return_date")[:1]
+    )
+
+
+def _active_count_subquery():
+    return Coalesce(
+        Subquery(
+            _active_loans(OuterRef("pk"))
+            .order_by()
+            .values("user_id")
+            .annotate(total=Count("pk"))
+            .values("total")[:1],
+            output_field=IntegerField(),
+        ),
+        Value(0),
+    )
+
+
+def admit(user_id, count, due, check_overdue=True, check_limit=True):
+    """
+    Record `count` new loans due on `due` for a user, refusing with `(False, summary)`
+    when the user has an overdue loan or would exceed the active-loan limit.
+    Returns `(True, None)` once the summary row has been updated.
+    """
+    limit = max_active_loans() if check_limit else None
+    condition = Q(pk=user_id)
+    if check_overdue:
+        condition &= Q(earliest_due__isnull=True) | Q(earliest_due__gte=now().date())
+    if limit is not None:
+        condition &= Q(active_loans__lte=limit - count)
+    changes = {
+        "active_loans": F("active_loans") + count,
+        "earliest_due": Case(
+            When(Q(earliest_due__isnull=True) | Q(earliest_due__gt=due), then=Value(due)),
+            default=F("earliest_due"),
+        ),
+    }
+    if LoanSummary.objects.filter(condition).update(**changes):
+        return True, None
+
+    summary = LoanSummary.objects.filter(pk=user_id).first()
+    if summary is None:
+        # Users created by bulk paths that skip the User signal get their row on first borrow
+        recompute([user_id])
+        if LoanSummary.objects.filter(condition).update(**changes):
+            return True, None
+        summary = LoanSummary.objects.get(pk=user_id)
+    return False, summary
+
+
+def recompute(user_ids):
+    """Recount the given users' summaries from their loans, creating missing rows."""
+    user_ids = list(user_ids)
+    updated = LoanSummary.objects.filter(pk__in=user_ids).update(
+        active_loans=_active_count_subquery(), earliest_due=_earliest_due_subquery()
+    )
+    if updated < len(set(user_ids)):
+        existing = set(LoanSummary.objects.filter(pk__in=user_ids).values_list("pk", flat=True))
+        missing = {user_id for user_id in user_ids if user_id not in existing}
+        LoanSummary.objects.bulk_create(
+            (LoanSummary(user_id=user_id) for user_id in missing), ignore_conflicts=True
+        )
+        LoanSummary.objects.filter(pk__in=missing).update(
+            active_loans=_active_count_subquery(), earliest_due=_earliest_due_subquery()
+        )
+
+
+def lock(user_id):
+    """Read a user's summary with a row lock, creating it first if it is missing."""
+    summary = LoanSummary.objects.select_for_update().filter(pk=user_id).first()
+    if summary is None:
+        recompute([user_id])
+        summary = LoanSummary.objects.select_for_update().get(pk=user_id)
+    return summary
+
+
+def stored_and_actual():
+    """Yield `(user_id, stored, actual)` for every user, as `(active_loans, earliest_due)` pairs."""
+    stored = {
+        pk: (active, due)
+        for pk, active, due in LoanSummary.objects.values_list("pk", "active_loans", "earliest_due")
+    }
+    actual = User.objects.annotate(
+        active=_active_count_subquery(), due=_earliest_due_subquery()
+    ).values_list("pk", "active", "due")
+    for user_id, active, due in actual.iterator(chunk_size=2000):
+        yield user_id, stored.get(user_id), (active, due)
+
+
+def rebuild(dry_run=False):
+    """Recompute every summary. Returns `[(user_id, stored, actual)]` for rows that drifted."""
+    with transaction.atomic():
+        drifted = [row for row in stored_and_actual() if row[1] != row[2]]
+        if not dry_run and drifted:
+            batch = [user_id for user_id, _, _ in drifted]
+            for start in range(0, len(batch), 500):
+                recompute(batch[start:start + 500])
+    return drifted
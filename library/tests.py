@@ -1,12 +1,38 @@
 # library/tests.py
 # To run test paste in terminal: python manage.py test
-from django.test import TestCase
+from django.db import connection, transaction
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from io import StringIO
+import asyncio
+import base64
+from asgiref.sync import sync_to_async
+import csv
+import json
+import os
+import sqlite3
+import tempfile
+import threading
 from django.contrib.auth.models import User
-from .models import Book, Loan
+from . import (
+    archive, authentication, fastread, feed, importing, inventory, metrics, overdue, pool,
+    renderers, routing, seeding, stats, suggest, summaries, timing,
+)
+from .models import Book, Hold, Loan, LoanArchive, LoanSummary, OverdueEvent
+from .serializers import BookSerializer, HoldSerializer, LoanSerializer
 from django.utils.timezone import now
-from datetime import timedelta
+from django.utils.translation import gettext_lazy
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
 from rest_framework.test import APIClient
 from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework_simplejwt.tokens import RefreshToken
+from unittest import mock, skipUnless
+from urllib.parse import parse_qs, urlparse
+from prometheus_client import REGISTRY
 
 
 class LibraryTestCase(TestCase):
@@ -64,6 +90,18 @@ class LibraryTestCase(TestCase):
         self.assertEqual(response.status_code, 201)
         self.assertTrue(Book.objects.filter(name="Another Book").exists())
 
+    def test_create_book_rejects_duplicate_name_and_author(self):
+        data = {
+            "name": self.book.name,
+            "author": self.book.author,
+            "year_published": 2022,
+            "category": "Fantasy",
+        }
+        response = self.client.post("/api/library/books/", data)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("non_field_errors", response.data)
+        self.assertEqual(Book.objects.filter(name=self.book.name).count(), 1)
+
     def test_delete_book(self):
         response = self.client.delete(f"/api/library/delete_book/{self.book.id}/")
         self.assertEqual(response.status_code, 200)
@@ -83,6 +121,14 @@ class LibraryTestCase(TestCase):
         self.book.refresh_from_db()
         self.assertEqual(self.book.inventory, 4)
 
+    def test_create_loan_rejects_invalid_loan_type(self):
+        for loan_type in ("", "soon", 7):
+            data = {"user_id": self.user.id, "book_id": self.book.id, "loan_type": loan_type}
+            response = self.client.post("/api/library/create_loan/", data)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn("loan_type must be one of", response.data["error"])
+        self.assertFalse(Loan.objects.filter(user=self.user).exists())
+
     def test_return_loan(self):
         loan = Loan.objects.create(
             user=self.user, book=self.book, type=1, returned=False
@@ -99,3 +145,2083 @@ class LibraryTestCase(TestCase):
     def test_loan_return_date_auto_set(self):
         loan = Loan.objects.create(user=self.user, book=self.book, type=2)  # 5-day loan
         self.assertEqual(loan.return_date, now().date() + timedelta(days=5))
+
+
+class KeysetPaginationTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        # Many books share the same year so the id tiebreaker is exercised
+        for i in range(25):
+            Book.objects.create(
+                name=f"Book {i:02d}",
+                author=f"Author {i % 3}",
+                year_published=2000 + i % 4,
+                category="Mystery",
+                inventory=1,
+            )
+
+    def collect_pages(self, url):
+        ids, pages = [], 0
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids.extend(book["id"] for book in response.data["results"])
+            url = response.data["next"]
+            pages += 1
+        return ids, pages
+
+    def test_pages_cover_every_book_once(self):
+        ids, pages = self.collect_pages("/api/library/books/?page_size=10")
+        self.assertEqual(pages, 3)
+        self.assertEqual(ids, sorted(Book.objects.values_list("id", flat=True)))
+
+    def test_pages_follow_ordering_with_ties(self):
+        ids, _ = self.collect_pages(
+            "/api/library/books/?ordering=-year_published,author&page_size=4"
+        )
+        expected = list(
+            Book.objects.order_by("-year_published", "author", "id").values_list(
+                "id", flat=True
+            )
+        )
+        self.assertEqual(ids, expected)
+
+    def test_previous_link_returns_previous_page(self):
+        first = self.client.get("/api/library/books/?ordering=name&page_size=5")
+        self.assertIsNone(first.data["previous"])
+        second = self.client.get(first.data["next"])
+        back = self.client.get(second.data["previous"])
+        self.assertEqual(back.data["results"], first.data["results"])
+
+    def test_page_query_has_no_count_or_offset(self):
+        first = self.client.get("/api/library/books/?page_size=5")
+        with self.assertNumQueries(1) as ctx:
+            self.client.get(first.data["next"])
+        sql = ctx.captured_queries[0]["sql"].upper()
+        self.assertNotIn("COUNT(", sql)
+        self.assertNotIn("OFFSET", sql)
+
+    def test_invalid_cursor(self):
+        response = self.client.get("/api/library/books/?cursor=not-a-cursor")
+        self.assertEqual(response.status_code, 404)
+
+    def test_tampered_cursor_values(self):
+        for values in (["abc"], [None], [["1"]], [{"id": 1}]):
+            payload = json.dumps({"o": ["id"], "v": values}).encode()
+            cursor = base64.urlsafe_b64encode(payload).decode()
+            response = self.client.get(f"/api/library/books/?cursor={cursor}")
+            self.assertEqual(response.status_code, 404, values)
+
+    def test_cursor_rejected_for_other_ordering(self):
+        first = self.client.get("/api/library/books/?ordering=name&page_size=5")
+        cursor = parse_qs(urlparse(first.data["next"]).query)["cursor"][0]
+        response = self.client.get(f"/api/library/books/?ordering=author&cursor={cursor}")
+        self.assertEqual(response.status_code, 404)
+
+
+class LoanListingTestCase(TestCase):
+    def setUp(self):
+        self.admin_user = User.objects.create_superuser(
+            username="admin", email="admin@example.com", password="adminpass"
+        )
+        self.user = User.objects.create_user(
+            username="reader", email="reader@example.com", password="password123"
+        )
+        self.other_user = User.objects.create_user(
+            username="other", email="other@example.com", password="password123"
+        )
+        self.client = APIClient()
+
+        today = now().date()
+        for i in range(10):
+            book = Book.objects.create(
+                name=f"Loan Book {i}",
+                author="Author",
+                year_published=2001,
+                category="Action",
+                inventory=3,
+            )
+            Loan.objects.create(
+                user=self.user,
+                book=book,
+                type=1,
+                return_date=today + timedelta(days=i - 3),
+                returned=i % 2 == 0,
+            )
+            Loan.objects.create(user=self.other_user, book=book, type=2)
+
+    def test_list_is_one_query(self):
+        self.client.force_authenticate(user=self.admin_user)
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/library/loans/")
+        self.assertEqual(len(response.data["results"]), 20)
+        self.assertEqual(response.data["results"][0]["user_name"], "reader")
+        self.assertEqual(response.data["results"][0]["book_name"], "Loan Book 0")
+
+    def test_list_query_count_does_not_grow_with_rows(self):
+        self.client.force_authenticate(user=self.user)
+        with self.assertNumQueries(1):
+            self.client.get("/api/library/loans/?page_size=2")
+        with self.assertNumQueries(1):
+            self.client.get("/api/library/loans/?page_size=10")
+
+    def test_detail_is_one_query(self):
+        loan = Loan.objects.filter(user=self.user).first()
+        self.client.force_authenticate(user=self.user)
+        with self.assertNumQueries(1):
+            response = self.client.get(f"/api/library/loans/{loan.id}/")
+        self.assertEqual(response.data["book_image_url"], loan.book.image_url)
+
+    def test_regular_user_only_sees_own_loans(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get("/api/library/loans/")
+        self.assertEqual(len(response.data["results"]), 10)
+        self.assertEqual({loan["user"] for loan in response.data["results"]}, {self.user.id})
+
+        foreign = Loan.objects.filter(user=self.other_user).first()
+        response = self.client.get(f"/api/library/loans/{foreign.id}/")
+        self.assertEqual(response.status_code, 404)
+
+    def test_regular_user_cannot_filter_other_users(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(f"/api/library/loans/?user={self.other_user.id}")
+        self.assertEqual({loan["user"] for loan in response.data["results"]}, {self.user.id})
+
+    def test_admin_filters_by_user(self):
+        self.client.force_authenticate(user=self.admin_user)
+        response = self.client.get(f"/api/library/loans/?user={self.other_user.id}")
+        self.assertEqual(len(response.data["results"]), 10)
+
+    def test_filter_returned_and_due_window(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get("/api/library/loans/?returned=false")
+        self.assertEqual(len(response.data["results"]), 5)
+        self.assertFalse(any(loan["returned"] for loan in response.data["results"]))
+
+        today = now().date()
+        response = self.client.get(
+            f"/api/library/loans/?due_after={today - timedelta(days=1)}&due_before={today + timedelta(days=1)}"
+        )
+        self.assertEqual(len(response.data["results"]), 3)
+
+    def test_invalid_filter_value(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get("/api/library/loans/?due_before=yesterday")
+        self.assertEqual(response.status_code, 400)
+
+    def test_pages_by_nullable_due_date(self):
+        undated = Loan.objects.filter(user=self.user).order_by("id")[:4]
+        Loan.objects.filter(pk__in=[loan.pk for loan in undated]).update(return_date=None)
+        self.client.force_authenticate(user=self.user)
+        for ordering in ("return_date", "-return_date"):
+            pages, url = [], f"/api/library/loans/?ordering={ordering}&page_size=3"
+            while url:
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                pages.append(response.data)
+                url = response.data["next"]
+            ids = [loan["id"] for page in pages for loan in page["results"]]
+            dated = Loan.objects.filter(user=self.user, return_date__isnull=False)
+            expected = list(dated.order_by(ordering, "id").values_list("id", flat=True))
+            expected += sorted(loan.pk for loan in undated)  # NULLs last either way
+            self.assertEqual(ids, expected)
+
+            back = self.client.get(pages[-1]["previous"])
+            self.assertEqual(back.data["results"], pages[-2]["results"])
+
+
+class InventoryServiceTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="reader", email="reader@example.com", password="password123"
+        )
+        self.book = Book.objects.create(
+            name="Last Copy",
+            author="Author",
+            year_published=1999,
+            category="Mystery",
+            inventory=1,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_last_copy_cannot_be_taken_twice(self):
+        inventory.borrow(self.user, self.book.id)
+        with self.assertRaises(inventory.OutOfStock):
+            inventory.borrow(self.user, self.book.id)
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.inventory, 0)
+        self.assertEqual(Loan.objects.count(), 1)
+
+    def test_borrow_missing_book(self):
+        with self.assertRaises(Book.DoesNotExist):
+            inventory.borrow(self.user, 999999)
+
+    def test_overdue_block_rolls_back(self):
+        Loan.objects.create(
+            user=self.user,
+            book=self.book,
+            type=1,
+            return_date=now().date() - timedelta(days=1),
+        )
+        with self.assertRaises(inventory.OverdueLoans):
+            inventory.borrow(self.user, self.book.id, check_overdue=True)
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.inventory, 1)
+
+    def test_loan_is_closed_once(self):
+        loan = inventory.borrow(self.user, self.book.id)
+        stale = Loan.objects.get(pk=loan.pk)
+        inventory.close_loan(loan)
+        with self.assertRaises(inventory.AlreadyReturned):
+            inventory.close_loan(stale)
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.inventory, 1)
+
+    def test_borrow_endpoint_out_of_stock(self):
+        response = self.client.post(f"/api/library/borrow_book/{self.book.id}/")
+        self.assertEqual(response.status_code, 201)
+        response = self.client.post(f"/api/library/borrow_book/{self.book.id}/")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["error"], "This book is out of stock.")
+
+    def test_return_endpoint_puts_copy_back(self):
+        loan = inventory.borrow(self.user, self.book.id)
+        response = self.client.post(f"/api/library/return_book/{loan.id}/")
+        self.assertEqual(response.status_code, 200)
+        response = self.client.post(f"/api/library/return_book/{loan.id}/")
+        self.assertEqual(response.status_code, 400)
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.inventory, 1)
+
+    def test_serializer_create_and_return(self):
+        data = {"user": self.user.id, "book": self.book.id, "type": 2}
+        response = self.client.post("/api/library/loans/", data)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["return_date"], str(now().date() + timedelta(days=5)))
+        response = self.client.post("/api/library/loans/", data)
+        self.assertEqual(response.status_code, 400)
+
+        loan_id = Loan.objects.get().id
+        for _ in range(2):
+            response = self.client.patch(
+                f"/api/library/loans/{loan_id}/", {"returned": True}, format="json"
+            )
+            self.assertEqual(response.status_code, 200)
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.inventory, 1)
+
+
+class CatalogSearchTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.potter = Book.objects.create(
+            name="Harry Potter and the Sorcerer's Stone",
+            author="J.K. Rowling",
+            year_published=1997,
+            category="Fantasy",
+        )
+        self.guide = Book.objects.create(
+            name="A Guide to Wizards",
+            author="Harry Smith",
+            year_published=1997,
+            category="Non-Fiction",
+        )
+        self.dune = Book.objects.create(
+            name="Dune", author="Frank Herbert", year_published=1965, category="Sci-Fi"
+        )
+
+    def search(self, query, **params):
+        response = self.client.get("/api/library/books/", {"search": query, **params})
+        self.assertEqual(response.status_code, 200)
+        return [book["id"] for book in response.data["results"]]
+
+    def test_title_match_ranks_above_author_match(self):
+        self.assertEqual(self.search("harry"), [self.potter.id, self.guide.id])
+
+    def test_prefix_and_multiple_terms(self):
+        self.assertEqual(self.search("harr pott"), [self.potter.id])
+        self.assertEqual(self.search("herb"), [self.dune.id])
+
+    def test_year_uses_integer_column(self):
+        self.assertEqual(sorted(self.search("1997")), [self.potter.id, self.guide.id])
+        self.assertEqual(self.search("dune 1965"), [self.dune.id])
+        self.assertEqual(self.search("dune 1997"), [])
+        self.assertEqual(sorted(self.search("harry 1997")), [self.potter.id, self.guide.id])
+
+    def test_numbers_in_titles_still_match(self):
+        catch = Book.objects.create(
+            name="Catch-22", author="Joseph Heller", year_published=1961, category="Fiction"
+        )
+        fahrenheit = Book.objects.create(
+            name="Fahrenheit 451", author="Ray Bradbury", year_published=1953, category="Sci-Fi"
+        )
+        orwell = Book.objects.create(
+            name="1984", author="George Orwell", year_published=1949, category="Fiction"
+        )
+        self.assertEqual(self.search("Catch 22"), [catch.id])
+        self.assertEqual(self.search("Fahrenheit 451"), [fahrenheit.id])
+        self.assertEqual(self.search("1984"), [orwell.id])
+        self.assertEqual(self.search("451"), [fahrenheit.id])
+
+    def test_category_is_searchable(self):
+        self.assertEqual(self.search("fantasy"), [self.potter.id])
+
+    def test_index_follows_updates_and_deletes(self):
+        self.dune.name = "Children of Dune"
+        self.dune.save()
+        self.assertEqual(self.search("children"), [self.dune.id])
+        self.dune.delete()
+        self.assertEqual(self.search("dune"), [])
+
+    def test_explicit_ordering_overrides_rank(self):
+        self.assertEqual(
+            self.search("harry", ordering="-id"), [self.guide.id, self.potter.id]
+        )
+
+    def test_ranked_results_paginate(self):
+        response = self.client.get("/api/library/books/", {"search": "harry", "page_size": 1})
+        self.assertEqual(response.data["results"][0]["id"], self.potter.id)
+        response = self.client.get(response.data["next"])
+        self.assertEqual([book["id"] for book in response.data["results"]], [self.guide.id])
+        self.assertIsNone(response.data["next"])
+
+
+class SuggestTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.hobbit = Book.objects.create(
+            name="The Hobbit", author="J.R.R. Tolkien", year_published=1937, category="Fantasy"
+        )
+        self.holmes = Book.objects.create(
+            name="Sherlock Holmes", author="Arthur Conan Doyle", year_published=1892, category="Mystery"
+        )
+        self.house = Book.objects.create(
+            name="Hobbies for Everyone", author="Ana Hobbs", year_published=2001, category="Non-Fiction"
+        )
+        suggest.invalidate_index()
+
+    def suggestions(self, query, **params):
+        response = self.client.get("/api/library/books/suggest/", {"q": query, **params})
+        self.assertEqual(response.status_code, 200)
+        return [(item["type"], item["value"]) for item in response.data["results"]]
+
+    def test_prefix_matches_titles_and_authors(self):
+        self.assertEqual(
+            self.suggestions("hobb"),
+            [("title", "Hobbies for Everyone"), ("author", "Ana Hobbs"), ("title", "The Hobbit")],
+        )
+
+    def test_matches_start_of_any_word(self):
+        self.assertEqual(self.suggestions("tolk"), [("author", "J.R.R. Tolkien")])
+        self.assertEqual(self.suggestions("conan d"), [("author", "Arthur Conan Doyle")])
+
+    def test_limit_and_empty_query(self):
+        self.assertEqual(len(self.suggestions("h", limit=2)), 2)
+        self.assertEqual(self.suggestions(""), [])
+
+    def test_index_follows_saves_and_deletes(self):
+        self.suggestions("x")  # Build the index
+        with self.captureOnCommitCallbacks(execute=True):
+            self.hobbit.name = "There and Back Again"
+            self.hobbit.save()
+            self.holmes.delete()
+        self.assertEqual(self.suggestions("there"), [("title", "There and Back Again")])
+        self.assertEqual(self.suggestions("sherlock"), [])
+
+    def test_title_results_carry_book_id(self):
+        response = self.client.get("/api/library/books/suggest/", {"q": "sherl"})
+        self.assertEqual(response.data["results"][0]["book_id"], self.holmes.id)
+
+    def test_database_fallback_matches_index(self):
+        with self.settings(LIBRARY_SUGGEST_INDEX=False):
+            self.assertEqual(
+                self.suggestions("hobb"),
+                [("title", "Hobbies for Everyone"), ("author", "Ana Hobbs"), ("title", "The Hobbit")],
+            )
+
+
+class QueryPlanTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="reader", email="reader@example.com", password="password123"
+        )
+        book = Book.objects.create(
+            name="Dune", author="Frank Herbert", year_published=1965, category="Sci-Fi"
+        )
+        Loan.objects.create(user=self.user, book=book, type=1)
+        if connection.vendor == "postgresql":
+            # Tiny test tables would otherwise always be sequentially scanned
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(index_name, plan)
+
+    def test_overdue_check_uses_composite_index(self):
+        queryset = Loan.objects.filter(
+            user_id=self.user.id, returned=False, return_date__lt=now().date()
+        )
+        self.assertUsesIndex(queryset.values("id")[:1], "loan_user_returned_due_idx")
+
+    def test_active_overdue_scan_uses_partial_index(self):
+        queryset = Loan.objects.filter(returned=False, return_date__lt=now().date())
+        self.assertUsesIndex(queryset, "loan_active_due_idx")
+
+    def test_catalog_filters_use_book_indexes(self):
+        self.assertUsesIndex(
+            Book.objects.filter(category="Sci-Fi", year_published=1965), "book_category_year_idx"
+        )
+        self.assertUsesIndex(Book.objects.filter(category="Sci-Fi"), "book_category_year_idx")
+        # The (name, author) unique index; SQLite names the index of an inline constraint itself
+        unique_index = (
+            "sqlite_autoindex_library_book" if connection.vendor == "sqlite" else "book_name_author_uniq"
+        )
+        self.assertUsesIndex(Book.objects.filter(name="Dune"), unique_index)
+
+
+class DashboardCountersTestCase(TestCase):
+    def setUp(self):
+        self.admin_user = User.objects.create_superuser(
+            username="admin", email="admin@example.com", password="adminpass"
+        )
+        self.user = User.objects.create_user(
+            username="reader", email="reader@example.com", password="password123"
+        )
+        self.book = Book.objects.create(
+            name="Counted", author="Author", year_published=2010, category="Action", inventory=3
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin_user)
+
+    def dashboard(self):
+        response = self.client.get("/api/library/admin-dashboard/")
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_counters_follow_borrow_and_return(self):
+        loan = inventory.borrow(self.user, self.book.id)
+        inventory.borrow(self.user, self.book.id)
+        data = self.dashboard()
+        self.assertEqual(data["loans"], 2)
+        self.assertEqual(data["active_loans"], 2)
+        self.assertEqual(data["copies_in_stock"], 1)
+
+        inventory.close_loan(loan)
+        data = self.dashboard()
+        self.assertEqual(data["active_loans"], 1)
+        self.assertEqual(data["copies_in_stock"], 2)
+
+    def test_counters_follow_book_and_user_writes(self):
+        self.book.inventory = 10
+        self.book.save()
+        Book.objects.create(
+            name="Other", author="Author", year_published=2011, category="Action", inventory=2
+        )
+        User.objects.create_user(username="third", password="password123")
+        data = self.dashboard()
+        self.assertEqual((data["users"], data["books"], data["copies_in_stock"]), (3, 2, 12))
+
+        self.book.delete()
+        data = self.dashboard()
+        self.assertEqual((data["books"], data["copies_in_stock"]), (1, 2))
+
+    def test_overdue_loans(self):
+        Loan.objects.create(
+            user=self.user, book=self.book, type=1, return_date=now().date() - timedelta(days=2)
+        )
+        Loan.objects.create(user=self.user, book=self.book, type=1)
+        self.assertEqual(self.dashboard()["overdue_loans"], 1)
+
+    def test_dashboard_does_not_count_tables(self):
+        with self.assertNumQueries(2) as ctx:
+            self.dashboard()
+        for query in ctx.captured_queries:
+            self.assertNotIn("library_book", query["sql"])
+            self.assertNotIn("auth_user", query["sql"])
+
+    def test_matches_table_counts(self):
+        inventory.borrow(self.user, self.book.id)
+        self.assertEqual(stats.read_counters(), stats.count_from_tables())
+
+    def test_rebuild_command_repairs_drift(self):
+        stats.increment(stats.BOOKS, 5)
+        out = StringIO()
+        call_command("rebuild_stats", "--check", stdout=out)
+        self.assertIn("books: 6 -> 1", out.getvalue())
+        self.assertEqual(self.dashboard()["books"], 6)
+
+        call_command("rebuild_stats", stdout=StringIO())
+        self.assertEqual(self.dashboard()["books"], 1)
+
+
+@override_settings(LIBRARY_CATALOG_CACHE=True)
+class CatalogCacheTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="reader", password="password123")
+        self.book = Book.objects.create(
+            name="Cached", author="Author", year_published=2010, category="Action", inventory=2
+        )
+        self.client = APIClient()
+
+    def test_list_is_served_from_cache_and_revalidated(self):
+        first = self.client.get("/api/library/books/")
+        self.assertEqual(first.status_code, 200)
+        etag = first["ETag"]
+        self.assertIn("no-cache", first["Cache-Control"])
+        self.assertTrue(first.has_header("Last-Modified"))
+
+        with self.assertNumQueries(0):
+            cached = self.client.get("/api/library/books/")
+        self.assertEqual(cached.content, first.content)
+        self.assertEqual(cached["ETag"], etag)
+
+        with self.assertNumQueries(0):
+            not_modified = self.client.get(
+                "/api/library/books/", HTTP_IF_NONE_MATCH=etag, HTTP_AUTHORIZATION="Bearer x"
+            )
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified["ETag"], etag)
+
+    def test_etag_differs_per_url(self):
+        listing = self.client.get("/api/library/books/")
+        detail = self.client.get(f"/api/library/books/{self.book.id}/")
+        self.assertEqual(detail.status_code, 200)
+        self.assertNotEqual(listing["ETag"], detail["ETag"])
+
+    def test_book_write_invalidates(self):
+        etag = self.client.get("/api/library/books/")["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            Book.objects.filter(pk=self.book.pk).get().save()
+        response = self.client.get("/api/library/books/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_borrow_and_return_invalidate(self):
+        url = f"/api/library/books/{self.book.id}/"
+        etag = self.client.get(url)["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            loan = inventory.borrow(self.user, self.book.id)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["inventory"], 1)
+
+        etag = response["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            inventory.close_loan(loan)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.data["inventory"], 2)
+
+    def test_writes_still_require_admin(self):
+        response = self.client.post("/api/library/books/", {"name": "New"})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class BatchLoanTestCase(TestCase):
+    def setUp(self):
+        self.admin_user = User.objects.create_superuser(
+            username="admin", email="admin@example.com", password="adminpass"
+        )
+        self.user = User.objects.create_user(username="patron", password="password123")
+        self.books = [
+            Book.objects.create(
+                name=f"Desk {i}", author="Author", year_published=2000, category="Action", inventory=2
+            )
+            for i in range(3)
+        ]
+        self.empty = Book.objects.create(
+            name="Gone", author="Author", year_published=2000, category="Action", inventory=0
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_borrow_books_in_one_batch(self):
+        ids = [book.id for book in self.books] + [self.books[0].id]
+        response = self.client.post("/api/library/borrow_books/", {"book_ids": ids}, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([r["book_id"] for r in response.data["results"]], ids)
+        self.assertTrue(all(r["loan_id"] for r in response.data["results"]))
+        self.assertEqual(
+            list(Book.objects.filter(pk__in=ids).order_by("pk").values_list("inventory", flat=True)),
+            [0, 1, 1],
+        )
+        self.assertEqual(Loan.objects.filter(user=self.user, returned=False).count(), 4)
+        self.assertEqual(stats.read_counters(), stats.count_from_tables())
+
+    def test_atomic_batch_applies_nothing_on_failure(self):
+        ids = [self.books[0].id, self.empty.id, 9999]
+        response = self.client.post("/api/library/borrow_books/", {"book_ids": ids}, format="json")
+        self.assertEqual(response.status_code, 400)
+        errors = [r.get("error") for r in response.data["results"]]
+        self.assertEqual(errors, [None, "This book is out of stock.", "Book not found."])
+        self.assertFalse(Loan.objects.exists())
+        self.assertEqual(Book.objects.get(pk=self.books[0].id).inventory, 2)
+
+    def test_partial_batch_applies_what_it_can(self):
+        ids = [self.books[0].id, self.empty.id]
+        response = self.client.post(
+            "/api/library/borrow_books/", {"book_ids": ids, "atomic": False}, format="json"
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertIn("loan_id", response.data["results"][0])
+        self.assertIn("error", response.data["results"][1])
+        self.assertEqual(Loan.objects.count(), 1)
+
+    def test_overdue_check_blocks_whole_batch(self):
+        Loan.objects.create(
+            user=self.user, book=self.books[2], type=1, return_date=now().date() - timedelta(days=1)
+        )
+        response = self.client.post(
+            "/api/library/borrow_books/", {"book_ids": [self.books[0].id]}, format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Loan.objects.count(), 1)
+
+    def test_return_books(self):
+        loans = inventory.borrow_many(self.user, [self.books[0].id, self.books[0].id, self.books[1].id])
+        other = inventory.borrow(self.admin_user, self.books[2].id)
+        ids = [r["loan_id"] for r in loans] + [other.id]
+
+        response = self.client.post("/api/library/return_books/", {"loan_ids": ids}, format="json")
+        self.assertEqual(response.status_code, 400)  # Someone else's loan fails the batch
+        self.assertEqual(response.data["results"][-1]["error"], "Loan not found.")
+
+        response = self.client.post(
+            "/api/library/return_books/", {"loan_ids": ids[:-1]}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Book.objects.get(pk=self.books[0].id).inventory, 2)
+        self.assertEqual(Loan.objects.filter(returned=False).count(), 1)
+        self.assertEqual(stats.read_counters(), stats.count_from_tables())
+
+        response = self.client.post(
+            "/api/library/return_books/", {"loan_ids": ids[:1], "atomic": False}, format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["results"][0]["error"], "This loan has already been returned.")
+
+    def test_admin_batch_endpoints(self):
+        self.client.force_authenticate(user=self.admin_user)
+        response = self.client.post(
+            "/api/library/create_loans/",
+            {"user_id": self.user.id, "book_ids": [self.books[0].id], "loan_type": 3},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201)
+        loan = Loan.objects.get(pk=response.data["results"][0]["loan_id"])
+        self.assertEqual((loan.user_id, loan.type), (self.user.id, 3))
+        self.assertEqual(loan.return_date, now().date() + timedelta(days=2))
+
+        response = self.client.post(
+            "/api/library/return_any_loans/", {"loan_ids": [loan.id]}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(Loan.objects.get(pk=loan.id).returned)
+
+    def test_rejects_bad_payload(self):
+        for payload in ({}, {"book_ids": []}, {"book_ids": ["x"]}, {"book_ids": list(range(51))}):
+            response = self.client.post("/api/library/borrow_books/", payload, format="json")
+            self.assertEqual(response.status_code, 400)
+        for loan_type in (None, [1], "x", 7, True):
+            response = self.client.post(
+                "/api/library/borrow_books/",
+                {"book_ids": [self.books[0].id], "loan_type": loan_type},
+                format="json",
+            )
+            self.assertEqual(response.status_code, 400, loan_type)
+            self.assertEqual(response.data["error"], "loan_type must be one of 1, 2, 3.")
+        self.assertFalse(Loan.objects.exists())
+
+    def test_batch_uses_constant_queries(self):
+        few = [self.books[0].id]
+        many = [self.books[1].id, self.books[2].id] * 2
+        with CaptureQueriesContext(connection) as small:
+            inventory.borrow_many(self.user, few)
+        with CaptureQueriesContext(connection) as large:
+            inventory.borrow_many(self.user, many)
+        self.assertEqual(len(small), len(large))
+
+
+class ImportBooksTestCase(TestCase):
+    def setUp(self):
+        self.existing = Book.objects.create(
+            name="Dune", author="Frank Herbert", year_published=1965, category="Sci-Fi", inventory=1
+        )
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def write(self, name, text):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, "w", encoding="utf-8") as handle:
+            handle.write(text)
+        return path
+
+    def test_csv_import_upserts_and_rejects(self):
+        path = self.write("books.csv", (
+            "name,author,year_published,category,inventory,image_url\n"
+            "Dune,Frank Herbert,1965,Sci-Fi,7,\n"
+            "Emma,Jane Austen,1815,Romance,2,\n"
+            "Bad Year,Someone,not-a-year,Romance,1,\n"
+            "Bad Category,Someone,2000,Poetry,1,\n"
+            "Emma,Jane Austen,1815,Romance,3,\n"
+        ))
+        rejects = os.path.join(self.tmp.name, "rejects.jsonl")
+        out = StringIO()
+        call_command("import_books", path, "--chunk-size", "2", "--rejects", rejects, stdout=out)
+
+        self.assertIn("Imported 3 books from 5 rows", out.getvalue())
+        self.assertIn("rows/s", out.getvalue())
+        self.assertEqual(Book.objects.count(), 2)
+        self.existing.refresh_from_db()
+        self.assertEqual(self.existing.inventory, 1)  # Stock of existing titles is left alone
+        self.assertEqual(self.existing.image_url, Book.DEFAULT_IMAGE_URL)
+        # Created by the first chunk: the repeat in a later chunk updates it like any existing title
+        self.assertEqual(Book.objects.get(name="Emma").inventory, 2)
+        with open(rejects, encoding="utf-8") as handle:
+            rejected = [json.loads(line) for line in handle]
+        self.assertEqual([row["line"] for row in rejected], [4, 5])
+        self.assertIn("year_published", rejected[0]["errors"])
+        self.assertIn("category", rejected[1]["errors"])
+
+    def test_jsonl_import_can_skip_existing(self):
+        path = self.write("books.jsonl", (
+            '{"name": "Dune", "author": "Frank Herbert", "year_published": 1965, "inventory": 9}\n'
+            '{"name": "Neuromancer", "author": "William Gibson", "year_published": 1984}\n'
+            "not json\n"
+        ))
+        out = StringIO()
+        call_command("import_books", path, "--skip-existing", stdout=out, stderr=StringIO())
+        self.assertIn("Imported 1 books from 3 rows", out.getvalue())
+        self.assertIn("1 skipped, 1 rejected", out.getvalue())
+        self.existing.refresh_from_db()
+        self.assertEqual(self.existing.inventory, 1)
+        self.assertEqual(Book.objects.get(name="Neuromancer").category, "Romance")
+
+        out = StringIO()  # A rerun of the same file writes nothing
+        call_command("import_books", path, "--skip-existing", stdout=out, stderr=StringIO())
+        self.assertIn("Imported 0 books from 3 rows", out.getvalue())
+        self.assertIn("2 skipped, 1 rejected", out.getvalue())
+        self.assertEqual(Book.objects.count(), 2)
+
+    def test_insert_new_skips_keys_taken_meanwhile(self):
+        books = {
+            ("Dune", "Frank Herbert"): Book(name="Dune", author="Frank Herbert", year_published=1965),
+            ("Emma", "Jane Austen"): Book(name="Emma", author="Jane Austen", year_published=1815),
+        }
+        # As if Dune had been added after the lookup: the insert fails and is redone without it
+        inserted = importing.insert_new(Book, books, importing.existing_books, existing=set())
+        self.assertEqual([book.name for book in inserted], ["Emma"])
+        self.assertEqual(Book.objects.count(), 2)
+
+    def test_import_keeps_counters_and_search_in_step(self):
+        path = self.write("books.jsonl", (
+            '{"name": "Foundation", "author": "Isaac Asimov", "year_published": 1951, "inventory": 4}\n'
+            '{"name": "Dune", "author": "Frank Herbert", "year_published": 1965, "inventory": 9}\n'
+        ))
+        with mock.patch.object(stats, "rebuild") as rebuild:
+            call_command("import_books", path, stdout=StringIO())
+            call_command("import_books", path, "--skip-existing", stdout=StringIO())
+        rebuild.assert_not_called()  # Counted as written, not by rescanning the tables
+        self.assertEqual(stats.read_counters(), stats.count_from_tables())
+        self.assertEqual(stats.read_counters()["copies_in_stock"], 5)
+        self.assertEqual(suggest.suggest("found")[0]["value"], "Foundation")
+        response = APIClient().get("/api/library/books/?search=foundation")
+        self.assertEqual([book["name"] for book in response.data["results"]], ["Foundation"])
+
+
+class ImportUsersTestCase(TestCase):
+    def setUp(self):
+        User.objects.create_user(username="taken", password="password123")
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, "users.csv")
+        with open(self.path, "w", encoding="utf-8") as handle:
+            handle.write(
+                "username,password,email,first_name,last_name,is_staff\n"
+                "ann,secret-one,ann@example.com,Ann,Lee,false\n"
+                "taken,secret-two,,,,\n"
+                "bad name!,secret-three,,,,\n"
+                "bob,secret-four,not-an-email,,,\n"
+                "cy,secret-five,,,,true\n"
+            )
+
+    def test_import_users_in_process_pool(self):
+        out = StringIO()
+        call_command(
+            "import_users", self.path, "--workers", "2", "--batch-size", "2",
+            stdout=out, stderr=StringIO(),
+        )
+        self.assertIn("Created 2 users", out.getvalue())
+        self.assertIn("on 2 worker(s)", out.getvalue())
+        self.assertIn("1 skipped, 2 rejected", out.getvalue())  # "taken" already exists
+        ann = User.objects.get(username="ann")
+        self.assertTrue(ann.check_password("secret-one"))
+        self.assertEqual((ann.email, ann.first_name, ann.is_staff), ("ann@example.com", "Ann", False))
+        self.assertTrue(User.objects.get(username="cy").is_staff)
+        self.assertFalse(User.objects.filter(username__in=["bad name!", "bob"]).exists())
+        self.assertEqual(stats.read_counters()["users"], 3)
+        # Imported users get their loan summary up front, like users created one at a time
+        self.assertEqual(
+            set(LoanSummary.objects.values_list("user__username", flat=True)), {"taken", "ann", "cy"}
+        )
+
+    def test_rerun_skips_existing_usernames(self):
+        call_command("import_users", self.path, "--workers", "1", stdout=StringIO(), stderr=StringIO())
+        out = StringIO()
+        call_command("import_users", self.path, "--workers", "1", stdout=out, stderr=StringIO())
+        self.assertIn("Created 0 users", out.getvalue())
+        self.assertIn("3 skipped, 2 rejected", out.getvalue())
+        self.assertEqual(User.objects.count(), 3)
+
+    def test_usernames_taken_during_the_import_are_skipped(self):
+        rows = [(1, {"username": "dee", "password": "secret-six"})]
+        lookup = importing.existing_usernames
+
+        def late_registration(usernames):
+            # Registered after the first lookup, before the insert
+            if not User.objects.filter(username="dee").exists():
+                User.objects.create_user(username="dee", password="other")
+                return set()
+            return lookup(usernames)
+
+        with mock.patch.object(importing, "existing_usernames", late_registration):
+            report = importing.import_users(rows, workers=1)
+        self.assertEqual((report.written, report.skipped), (0, 1))
+        self.assertFalse(User.objects.get(username="dee").check_password("secret-six"))
+
+
+class ExportTestCase(TestCase):
+    def setUp(self):
+        self.admin_user = User.objects.create_superuser(
+            username="admin", email="admin@example.com", password="adminpass"
+        )
+        self.user = User.objects.create_user(username="reader", password="password123")
+        self.book = Book.objects.create(
+            name="Ünïcode, \"Quoted\"", author="Author", year_published=2001, category="Mystery", inventory=4
+        )
+        self.open_loan = Loan.objects.create(user=self.user, book=self.book, type=1)
+        self.closed_loan = Loan.objects.create(user=self.user, book=self.book, type=2, returned=True)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin_user)
+
+    def export(self, path, **extra):
+        response = self.client.get(f"/api/library/export/{path}", **extra)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b"".join(response.streaming_content).decode(), response
+
+    def test_loans_ndjson(self):
+        body, response = self.export("loans.ndjson")
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        self.assertIn('filename="loans-', response["Content-Disposition"])
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([row["id"] for row in rows], [self.open_loan.id, self.closed_loan.id])
+        self.assertEqual(rows[0]["username"], "reader")
+        self.assertEqual(rows[0]["book_name"], self.book.name)
+        self.assertEqual(rows[0]["loan_date"], now().date().isoformat())
+        self.assertIs(rows[1]["returned"], True)
+
+    def test_loans_csv_with_filters(self):
+        body, response = self.export("loans.csv?returned=false", HTTP_ACCEPT="text/csv")
+        self.assertTrue(response["Content-Type"].startswith("text/csv"))
+        rows = list(csv.reader(StringIO(body)))
+        self.assertEqual(rows[0][:3], ["id", "user_id", "username"])
+        self.assertEqual([row[0] for row in rows[1:]], [str(self.open_loan.id)])
+        self.assertEqual(rows[1][4], self.book.name)
+
+        tomorrow = (now().date() + timedelta(days=1)).isoformat()
+        body, _ = self.export(f"loans.csv?loaned_after={tomorrow}")
+        self.assertEqual(len(body.splitlines()), 1)  # Header only
+
+    def test_books_export(self):
+        body, _ = self.export("books.csv")
+        rows = list(csv.reader(StringIO(body)))
+        self.assertEqual(rows[1][1], self.book.name)
+        body, _ = self.export("books.ndjson")
+        self.assertEqual(json.loads(body)["inventory"], 4)
+
+    def test_export_streams_from_a_cursor(self):
+        with self.assertNumQueries(1):
+            body, _ = self.export("loans.ndjson")
+        self.assertEqual(len(body.splitlines()), 2)
+
+    def test_export_requires_admin(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get("/api/library/export/loans.csv", HTTP_ACCEPT="text/csv")
+        self.assertEqual(response.status_code, 403)
+        self.client.force_authenticate(user=self.admin_user)
+        response = self.client.get("/api/library/export/loans.csv?returned=maybe")
+        self.assertEqual(response.status_code, 400)
+
+
+class ClaimsAuthenticationTestCase(TestCase):
+    def setUp(self):
+        authentication.clear_cache()
+        self.addCleanup(authentication.clear_cache)
+        self.user = User.objects.create_user(
+            username="reader", email="reader@example.com", password="password123"
+        )
+        self.admin_user = User.objects.create_user(
+            username="staff", password="adminpass", is_staff=True
+        )
+        self.book = Book.objects.create(
+            name="Token", author="Author", year_published=2020, category="Action", inventory=5
+        )
+        self.client = APIClient()
+
+    def login(self, user):
+        token = RefreshToken.for_user(user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def test_cached_user_needs_no_query(self):
+        self.login(self.user)
+        self.client.get("/api/library/loans/")  # Loads and caches the flags
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(f"/api/library/borrow_book/{self.book.id}/")
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse([q for q in ctx.captured_queries if 'FROM "auth_user"' in q["sql"]])
+
+    def test_lazy_user_loads_deferred_fields_on_demand(self):
+        user = authentication.ClaimsJWTAuthentication().get_user(
+            RefreshToken.for_user(self.user).access_token
+        )
+        self.assertEqual((user.pk, user.username, user.is_staff), (self.user.pk, "reader", False))
+        with self.assertNumQueries(1):
+            self.assertEqual(user.email, "reader@example.com")
+
+    def test_admin_check_and_staff_changes(self):
+        self.login(self.admin_user)
+        self.assertEqual(self.client.get("/api/library/admin-dashboard/").status_code, 200)
+
+        self.admin_user.is_staff = False
+        self.admin_user.save()  # Drops the cached flags on this worker
+        self.assertEqual(self.client.get("/api/library/admin-dashboard/").status_code, 403)
+
+    def test_deactivation_is_seen_after_ttl(self):
+        self.login(self.user)
+        self.assertEqual(self.client.get("/api/library/loans/").status_code, 200)
+        User.objects.filter(pk=self.user.pk).update(is_active=False)  # Another worker, no signal
+        self.assertEqual(self.client.get("/api/library/loans/").status_code, 200)
+        with self.settings(LIBRARY_AUTH_CACHE_TTL=0):
+            self.assertEqual(self.client.get("/api/library/loans/").status_code, 401)
+
+    def test_borrow_and_return_with_token(self):
+        self.login(self.user)
+        response = self.client.post(f"/api/library/borrow_book/{self.book.id}/")
+        self.assertEqual(response.status_code, 201)
+        loan = Loan.objects.get(pk=response.data["loan_id"])
+        self.assertEqual(loan.user_id, self.user.id)
+        response = self.client.post(f"/api/library/return_book/{loan.id}/")
+        self.assertEqual(response.status_code, 200)
+
+
+class AsyncViewsTestCase(TestCase):
+    def setUp(self):
+        authentication.clear_cache()
+        self.addCleanup(authentication.clear_cache)
+        self.user = User.objects.create_user(username="reader", password="password123")
+        self.admin_user = User.objects.create_user(username="staff", password="adminpass", is_staff=True)
+        self.books = [
+            Book.objects.create(
+                name=f"Async {i}", author="Author", year_published=2000 + i, category="Action", inventory=2
+            )
+            for i in range(5)
+        ]
+        Loan.objects.create(user=self.user, book=self.books[0], type=1)
+        Loan.objects.create(user=self.admin_user, book=self.books[1], type=2)
+        self.settings_override = self.settings(LIBRARY_CATALOG_CACHE=False)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+    def bearer(self, user):
+        return {"HTTP_AUTHORIZATION": f"Bearer {RefreshToken.for_user(user).access_token}"}
+
+    def assertSameResponse(self, path, **headers):
+        sync = self.client.get(f"/api/library/{path}", **headers)
+        asynchronous = self.client.get(f"/api/library/async/{path}", **headers)
+        self.assertEqual(asynchronous.status_code, sync.status_code)
+        self.assertEqual(
+            asynchronous.content.replace(b"/async/", b"/"), sync.content, path
+        )
+        return asynchronous
+
+    def test_book_endpoints_match_sync(self):
+        self.assertSameResponse("books/")
+        response = self.assertSameResponse("books/?page_size=2&ordering=-year_published")
+        next_url = response.json()["next"]
+        self.assertIn("/async/books/", next_url)
+        self.assertSameResponse(f"books/?{urlparse(next_url).query}")
+        self.assertSameResponse("books/?search=async")
+        self.assertSameResponse(f"books/{self.books[0].id}/")
+        self.assertSameResponse("books/9999/")
+        self.assertSameResponse("books/?cursor=bogus")
+
+    def test_loans_and_dashboard_match_sync(self):
+        self.assertSameResponse("loans/", **self.bearer(self.user))
+        self.assertSameResponse("loans/?returned=false", **self.bearer(self.admin_user))
+        self.assertSameResponse("loans/?returned=maybe", **self.bearer(self.user))
+        self.assertSameResponse("admin-dashboard/", **self.bearer(self.admin_user))
+
+    def test_permissions(self):
+        self.assertEqual(self.client.get("/api/library/async/loans/").status_code, 401)
+        response = self.client.get("/api/library/async/admin-dashboard/", **self.bearer(self.user))
+        self.assertEqual(response.status_code, 403)
+        response = self.client.get("/api/library/async/loans/", HTTP_AUTHORIZATION="Bearer nope")
+        self.assertEqual(response.status_code, 401)
+
+    def test_write_methods_are_not_allowed(self):
+        paths = [
+            "books/", f"books/{self.books[0].id}/", "loans/", "admin-dashboard/", "inventory-feed/"
+        ]
+        for path in paths:
+            for method in ("post", "put", "patch", "delete"):
+                response = getattr(self.client, method)(
+                    f"/api/library/async/{path}", **self.bearer(self.admin_user)
+                )
+                self.assertEqual(response.status_code, 405, (method, path))
+                self.assertEqual(response["Allow"], "GET, HEAD")
+                self.assertEqual(
+                    response.json(), {"detail": f'Method "{method.upper()}" not allowed.'}
+                )
+        self.assertEqual(Book.objects.count(), len(self.books))
+
+    async def test_runs_under_async_client(self):
+        response = await self.async_client.get("/api/library/async/books/")
+        self.assertEqual(len(response.json()["results"]), 5)
+        token = RefreshToken.for_user(self.admin_user).access_token
+        response = await self.async_client.get(
+            "/api/library/async/admin-dashboard/", headers={"Authorization": f"Bearer {token}"}
+        )
+        self.assertEqual(response.json()["loans"], 2)
+
+
+class LoanSummaryTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="patron", password="password123")
+        self.book = Book.objects.create(
+            name="Summary", author="Author", year_published=2000, category="Action", inventory=50
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def summary(self):
+        return LoanSummary.objects.get(pk=self.user.pk)
+
+    def assertConsistent(self):
+        self.assertEqual(summaries.rebuild(dry_run=True), [])
+
+    def test_summary_follows_borrow_and_return(self):
+        first = inventory.borrow(self.user, self.book.id, loan_type=1)
+        second = inventory.borrow(self.user, self.book.id, loan_type=3)
+        summary = self.summary()
+        self.assertEqual(summary.active_loans, 2)
+        self.assertEqual(summary.earliest_due, second.return_date)
+
+        inventory.close_loan(second)
+        self.assertEqual(self.summary().earliest_due, first.return_date)
+        inventory.return_many([first.id])
+        self.assertEqual((self.summary().active_loans, self.summary().earliest_due), (0, None))
+        self.assertConsistent()
+
+    def test_summary_follows_direct_writes(self):
+        loan = Loan.objects.create(user=self.user, book=self.book, type=1)
+        inventory.borrow_many(self.user, [self.book.id, self.book.id])
+        self.assertEqual(self.summary().active_loans, 3)
+        loan.delete()
+        self.assertEqual(self.summary().active_loans, 2)
+        self.assertConsistent()
+
+    @override_settings(LIBRARY_MAX_ACTIVE_LOANS=2)
+    def test_active_loan_limit(self):
+        for _ in range(2):
+            response = self.client.post(f"/api/library/borrow_book/{self.book.id}/")
+            self.assertEqual(response.status_code, 201)
+        response = self.client.post(f"/api/library/borrow_book/{self.book.id}/")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["error"], "You have reached the limit of 2 active loans.")
+        self.assertEqual(Book.objects.get(pk=self.book.pk).inventory, 48)
+
+        inventory.close_loan(Loan.objects.filter(user=self.user).first())
+        response = self.client.post(
+            "/api/library/borrow_books/",
+            {"book_ids": [self.book.id, self.book.id], "atomic": False},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertIn("loan_id", response.data["results"][0])
+        self.assertIn("limit", response.data["results"][1]["error"])
+        self.assertEqual(self.summary().active_loans, 2)
+        self.assertConsistent()
+
+    def test_overdue_block_reads_only_the_summary(self):
+        Loan.objects.create(
+            user=self.user, book=self.book, type=1, return_date=now().date() - timedelta(days=1)
+        )
+        self.assertTrue(self.summary().is_overdue())
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(f"/api/library/borrow_book/{self.book.id}/")
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse([q for q in ctx.captured_queries if '"library_loan"' in q["sql"]])
+
+    @override_settings(LIBRARY_MAX_ACTIVE_LOANS=1)
+    def test_loan_create_admits_patrons_as_themselves(self):
+        other = User.objects.create_user(username="other", password="password123")
+        data = {"user": other.id, "book": self.book.id, "type": 1}
+        response = self.client.post("/api/library/loans/", data)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["user"], self.user.id)
+        response = self.client.post("/api/library/loans/", data)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["error"], "You have reached the limit of 1 active loans.")
+
+        staff = User.objects.create_user(username="desk", password="password123", is_staff=True)
+        self.client.force_authenticate(user=staff)
+        response = self.client.post("/api/library/loans/", {**data, "user": self.user.id})
+        self.assertEqual(response.status_code, 201)  # Desk loans skip the patron limit
+        self.assertEqual(self.summary().active_loans, 2)
+        self.assertFalse(Loan.objects.filter(user=other).exists())
+        self.assertConsistent()
+
+    def test_deleting_a_user_with_loans(self):
+        inventory.borrow(self.user, self.book.id)
+        inventory.close_loan(inventory.borrow(self.user, self.book.id))
+        self.user.delete()
+        self.assertFalse(LoanSummary.objects.filter(pk=self.user.pk).exists())
+        self.assertFalse(Loan.objects.exists())
+        self.assertEqual(stats.read_counters(), stats.count_from_tables())
+
+        other = User.objects.create_user(username="other", password="password123")
+        inventory.borrow(other, self.book.id)
+        User.objects.filter(pk=other.pk).delete()  # Queryset cascade
+        self.assertFalse(LoanSummary.objects.exists())
+
+    def test_rebuild_command(self):
+        LoanSummary.objects.filter(pk=self.user.pk).update(active_loans=7)
+        out = StringIO()
+        call_command("rebuild_loan_summaries", "--check", stdout=out)
+        self.assertIn(f"user {self.user.pk}: 7 active", out.getvalue())
+        self.assertIn("1 summary(ies) drifted", out.getvalue())
+
+        call_command("rebuild_loan_summaries", stdout=StringIO())
+        self.assertEqual(self.summary().active_loans, 0)
+        self.assertConsistent()
+
+    def test_missing_summary_is_created_on_borrow(self):
+        LoanSummary.objects.filter(pk=self.user.pk).delete()
+        inventory.borrow(self.user, self.book.id, check_overdue=True)
+        self.assertEqual(self.summary().active_loans, 1)
+
+
+class OverdueSweepTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="late", password="password123")
+        self.book = Book.objects.create(
+            name="Sweep", author="Author", year_published=2000, category="Action", inventory=50
+        )
+        self.today = now().date()
+
+    def loan(self, due_in_days, returned=False):
+        return Loan.objects.create(
+            user=self.user,
+            book=self.book,
+            type=1,
+            return_date=self.today + timedelta(days=due_in_days),
+            returned=returned,
+        )
+
+    def test_marks_newly_overdue_loans_once(self):
+        late = self.loan(-3)
+        self.loan(-5, returned=True)
+        due_today = self.loan(0)
+
+        self.assertEqual(overdue.sweep(today=self.today), 1)
+        self.assertTrue(Loan.objects.get(pk=late.pk).overdue)
+        self.assertFalse(Loan.objects.get(pk=due_today.pk).overdue)
+        event = OverdueEvent.objects.get()
+        self.assertEqual(
+            (event.loan_id, event.user_id, event.due_date), (late.pk, self.user.pk, late.return_date)
+        )
+        self.assertEqual(overdue.watermark(), self.today)
+
+        self.assertEqual(overdue.sweep(today=self.today), 0)
+        self.assertEqual(overdue.sweep(today=self.today + timedelta(days=1)), 1)
+        self.assertTrue(Loan.objects.get(pk=due_today.pk).overdue)
+        self.assertEqual(OverdueEvent.objects.count(), 2)
+
+    def test_only_scans_since_the_watermark(self):
+        overdue.sweep(today=self.today)
+        backdated = self.loan(-10)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(overdue.sweep(today=self.today), 0)
+        scan = next(
+            q["sql"] for q in ctx.captured_queries if q["sql"].startswith('SELECT "library_loan"')
+        )
+        self.assertIn(f"\"return_date\" >= '{self.today}'", scan)
+        self.assertEqual(overdue.sweep(today=self.today, full=True), 1)
+        self.assertTrue(Loan.objects.get(pk=backdated.pk).overdue)
+
+    def test_batches(self):
+        for days in (-1, -1, -2, -3, -4):
+            self.loan(days)
+        progress = []
+        self.assertEqual(overdue.sweep(today=self.today, batch_size=2, on_batch=progress.append), 5)
+        self.assertEqual(progress, [2, 4, 5])
+        self.assertEqual(Loan.objects.filter(overdue=True).count(), 5)
+        self.assertEqual(OverdueEvent.objects.count(), 5)
+
+    def test_events_outlive_deleted_loans(self):
+        late = self.loan(-1)
+        overdue.sweep(today=self.today)
+        late.delete()
+        self.assertIsNone(OverdueEvent.objects.get().loan_id)
+
+    def test_command(self):
+        self.loan(-2)
+        out = StringIO()
+        call_command("sweep_overdue", stdout=out)
+        self.assertIn("1 loan(s) marked overdue", out.getvalue())
+        self.assertIn(f"watermark {self.today}", out.getvalue())
+
+
+class HoldQueueTestCase(TestCase):
+    def setUp(self):
+        self.book = Book.objects.create(
+            name="Popular", author="Author", year_published=2000, category="Action", inventory=1
+        )
+        self.owner = User.objects.create_user(username="owner", password="password123")
+        self.first = User.objects.create_user(username="first", password="password123")
+        self.second = User.objects.create_user(username="second", password="password123")
+        self.admin = User.objects.create_superuser(username="admin", password="adminpass")
+        self.loan = inventory.borrow(self.owner, self.book.id)
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user=user)
+        return client
+
+    def stock(self):
+        return Book.objects.get(pk=self.book.pk).inventory
+
+    def test_place_hold_and_queue_positions(self):
+        response = self.client_for(self.first).post(f"/api/library/place_hold/{self.book.id}/")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["position"], 1)
+        response = self.client_for(self.second).post(f"/api/library/place_hold/{self.book.id}/")
+        self.assertEqual(response.data["position"], 2)
+
+        response = self.client_for(self.first).post(f"/api/library/place_hold/{self.book.id}/")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["error"], "You already have a hold on this book.")
+
+        with self.assertNumQueries(1):
+            response = self.client_for(self.second).get("/api/library/my_holds/")
+        self.assertEqual(
+            [(hold["book_name"], hold["status"], hold["position"]) for hold in response.data],
+            [("Popular", "waiting", 2)],
+        )
+
+    def test_cannot_hold_a_book_in_stock(self):
+        other = Book.objects.create(
+            name="Shelf", author="Author", year_published=2000, category="Action", inventory=2
+        )
+        response = self.client_for(self.first).post(f"/api/library/place_hold/{other.id}/")
+        self.assertEqual(response.status_code, 400)
+        response = self.client_for(self.first).post("/api/library/place_hold/9999/")
+        self.assertEqual(response.status_code, 404)
+
+    def test_return_goes_to_the_oldest_hold(self):
+        first = inventory.place_hold(self.first, self.book.id)
+        second = inventory.place_hold(self.second, self.book.id)
+
+        response = self.client_for(self.owner).post(f"/api/library/return_book/{self.loan.id}/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.stock(), 0)
+        self.assertEqual(Hold.objects.get(pk=first.pk).status, Hold.READY)
+        self.assertEqual(Hold.objects.get(pk=second.pk).status, Hold.WAITING)
+        self.assertEqual(
+            self.client_for(self.second).get("/api/library/my_holds/").data[0]["position"], 1
+        )
+
+        # Only the patron the copy was set aside for can borrow it
+        response = self.client_for(self.second).post(f"/api/library/borrow_book/{self.book.id}/")
+        self.assertEqual(response.data["error"], "This book is out of stock.")
+        response = self.client_for(self.first).post(f"/api/library/borrow_book/{self.book.id}/")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Hold.objects.get(pk=first.pk).status, Hold.FULFILLED)
+        self.assertEqual(self.stock(), 0)
+        self.assertEqual(stats.read_counters()[stats.COPIES_IN_STOCK], 0)
+
+    def test_every_return_path_allocates(self):
+        holds_in_order = []
+        for index in range(4):
+            patron = User.objects.create_user(username=f"patron{index}", password="password123")
+            holds_in_order.append(inventory.place_hold(patron, self.book.id))
+        Book.objects.filter(pk=self.book.pk).update(inventory=3)
+        loans = [inventory.borrow(self.owner, self.book.id) for _ in range(3)]
+
+        self.client_for(self.admin).post(f"/api/library/return_any_loan/{self.loan.id}/")
+        self.client_for(self.owner).patch(
+            f"/api/library/loans/{loans[0].id}/", {"returned": True}, format="json"
+        )
+        inventory.return_many([loans[1].id, loans[2].id])
+        statuses = [Hold.objects.get(pk=hold.pk).status for hold in holds_in_order]
+        self.assertEqual(statuses, [Hold.READY] * 4)
+        self.assertEqual(self.stock(), 0)
+
+    def test_cancel_and_expire_pass_the_copy_on(self):
+        first = inventory.place_hold(self.first, self.book.id)
+        second = inventory.place_hold(self.second, self.book.id)
+        inventory.close_loan(self.loan)
+
+        response = self.client_for(self.second).post(f"/api/library/cancel_hold/{first.id}/")
+        self.assertEqual(response.status_code, 404)
+        response = self.client_for(self.first).post(f"/api/library/cancel_hold/{first.id}/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Hold.objects.get(pk=second.pk).status, Hold.READY)
+        response = self.client_for(self.first).post(f"/api/library/cancel_hold/{first.id}/")
+        self.assertEqual(response.status_code, 400)
+
+        out = StringIO()
+        Hold.objects.filter(pk=second.pk).update(ready_until=now().date() - timedelta(days=1))
+        call_command("expire_holds", stdout=out)
+        self.assertIn("1 hold(s) expired.", out.getvalue())
+        self.assertEqual(Hold.objects.get(pk=second.pk).status, Hold.EXPIRED)
+        self.assertEqual(self.stock(), 1)
+
+    def test_deleted_holds_pass_the_copy_on(self):
+        first = inventory.place_hold(self.first, self.book.id)
+        second = inventory.place_hold(self.second, self.book.id)
+        inventory.close_loan(self.loan)
+
+        self.first.delete()  # Cascades to the ready hold
+        self.assertEqual(Hold.objects.get(pk=second.pk).status, Hold.READY)
+        Hold.objects.get(pk=second.pk).delete()
+        self.assertEqual(self.stock(), 1)
+        self.assertEqual(stats.read_counters()[stats.COPIES_IN_STOCK], 1)
+        self.assertFalse(Hold.objects.filter(pk__in=[first.pk, second.pk]).exists())
+
+        # Deleting from the admin goes through the same signal
+        loan = inventory.borrow(self.owner, self.book.id)
+        ready = inventory.place_hold(self.admin, self.book.id)
+        waiting = inventory.place_hold(self.owner, self.book.id)
+        inventory.close_loan(loan)
+        client = APIClient()
+        client.force_login(self.admin)
+        response = client.post(f"/admin/library/hold/{ready.pk}/delete/", {"post": "yes"})
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(Hold.objects.filter(pk=ready.pk).exists())
+        self.assertEqual(Hold.objects.get(pk=waiting.pk).status, Hold.READY)
+
+    def test_batch_borrow_uses_ready_hold(self):
+        hold = inventory.place_hold(self.first, self.book.id)
+        inventory.close_loan(self.loan)
+        other = Book.objects.create(
+            name="Other", author="Author", year_published=2000, category="Action", inventory=1
+        )
+        results = inventory.borrow_many(self.first, [self.book.id, other.id])
+        self.assertTrue(all("loan_id" in result for result in results))
+        self.assertEqual(Hold.objects.get(pk=hold.pk).status, Hold.FULFILLED)
+        self.assertEqual((self.stock(), Book.objects.get(pk=other.pk).inventory), (0, 0))
+
+
+class InventoryFeedTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="watcher", password="password123")
+        self.books = [
+            Book.objects.create(
+                name=f"Live {i}", author="Author", year_published=2000, category="Action", inventory=2
+            )
+            for i in range(2)
+        ]
+        self.loop = asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+
+    def subscribe(self):
+        async def subscribe():
+            return feed.subscribe()
+
+        subscription = self.loop.run_until_complete(subscribe())
+        self.addCleanup(feed.broadcaster.unsubscribe, subscription)
+        return subscription
+
+    def received(self, subscription):
+        chunks = []
+        while True:
+            chunk = self.loop.run_until_complete(subscription.next(timeout=0.05))
+            if chunk is None:
+                return chunks
+            chunks.append(chunk.decode())
+
+    def test_deltas_are_published_on_commit(self):
+        subscription = self.subscribe()
+        first, second = (book.id for book in self.books)
+        with self.captureOnCommitCallbacks(execute=True):
+            loan = inventory.borrow(self.user, first)
+            self.assertEqual(self.received(subscription), [])
+        self.assertEqual(
+            self.received(subscription),
+            [f'event: inventory\ndata: {{"book_id": {first}, "inventory": 1}}\n\n'],
+        )
+        # Events carry the committed stock, not the intermediate values within a transaction
+        with self.captureOnCommitCallbacks(execute=True):
+            inventory.close_loan(loan)
+            inventory.borrow_many(self.user, [first, second, second])
+        self.assertEqual(
+            self.received(subscription),
+            [
+                f'event: inventory\ndata: {{"book_id": {first}, "inventory": 1}}\n\n',
+                f'event: inventory\ndata: {{"book_id": {first}, "inventory": 1}}\n\n',
+                f'event: inventory\ndata: {{"book_id": {second}, "inventory": 0}}\n\n',
+            ],
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.books[1].delete()
+        self.assertIn('"inventory": null', self.received(subscription)[0])
+
+    def test_fan_out_and_slow_clients(self):
+        subscriptions = [self.subscribe() for _ in range(3)]
+        feed.broadcaster.deliver([("inventory", '{"book_id": 1, "inventory": 0}')])
+        for subscription in subscriptions:
+            self.assertEqual(len(self.received(subscription)), 1)
+
+        feed.broadcaster.deliver([("inventory", "{}")] * (feed.QUEUE_SIZE + 5))
+        self.assertEqual(self.received(subscriptions[0]), ["event: resync\ndata: {}\n\n"])
+
+    def test_nothing_is_read_without_subscribers(self):
+        def feed_callbacks(callbacks):
+            return [callback for callback in callbacks if callback.__module__ == feed.__name__]
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            inventory.borrow(self.user, self.books[0].id)
+        self.assertEqual(feed_callbacks(callbacks), [])
+        with self.settings(LIBRARY_INVENTORY_FEED="off"):
+            self.subscribe()
+            with self.captureOnCommitCallbacks() as callbacks:
+                inventory.borrow(self.user, self.books[0].id)
+        self.assertEqual(feed_callbacks(callbacks), [])
+
+    def test_feed_requires_asgi(self):
+        self.assertEqual(self.client.get("/api/library/async/inventory-feed/").status_code, 501)
+
+    async def test_stream(self):
+        response = await self.async_client.get("/api/library/async/inventory-feed/")
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        stream = aiter(response.streaming_content)
+        self.assertEqual(await anext(stream), b"retry: 5000\nevent: ready\ndata: {}\n\n")
+        feed.broadcaster.deliver([("inventory", '{"book_id": 7, "inventory": 3}')])
+        self.assertEqual(
+            await anext(stream), b'event: inventory\ndata: {"book_id": 7, "inventory": 3}\n\n'
+        )
+        # Servers close the response when the client goes away
+        await stream.aclose()
+        await sync_to_async(response.close)()
+        self.assertFalse(feed.broadcaster.has_subscribers())
+
+
+@override_settings(LIBRARY_TIMING_SAMPLE_RATE=1.0, LIBRARY_CATALOG_CACHE=False)
+class RequestTimingTestCase(TestCase):
+    def setUp(self):
+        timing.reset()
+        self.addCleanup(timing.reset)
+        authentication.clear_cache()
+        self.user = User.objects.create_user(username="timed", password="password123")
+        self.admin = User.objects.create_superuser(username="admin", password="adminpass")
+        book = Book.objects.create(
+            name="Timed", author="Author", year_published=2000, category="Action", inventory=5
+        )
+        for _ in range(3):
+            Loan.objects.create(user=self.user, book=book, type=1)
+
+    def get(self, path, user, **kwargs):
+        token = RefreshToken.for_user(user).access_token
+        return self.client.get(path, HTTP_AUTHORIZATION=f"Bearer {token}", **kwargs)
+
+    def test_server_timing_header_and_log_line(self):
+        with self.assertLogs("library.timing", "INFO") as logs:
+            response = self.get("/api/library/loans/", self.user)
+        header = dict(part.split(";", 1) for part in response["Server-Timing"].split(", "))
+        self.assertEqual(set(header), {"db", "auth", "serialize", "total"})
+        self.assertIn('desc="2 queries"', header["db"])  # Auth flags + the loans page
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual(
+            (line["route"], line["status"], line["queries"], line["bytes"]),
+            ("/api/library/loans/", 200, 2, len(response.content)),
+        )
+        self.assertGreater(line["serialize_ms"], 0)
+        self.assertGreater(line["auth_ms"], 0)
+
+    def test_route_keeps_router_patterns(self):
+        loan = Loan.objects.filter(user=self.user).first()
+        with self.assertLogs("library.timing", "INFO") as logs:
+            self.get(f"/api/library/loans/{loan.id}/", self.user)
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual(line["route"], "/api/library/loans/(?P<pk>[^/.]+)/")
+
+    def test_unsampled_requests_are_untouched(self):
+        with self.settings(LIBRARY_TIMING_SAMPLE_RATE=0.0):
+            response = self.get("/api/library/loans/", self.user)
+        self.assertNotIn("Server-Timing", response)
+        self.assertEqual(timing.route_summaries(), [])
+
+    def test_route_aggregates(self):
+        with self.assertLogs("library.timing", "INFO"):
+            for _ in range(3):
+                self.get("/api/library/loans/", self.user)
+            self.client.get("/api/library/books/")
+            response = self.get("/api/library/request-timings/?order=queries", self.admin)
+        self.assertEqual(response.status_code, 200)
+        routes = response.json()["routes"]
+        self.assertEqual(
+            [(row["method"], row["route"], row["count"]) for row in routes],
+            [("GET", "/api/library/loans/", 3), ("GET", "/api/library/books/", 1)],
+        )
+        self.assertEqual(routes[0]["max_queries"], 2)
+        self.assertGreaterEqual(routes[0]["p95_ms"], routes[0]["p50_ms"])
+
+        with self.assertLogs("library.timing", "INFO"):
+            self.assertEqual(self.get("/api/library/request-timings/", self.user).status_code, 403)
+            self.assertEqual(
+                self.get("/api/library/request-timings/?order=size", self.admin).status_code, 400
+            )
+
+    async def test_async_views_are_measured(self):
+        token = RefreshToken.for_user(self.user).access_token
+        with self.assertLogs("library.timing", "INFO"):
+            response = await self.async_client.get(
+                "/api/library/async/loans/", headers={"Authorization": f"Bearer {token}"}
+            )
+        self.assertIn('desc="2 queries"', response["Server-Timing"])
+
+
+class MetricsTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        authentication.clear_cache()
+        self.user = User.objects.create_user(username="metered", password="password123")
+        self.book = Book.objects.create(
+            name="Metered", author="Author", year_published=2000, category="Action", inventory=1
+        )
+
+    def sample(self, name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def scrape(self, **kwargs):
+        response = self.client.get("/metrics", **kwargs)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        return response.content.decode()
+
+    def test_requests_are_counted_per_url_name(self):
+        labels = {"view": "book-list", "method": "GET"}
+        before = self.sample("library_request_duration_seconds_count", **labels)
+        responses = self.sample("library_responses_total", status="200", **labels)
+        self.client.get("/api/library/books/")
+        self.assertEqual(self.sample("library_request_duration_seconds_count", **labels), before + 1)
+        self.assertEqual(
+            self.sample("library_responses_total", status="200", **labels), responses + 1
+        )
+        self.assertIn(
+            'library_request_duration_seconds_bucket{le="0.005",method="GET",view="book-list"}',
+            self.scrape(),
+        )
+
+    def test_borrow_and_return_counters(self):
+        borrowed = self.sample("library_loans_borrowed_total")
+        returned = self.sample("library_loans_returned_total")
+        out_of_stock = self.sample("library_borrow_failures_total", reason="out_of_stock")
+        already = self.sample("library_return_failures_total", reason="already_returned")
+
+        loan = inventory.borrow(self.user, self.book.id)
+        with self.assertRaises(inventory.OutOfStock):
+            inventory.borrow(self.user, self.book.id)
+        inventory.close_loan(loan)
+        with self.assertRaises(inventory.AlreadyReturned):
+            inventory.close_loan(loan)
+
+        self.assertEqual(self.sample("library_loans_borrowed_total"), borrowed + 1)
+        self.assertEqual(self.sample("library_loans_returned_total"), returned + 1)
+        self.assertEqual(
+            self.sample("library_borrow_failures_total", reason="out_of_stock"), out_of_stock + 1
+        )
+        self.assertEqual(
+            self.sample("library_return_failures_total", reason="already_returned"), already + 1
+        )
+
+    @override_settings(LIBRARY_CATALOG_CACHE=True)
+    def test_catalog_cache_hits_and_misses(self):
+        hit = self.sample("library_cache_requests_total", cache="catalog", result="hit")
+        miss = self.sample("library_cache_requests_total", cache="catalog", result="miss")
+        self.client.get("/api/library/books/")
+        self.client.get("/api/library/books/")
+        self.assertEqual(
+            self.sample("library_cache_requests_total", cache="catalog", result="miss"), miss + 1
+        )
+        self.assertEqual(
+            self.sample("library_cache_requests_total", cache="catalog", result="hit"), hit + 1
+        )
+
+    def test_stock_gauges_come_from_the_counters(self):
+        inventory.borrow(self.user, self.book.id)
+        text = self.scrape()
+        self.assertIn("library_active_loans 1.0", text)
+        self.assertIn("library_copies_in_stock 0.0", text)
+        self.assertIn("library_books 1.0", text)
+
+    def test_token_protects_the_endpoint(self):
+        with self.settings(LIBRARY_METRICS_TOKEN="scrape-secret"):
+            self.assertEqual(self.client.get("/metrics").status_code, 401)
+            self.scrape(HTTP_AUTHORIZATION="Bearer scrape-secret")
+
+    def test_multiprocess_exposition_reads_the_worker_directory(self):
+        with tempfile.TemporaryDirectory() as directory:
+            os.environ["PROMETHEUS_MULTIPROC_DIR"] = directory
+            try:
+                text = metrics.exposition().decode()
+            finally:
+                del os.environ["PROMETHEUS_MULTIPROC_DIR"]
+        self.assertIn("library_books 1.0", text)
+
+
+class SeedScaleTestCase(TestCase):
+    def test_parse_size(self):
+        self.assertEqual(
+            [seeding.parse_size(text) for text in ("250", "100k", "1M", "2.5m", "10_000")],
+            [250, 100_000, 1_000_000, 2_500_000, 10_000],
+        )
+        with self.assertRaises(ValueError):
+            seeding.parse_size("lots")
+
+    def test_seeded_rows_keep_the_derived_tables_consistent(self):
+        out = StringIO()
+        call_command(
+            "seed_scale", "--books", "300", "--users", "40", "--loans", "2k",
+            "--active-share", "0.2", "--batch-size", "500", stdout=out,
+        )
+        self.assertIn("Seeded 300 books, 40 users, 2,000 loans", out.getvalue())
+        self.assertEqual(Loan.objects.count(), 2000)
+        self.assertTrue(
+            self.client.login(username=User.objects.first().username, password=seeding.PASSWORD)
+        )
+        # Counters and summaries were rebuilt, so nothing drifted
+        counters = stats.rebuild(dry_run=True).values()
+        self.assertTrue(all(stored == actual for stored, actual in counters))
+        self.assertEqual(summaries.rebuild(dry_run=True), [])
+        loan = Loan.objects.filter(returned=False).first()
+        self.assertGreater(loan.return_date, loan.loan_date)
+
+        # Appending continues the numbering instead of colliding on (name, author)
+        call_command("seed_scale", "--books", "50", stdout=StringIO())
+        self.assertEqual(Book.objects.count(), 350)
+
+    def test_seeded_users_without_loans_get_summaries(self):
+        seeding.generate(users=5)
+        self.assertEqual(LoanSummary.objects.count(), User.objects.count())
+        self.assertEqual(summaries.rebuild(dry_run=True), [])
+
+    def test_same_seed_same_rows(self):
+        seeding.generate(books=20, seed=7)
+        first = list(Book.objects.values_list("author", "year_published", "inventory"))
+        Book.objects.all().delete()
+        seeding.generate(books=20, seed=7)
+        self.assertEqual(
+            list(Book.objects.values_list("author", "year_published", "inventory")), first
+        )
+
+    def test_refuses_bad_arguments(self):
+        with self.assertRaises(CommandError):
+            call_command("seed_scale", stdout=StringIO())
+        with self.assertRaises(CommandError):
+            call_command("seed_scale", "--loans", "10", stdout=StringIO())  # No users or books
+
+
+class LoanArchiveTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="reader", password="password123")
+        self.other = User.objects.create_user(username="other", password="password123")
+        self.admin = User.objects.create_superuser(username="admin", password="adminpass")
+        self.book = Book.objects.create(
+            name="Archived", author="Author", year_published=2000, category="Action", inventory=5
+        )
+        self.today = now().date()
+
+    def loan(self, user, days_ago, returned=True):
+        loan = Loan.objects.create(user=user, book=self.book, type=1, returned=returned)
+        Loan.objects.filter(pk=loan.pk).update(loan_date=self.today - timedelta(days=days_ago))
+        return loan
+
+    def test_moves_old_returned_loans_only(self):
+        old = self.loan(self.user, 400)
+        old_active = self.loan(self.user, 400, returned=False)
+        recent = self.loan(self.user, 10)
+        event = OverdueEvent.objects.create(
+            loan=old, user=self.user, book=self.book, due_date=self.today - timedelta(days=390)
+        )
+
+        self.assertEqual(archive.archive(older_than_days=365, today=self.today), 1)
+        self.assertEqual(set(Loan.objects.values_list("pk", flat=True)), {old_active.pk, recent.pk})
+        archived = LoanArchive.objects.get()
+        self.assertEqual(
+            (archived.pk, archived.user_id, archived.loan_date),
+            (old.pk, self.user.pk, self.today - timedelta(days=400)),
+        )
+        event.refresh_from_db()
+        self.assertIsNone(event.loan_id)  # The event outlives the loan
+        # The loans total still counts archived loans, and no summary changed
+        counters = stats.rebuild(dry_run=True)
+        self.assertTrue(all(stored == actual for stored, actual in counters.values()))
+        self.assertEqual(counters[stats.LOANS][1], 3)
+        self.assertEqual(summaries.rebuild(dry_run=True), [])
+
+    def test_batches_do_not_issue_loan_signals(self):
+        for _ in range(5):
+            self.loan(self.user, 500)
+        with CaptureQueriesContext(connection) as queries:
+            moved = archive.archive(older_than_days=365, today=self.today, batch_size=2)
+        self.assertEqual(moved, 5)
+        self.assertFalse(Loan.objects.exists())
+        sql = [query["sql"] for query in queries.captured_queries]
+        self.assertFalse(any("library_loansummary" in statement for statement in sql))
+
+        self.user.delete()  # Archived rows go with their user and leave the loans total
+        self.assertEqual(stats.read_counters()[stats.LOANS], 0)
+
+    def test_history_endpoint_and_export(self):
+        mine = self.loan(self.user, 400)
+        theirs = self.loan(self.other, 800)
+        archive.archive(older_than_days=365)
+        client = APIClient()
+
+        client.force_authenticate(user=self.user)
+        response = client.get("/api/library/loan-history/")
+        self.assertEqual(response.status_code, 200)
+        rows = response.json()["results"]
+        self.assertEqual([row["id"] for row in rows], [mine.pk])
+        self.assertEqual(rows[0]["book_name"], "Archived")
+        self.assertEqual(client.get(f"/api/library/loan-history/{theirs.pk}/").status_code, 404)
+        self.assertEqual(client.post("/api/library/loan-history/", {}).status_code, 405)
+
+        client.force_authenticate(user=self.admin)
+        cutoff = (self.today - timedelta(days=500)).isoformat()
+        response = client.get(f"/api/library/loan-history/?loaned_before={cutoff}")
+        self.assertEqual([row["id"] for row in response.json()["results"]], [theirs.pk])
+        response = client.get("/api/library/export/loan_history.ndjson")
+        body = b"".join(response.streaming_content).decode()
+        self.assertEqual(
+            [json.loads(line)["username"] for line in body.splitlines()], ["reader", "other"]
+        )
+
+    def test_command(self):
+        self.loan(self.user, 40)
+        out = StringIO()
+        call_command("archive_loans", "--older-than-days", "30", "--dry-run", stdout=out)
+        self.assertIn("1 loan(s) lent before", out.getvalue())
+        self.assertEqual(LoanArchive.objects.count(), 0)
+        call_command("archive_loans", "--older-than-days", "30", stdout=StringIO())
+        self.assertEqual(LoanArchive.objects.count(), 1)
+
+    @skipUnless(connection.vendor == "postgresql", "Partitioning is PostgreSQL-only")
+    def test_rows_land_in_yearly_partitions(self):
+        self.loan(self.user, 400)
+        self.loan(self.user, 800)
+        archive.archive(older_than_days=365, today=self.today)
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT partrelid::regclass::text FROM pg_partitioned_table")
+            self.assertIn(LoanArchive._meta.db_table, [row[0] for row in cursor.fetchall()])
+            cursor.execute(
+                f"SELECT tableoid::regclass::text, loan_date FROM {LoanArchive._meta.db_table}"
+            )
+            placed = cursor.fetchall()
+        self.assertEqual(len(placed), 2)
+        for partition, loan_date in placed:
+            self.assertEqual(partition, archive.partition_name(loan_date.year))
+        # Reads filtered by date go through the partitioned parent as usual
+        cutoff = self.today - timedelta(days=600)
+        self.assertEqual(LoanArchive.objects.filter(loan_date__lt=cutoff).count(), 1)
+
+
+# The "test_replica" SQLite database (declared in settings under `manage.py test`) stands in
+# for the replica; the test runner creates and migrates it for this test case only.
+# TransactionTestCase, because the router keeps every read inside a transaction (such as
+# TestCase's) on the primary.
+REPLICA = "test_replica"
+
+
+@override_settings(LIBRARY_READ_REPLICAS=[REPLICA], LIBRARY_CATALOG_CACHE=False)
+class ReplicaRoutingTestCase(TransactionTestCase):
+    databases = {"default", REPLICA}
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="reader", password="password123")
+        # The replica lags: it still has the book with its old name and stock
+        self.book = Book.objects.create(
+            name="Fresh", author="Author", year_published=2000, category="Action", inventory=3
+        )
+        Book.objects.using(REPLICA).create(
+            pk=self.book.pk, name="Stale", author="Author", year_published=2000,
+            category="Action", inventory=5,
+        )
+        self.client = APIClient()
+
+    def test_catalog_reads_use_the_replica(self):
+        response = self.client.get("/api/library/books/")
+        self.assertEqual([row["name"] for row in response.json()["results"]], ["Stale"])
+        response = self.client.get(f"/api/library/books/{self.book.pk}/")
+        self.assertEqual(response.json()["inventory"], 5)
+        response = self.client.get("/api/library/books/?search=stale")
+        self.assertEqual(len(response.json()["results"]), 1)
+
+    def test_writes_and_other_reads_use_the_primary(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post(f"/api/library/borrow_book/{self.book.pk}/")
+        self.assertEqual(response.status_code, 201)
+        loan_id = response.json()["loan_id"]
+        self.assertTrue(Loan.objects.using("default").filter(pk=loan_id).exists())
+        self.assertFalse(Loan.objects.using(REPLICA).exists())
+        self.assertEqual(len(self.client.get("/api/library/loans/").json()["results"]), 1)
+
+        # Reads inside a transaction stay on the primary even in a replica scope
+        with routing.replica_reads(self.client.get("/").wsgi_request), transaction.atomic():
+            self.assertEqual(Book.objects.get(pk=self.book.pk).name, "Fresh")
+        with routing.replica_reads(self.client.get("/").wsgi_request):
+            self.assertEqual(Book.objects.get(pk=self.book.pk).name, "Stale")
+
+    def test_writers_read_their_writes(self):
+        other = User.objects.create_user(username="other", password="password123")
+        self.client.force_authenticate(user=self.user)
+        self.client.post(f"/api/library/borrow_book/{self.book.pk}/")
+        self.assertTrue(routing.is_pinned(self.user.pk))
+        response = self.client.get(f"/api/library/books/{self.book.pk}/")
+        self.assertEqual(response.json()["inventory"], 2)  # Own borrow visible at once
+
+        self.client.force_authenticate(user=other)  # Not pinned: replica
+        response = self.client.get(f"/api/library/books/{self.book.pk}/")
+        self.assertEqual(response.json()["inventory"], 5)
+
+        cache.delete(routing.PIN_KEY.format(user_id=self.user.pk))  # Window over
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(f"/api/library/books/{self.book.pk}/")
+        self.assertEqual(response.json()["inventory"], 5)
+
+    @override_settings(LIBRARY_CATALOG_CACHE=True)
+    def test_catalog_cache_keeps_replica_rows_out(self):
+        url = f"/api/library/books/{self.book.pk}/"
+        self.client.force_authenticate(user=self.user)
+        self.client.post(f"/api/library/borrow_book/{self.book.pk}/")  # Bumps the version
+
+        anonymous = APIClient()
+        for _ in range(2):
+            response = anonymous.get(url)  # Replica: neither stored nor revalidated
+            self.assertEqual(response.json()["inventory"], 5)
+            self.assertNotIn("ETag", response)
+        self.assertEqual(self.client.get(url).json()["inventory"], 2)
+
+        with self.settings(LIBRARY_READ_REPLICAS=[]):
+            first = anonymous.get(url)
+            self.assertEqual(first.json()["inventory"], 2)
+            self.assertEqual(
+                anonymous.get(url, HTTP_IF_NONE_MATCH=first["ETag"]).status_code, 304
+            )
+
+    def test_refused_writes_do_not_pin(self):
+        self.client.force_authenticate(user=self.user)
+        self.client.post("/api/library/borrow_book/999999/")
+        self.assertFalse(routing.is_pinned(self.user.pk))
+
+    def test_exports_read_the_replica(self):
+        admin = User.objects.create_superuser(username="admin", password="adminpass")
+        self.client.force_authenticate(user=admin)
+        response = self.client.get("/api/library/export/books.ndjson")
+        body = b"".join(response.streaming_content).decode()
+        self.assertEqual([json.loads(line)["name"] for line in body.splitlines()], ["Stale"])
+
+    def test_no_replica_configured(self):
+        with self.settings(LIBRARY_READ_REPLICAS=[]):
+            response = self.client.get("/api/library/books/")
+        self.assertEqual([row["name"] for row in response.json()["results"]], ["Fresh"])
+
+
+class ConnectionPoolTestCase(SimpleTestCase):
+    """library/pool.py with sqlite3 connections standing in for PostgreSQL ones."""
+
+    def setUp(self):
+        self.opened = []
+
+    def connect(self):
+        connection = sqlite3.connect(":memory:", check_same_thread=False)
+        self.opened.append(connection)
+        return connection
+
+    def make_pool(self, **options):
+        return pool.ConnectionPool(self.connect, alias="test", **options)
+
+    def sample(self, name, **labels):
+        return REGISTRY.get_sample_value(name, {"alias": "test", **labels}) or 0
+
+    def test_released_connections_are_reused(self):
+        connections_pool = self.make_pool()
+        first = connections_pool.acquire()
+        connections_pool.release(first)
+        self.assertIs(connections_pool.acquire(), first)
+        self.assertEqual(len(self.opened), 1)
+        self.assertEqual(
+            connections_pool.stats(), {"idle": 0, "in_use": 1, "opening": 0, "waiting": 0}
+        )
+
+    def test_checkout_waits_for_a_connection_then_times_out(self):
+        connections_pool = self.make_pool(max_size=1, timeout=0.05)
+        timeouts = self.sample("library_db_pool_timeouts_total")
+        held = connections_pool.acquire()
+        with self.assertRaises(pool.PoolTimeout):
+            connections_pool.acquire()
+        self.assertEqual(self.sample("library_db_pool_timeouts_total"), timeouts + 1)
+
+        connections_pool.timeout = 5
+        releaser = threading.Timer(0.05, connections_pool.release, [held])
+        releaser.start()
+        self.assertIs(connections_pool.acquire(), held)  # Handed over, not a second connection
+        releaser.join()
+        self.assertEqual(len(self.opened), 1)
+
+    def test_health_check_replaces_dropped_connections(self):
+        connections_pool = self.make_pool(check=True)
+        dropped = connections_pool.acquire()
+        connections_pool.release(dropped)
+        dropped.close()  # As if the server had gone away while it sat idle
+        failed = self.sample("library_db_pool_connections_closed_total", reason="health_check")
+
+        fresh = connections_pool.acquire()
+        self.assertIsNot(fresh, dropped)
+        self.assertEqual(
+            self.sample("library_db_pool_connections_closed_total", reason="health_check"),
+            failed + 1,
+        )
+
+    def test_idle_and_old_connections_are_closed(self):
+        connections_pool = self.make_pool(max_idle=0)
+        first = connections_pool.acquire()
+        connections_pool.release(first)
+        self.assertIsNot(connections_pool.acquire(), first)  # Idle too long
+
+        kept = self.make_pool(max_idle=0, min_size=1)
+        first = kept.acquire()
+        kept.release(first)
+        self.assertIs(kept.acquire(), first)  # The first `min_size` stay open
+
+        aged = self.make_pool(max_lifetime=0)
+        first = aged.acquire()
+        aged.release(first)
+        self.assertEqual(aged.stats()["idle"], 0)
+
+    def test_connections_come_back_rolled_back(self):
+        connections_pool = self.make_pool()
+        connection = connections_pool.acquire()
+        connection.execute("CREATE TABLE item (name TEXT)")
+        connection.commit()
+        connection.execute("INSERT INTO item VALUES ('left open')")
+        connections_pool.release(connection)
+        rows = connections_pool.acquire().execute("SELECT COUNT(*) FROM item").fetchone()
+        self.assertEqual(rows, (0,))
+
+    def test_pool_settings_from_environment(self):
+        from library_main import settings as project_settings
+
+        with mock.patch.object(project_settings, "DB_POOL", True), mock.patch.dict(
+            os.environ, {"DB_POOL_MAX_SIZE": "4", "DB_POOL_TIMEOUT": "2.5"}
+        ):
+            database = project_settings.pooled({"ENGINE": "django.db.backends.postgresql"})
+            sqlite = project_settings.pooled({"ENGINE": "django.db.backends.sqlite3"})
+        self.assertEqual(database["ENGINE"], "library.pooled_postgresql")
+        self.assertEqual(database["POOL"]["max_size"], 4)
+        self.assertEqual(database["POOL"]["timeout"], 2.5)
+        self.assertNotIn("POOL", sqlite)
+
+
+@override_settings(LIBRARY_CATALOG_CACHE=False)
+class FastReadTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="reader", password="password123")
+        self.admin = User.objects.create_superuser(username="admin", password="adminpass")
+        self.books = [
+            Book.objects.create(
+                name=name, author=author, year_published=1990 + i, category="Action", inventory=i
+            )
+            for i, (name, author) in enumerate([
+                ('Quotes "and" \\ back\tslash', "Émile Zola"),
+                ("Line\u2028and\u2029paragraph", "李白"),
+                ("Plain", "Author"),
+            ])
+        ]
+        Book.objects.filter(pk=self.books[2].pk).update(image_url=None)
+        self.loans = [
+            Loan.objects.create(user=self.user, book=book, type=1 + i % 3)
+            for i, book in enumerate(self.books)
+        ]
+        Loan.objects.filter(pk=self.loans[0].pk).update(return_date=None, returned=True)
+        LoanArchive.objects.create(
+            id=9000, user=self.user, book=self.books[1], type=2, loan_date=now().date(),
+            returned=True, overdue=False,
+        )
+        LoanArchive.objects.update(
+            archived_at=datetime(2024, 5, 6, 7, 8, 9, 123456, tzinfo=timezone.utc)
+        )
+
+    def same_as_serializers(self, url, user=None):
+        client = APIClient()
+        if user is not None:
+            client.force_authenticate(user=user)
+        with override_settings(LIBRARY_FAST_READS=False):
+            expected = client.get(url)
+        response = client.get(url)
+        self.assertEqual(response.status_code, expected.status_code)
+        self.assertEqual(response.content, expected.content)
+        return response
+
+    def test_catalog_matches_serializer_output_byte_for_byte(self):
+        response = self.same_as_serializers("/api/library/books/")
+        self.assertEqual(len(response.json()["results"]), 3)
+        self.assertIn(b"Line\\u2028and\\u2029paragraph", response.content)
+        first = self.same_as_serializers("/api/library/books/?ordering=-inventory&page_size=1")
+        self.same_as_serializers(first.json()["next"])  # Keyset cursor from a `.values()` row
+        self.same_as_serializers("/api/library/books/?search=zola")
+        self.same_as_serializers(f"/api/library/books/{self.books[1].pk}/")
+        self.same_as_serializers(f"/api/library/books/{self.books[2].pk}/")
+        self.same_as_serializers("/api/library/books/999999/")  # 404
+
+    def test_loans_match_serializer_output_byte_for_byte(self):
+        self.same_as_serializers("/api/library/loans/", user=self.user)
+        self.same_as_serializers("/api/library/loans/?ordering=loan_date&page_size=2", self.admin)
+        self.same_as_serializers(f"/api/library/loans/{self.loans[0].pk}/", user=self.user)
+        response = self.same_as_serializers("/api/library/loan-history/", user=self.user)
+        archived_at = response.json()["results"][0]["archived_at"]
+        self.assertEqual(archived_at, "2024-05-06T07:08:09.123456Z")
+        self.same_as_serializers("/api/library/async/books/")
+        self.same_as_serializers(f"/api/library/async/books/{self.books[0].pk}/")
+
+    def test_list_builds_rows_without_model_instances(self):
+        with mock.patch.object(Book, "from_db", side_effect=AssertionError("instantiated")):
+            response = self.client.get("/api/library/books/")
+        self.assertEqual(response.status_code, 200)
+
+    def test_serializers_it_cannot_reproduce_keep_the_regular_path(self):
+        self.assertIsNotNone(fastread.compile_serializer(BookSerializer))
+        self.assertIsNotNone(fastread.compile_serializer(LoanSerializer))
+        # `position` is an annotation, not a column
+        self.assertIsNone(fastread.compile_serializer(HoldSerializer))
+
+    def test_renderer_matches_drf(self):
+        fast, drf = renderers.FastJSONRenderer(), JSONRenderer()
+        payloads = [
+            {"text": 'é\u2028\u2029"\\\n\x00', "none": None, "flags": [True, False], "n": -3},
+            {"at": datetime(2024, 1, 2, 3, 4, 5, 678901, tzinfo=timezone.utc), "on": now().date()},
+            {"lazy": gettext_lazy("Not found."), "price": Decimal("1.50"), "span": timedelta(1)},
+            {"big": 2**70, 1: "non-string key"},  # orjson refuses both: stdlib fallback
+        ]
+        for payload in payloads:
+            self.assertEqual(fast.render(payload), drf.render(payload))
+        self.assertEqual(
+            fast.render({"a": [1]}, "application/json; indent=2"),
+            drf.render({"a": [1]}, "application/json; indent=2"),
+        )
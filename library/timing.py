@@ -0,0 +1,231 @@
+# library/timing.py
+# Per-request performance breakdown for a sample of requests (LIBRARY_TIMING_SAMPLE_RATE).
+# `ServerTimingMiddleware` measures a sampled request and reports:
+# - total time, SQL query count and time (a wrapper on every database connection);
+# - JWT authentication time and serializer time, both excluding the SQL they ran;
+# - response size.
+# The figures go out as a `Server-Timing` header (visible in browser dev tools) and as one
+# JSON log line on the "library.timing" logger. They are also added to per-route aggregates
+# that admins read at /api/library/request-timings/.
+#
+# Unsampled requests pay for one random() call and a context variable lookup per query, so
+# this can stay on in production. Aggregates are kept per worker process, in memory.
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+RESERVOIR = 500  # Latest durations kept per route for percentiles
+MAX_ROUTES = 500
+PHASES = ("auth", "serialize")
+
+_current = ContextVar("library_request_timings", default=None)
+
+
+class RequestTimings:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db = 0.0
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.active = set()
+
+
+def sample_rate():
+    return getattr(settings, "LIBRARY_TIMING_SAMPLE_RATE", 0.1)
+
+
+def record_query(execute, sql, params, many, context):
+    """Database execute wrapper: counts queries and their time for the sampled request."""
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.queries += 1
+        timings.db += time.perf_counter() - started
+
+
+def instrument(connection):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@contextmanager
+def measure(phase):
+    """Add the enclosed time, minus its SQL time, to a phase of the sampled request."""
+    timings = _current.get()
+    if timings is None or phase in timings.active:  # Not sampled, or nested
+        yield
+        return
+    timings.active.add(phase)
+    started, db = time.perf_counter(), timings.db
+    try:
+        yield
+    finally:
+        timings.active.discard(phase)
+        timings.phases[phase] += time.perf_counter() - started - (timings.db - db)
+
+
+class TimedSerializerMixin:
+    """Counts `to_representation()` toward the `serialize` phase (once, at the outermost level)."""
+
+    def to_representation(self, instance):
+        if _current.get() is None:
+            return super().to_representation(instance)
+        with measure("serialize"):
+            return super().to_representation(instance)
+
+
+class RouteStats:
+    def __init__(self):
+        self.count = 0
+        self.durations = deque(maxlen=RESERVOIR)
+        self.queries = 0
+        self.max_queries = 0
+        self.db = 0.0
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.bytes = 0
+
+    def add(self, timings, duration, size):
+        self.count += 1
+        self.durations.append(duration)
+        self.queries += timings.queries
+        self.max_queries = max(self.max_queries, timings.queries)
+        self.db += timings.db
+        for phase, seconds in timings.phases.items():
+            self.phases[phase] += seconds
+        self.bytes += size or 0
+
+    def summary(self):
+        durations = sorted(self.durations)
+
+        def percentile(q):
+            return round(durations[round(q * (len(durations) - 1))] * 1000, 2)
+
+        return {
+            "count": self.count,
+            "p50_ms": percentile(0.5),
+            "p95_ms": percentile(0.95),
+            "max_ms": round(durations[-1] * 1000, 2),
+            "avg_queries": round(self.queries / self.count, 2),
+            "max_queries": self.max_queries,
+            "avg_db_ms": round(self.db / self.count * 1000, 2),
+            **{
+                f"avg_{phase}_ms": round(seconds / self.count * 1000, 2)
+                for phase, seconds in self.phases.items()
+            },
+            "avg_bytes": round(self.bytes / self.count),
+        }
+
+
+_routes = {}  # (method, route) -> RouteStats
+_lock = threading.Lock()
+
+
+def record(method, route, timings, duration, size):
+    with _lock:
+        stats = _routes.get((method, route))
+        if stats is None:
+            if len(_routes) >= MAX_ROUTES:
+                return
+            stats = _routes[(method, route)] = RouteStats()
+        stats.add(timings, duration, size)
+
+
+def route_summaries():
+    with _lock:
+        return [
+            {"method": method, "route": route, **stats.summary()}
+            for (method, route), stats in _routes.items()
+        ]
+
+
+def reset():
+    with _lock:
+        _routes.clear()
+
+
+def route_of(request):
+    # The URL pattern, not the path, so /books/1/ and /books/2/ share one entry
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "<unresolved>"
+    # Only the anchors: a `^` inside a character class such as `[^/.]` is part of the pattern
+    return "/" + match.route.removeprefix("^").removesuffix("$")
+
+
+def server_timing(timings, duration):
+    parts = [f'db;dur={timings.db * 1000:.2f};desc="{timings.queries} queries"']
+    parts += [f"{phase};dur={seconds * 1000:.2f}" for phase, seconds in timings.phases.items()]
+    parts.append(f"total;dur={duration * 1000:.2f}")
+    return ", ".join(parts)
+
+
+class ServerTimingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if random.random() >= sample_rate():
+            return self.get_response(request)
+        timings = RequestTimings()
+        token = _current.set(timings)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, timings)
+
+    async def __acall__(self, request):
+        if random.random() >= sample_rate():
+            return await self.get_response(request)
+        timings = RequestTimings()
+        token = _current.set(timings)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, timings)
+
+    def finish(self, request, response, timings):
+        duration = time.perf_counter() - timings.started
+        size = None if response.streaming else len(response.content)
+        route = route_of(request)
+        response["Server-Timing"] = server_timing(timings, duration)
+        record(request.method, route, timings, duration, size)
+        logger.info(json.dumps({
+            "event": "request",
+            "method": request.method,
+            "route": route,
+            "status": response.status_code,
+            "duration_ms": round(duration * 1000, 2),
+            "queries": timings.queries,
+            "db_ms": round(timings.db * 1000, 2),
+            **{
+                f"{phase}_ms": round(seconds * 1000, 2)
+                for phase, seconds in timings.phases.items()
+            },
+            "bytes": size,
+            "pid": os.getpid(),
+        }))
+        return response
@@ -1,19 +1,30 @@
 # library/urls.py
-from django.urls import path, include
+from django.urls import path, re_path, include
 from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import TokenRefreshView
+from . import async_views
 from .views import (
     BookViewSet,
+    LoanHistoryViewSet,
     LoanViewSet,
     RegisterView,
     CustomTokenObtainPairView,
     borrow_book,
+    borrow_books,
     return_book,
+    return_books,
     admin_dashboard,
     create_user,
     create_loan,
+    create_loans,
     return_any_loan,
+    return_any_loans,
+    place_hold,
+    my_holds,
+    cancel_hold,
     delete_book,
+    export_data,
+    request_timings,
 )
 
 
@@ -21,6 +32,7 @@ from .views import (
 router = DefaultRouter()
 router.register(r"books", BookViewSet)
 router.register(r"loans", LoanViewSet)
+router.register(r"loan-history", LoanHistoryViewSet)
 
 urlpatterns = [
     path("", include(router.urls)),
@@ -29,9 +41,26 @@ urlpatterns = [
     path("refresh/", TokenRefreshView.as_view(), name="token_refresh"),  # Includes JWT authentication(Token refresh)
     path("borrow_book/<int:book_id>/", borrow_book, name="borrow_book"),
     path("return_book/<int:loan_id>/", return_book, name="return_book"),
+    path("borrow_books/", borrow_books, name="borrow_books"),  # Batch checkout at the desk
+    path("return_books/", return_books, name="return_books"),
+    path("place_hold/<int:book_id>/", place_hold, name="place_hold"),
+    path("my_holds/", my_holds, name="my_holds"),
+    path("cancel_hold/<int:hold_id>/", cancel_hold, name="cancel_hold"),
     path("admin-dashboard/", admin_dashboard, name="admin_dashboard"),
+    path("request-timings/", request_timings, name="request_timings"),
     path("create_user/", create_user, name="create_user"),
     path("create_loan/", create_loan, name="create_loan"),
     path("return_any_loan/<int:loan_id>/", return_any_loan, name="return_any_loan"),
+    path("create_loans/", create_loans, name="create_loans"),
+    path("return_any_loans/", return_any_loans, name="return_any_loans"),
     path("delete_book/<int:book_id>/", delete_book, name="delete_book"),
+    # Async read endpoints for the uvicorn (ASGI) deployment, same responses as the sync ones
+    path("async/books/", async_views.book_list, name="async_book_list"),
+    path("async/books/<int:pk>/", async_views.book_detail, name="async_book_detail"),
+    path("async/loans/", async_views.loan_list, name="async_loan_list"),
+    path("async/admin-dashboard/", async_views.admin_dashboard, name="async_admin_dashboard"),
+    path("async/inventory-feed/", async_views.inventory_feed, name="async_inventory_feed"),
+    re_path(
+        r"^export/(?P<dataset>books|loans|loan_history)\.(?P<fmt>ndjson|csv)$", export_data, name="export_data"
+    ),
 ]
@@ -1,16 +1,24 @@
 # library/views.py
-from .models import Loan, Book
+import os
+from .models import Loan, LoanArchive, Book, Hold
 from rest_framework import status, viewsets, permissions, generics, filters
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import action, api_view, permission_classes, renderer_classes
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAdminUser
 from rest_framework_simplejwt.views import TokenObtainPairView
 from django.contrib.auth.models import User
+from django.http import StreamingHttpResponse
 from django.utils.timezone import now
-from django.db import transaction
-from datetime import timedelta
+from . import exports, holds, inventory, metrics, routing, stats, suggest, timing
+from .caching import CatalogCacheMixin
+from .fastread import FastReadMixin
+from .routing import ReplicaReadsMixin
+from .filters import CatalogSearchFilter, LoanFilter, parse_bool_param
 from .serializers import (
     BookSerializer,
+    HoldSerializer,
+    LoanArchiveSerializer,
     LoanSerializer,
     UserSerializer,
     CustomTokenObtainPairSerializer,
@@ -18,10 +26,70 @@ from .serializers import (
 
 
 # Loan API (List and Manage Loans) - Requires Authentication
-class LoanViewSet(viewsets.ModelViewSet):
+# Regular users only see their own loans; admins see everyone's.
+# Lists and details are built from `.values()` rows (library/fastread.py).
+class LoanViewSet(FastReadMixin, viewsets.ModelViewSet):
     queryset = Loan.objects.all()
     serializer_class = LoanSerializer
     permission_classes = [permissions.IsAuthenticated]
+    filter_backends = [LoanFilter, filters.OrderingFilter]
+    ordering_fields = ["loan_date", "return_date", "id"]
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if not self.request.user.is_staff:
+            queryset = queryset.filter(user_id=self.request.user.id)
+        if self.action in ("list", "retrieve"):
+            # One joined query with only the columns LoanSerializer renders
+            queryset = queryset.select_related("user", "book").only(
+                "id",
+                "type",
+                "loan_date",
+                "return_date",
+                "returned",
+                "user",
+                "user__username",
+                "book",
+                "book__name",
+                "book__image_url",
+            )
+        return queryset
+
+    def perform_create(self, serializer):
+        # Staff record loans for any patron. Everyone else borrows for themselves, with the
+        # overdue and loan-limit admission of /borrow_book/ (library/summaries.py)
+        if self.request.user.is_staff:
+            serializer.save()
+        else:
+            serializer.save(user=self.request.user, check_overdue=True)
+
+
+# Archived loan history (read-only) - Requires Authentication
+# Returned loans moved out of the Loan table by `manage.py archive_loans`; same filters as /loans/.
+class LoanHistoryViewSet(FastReadMixin, viewsets.ReadOnlyModelViewSet):
+    queryset = LoanArchive.objects.all()
+    serializer_class = LoanArchiveSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    filter_backends = [LoanFilter, filters.OrderingFilter]
+    ordering_fields = ["loan_date", "return_date", "id"]
+
+    def get_queryset(self):
+        queryset = super().get_queryset().select_related("user", "book").only(
+            "id",
+            "type",
+            "loan_date",
+            "return_date",
+            "returned",
+            "overdue",
+            "archived_at",
+            "user",
+            "user__username",
+            "book",
+            "book__name",
+        )
+        if not self.request.user.is_staff:
+            queryset = queryset.filter(user_id=self.request.user.id)
+        return queryset
 
 
 # User Registration API
@@ -37,22 +105,74 @@ class CustomTokenObtainPairView(TokenObtainPairView):
 
 
 # Admin Dashboard API
+# Reads maintained counters (library/stats.py) instead of counting whole tables
 @api_view(["GET"])
 @permission_classes([IsAdminUser])
 def admin_dashboard(request):
-    users_count = User.objects.count()
-    books_count = Book.objects.count()
-    loans_count = Loan.objects.count()
+    counters = stats.read_counters()
+
+    return Response(
+        {
+            "users": counters[stats.USERS],
+            "books": counters[stats.BOOKS],
+            "loans": counters[stats.LOANS],
+            "active_loans": counters[stats.ACTIVE_LOANS],
+            "overdue_loans": stats.overdue_loans_count(),
+            "copies_in_stock": counters[stats.COPIES_IN_STOCK],
+        }
+    )
+
 
+# Per-route request timings from this worker's sampled requests (Admin Only)
+# ?order=p95 (default) or ?order=queries, ?limit=<n>; DELETE clears the aggregates
+@api_view(["GET", "DELETE"])
+@permission_classes([IsAdminUser])
+def request_timings(request):
+    if request.method == "DELETE":
+        timing.reset()
+        return Response(status=204)
+    order = request.query_params.get("order", "p95")
+    if order not in ("p95", "queries"):
+        return Response({"error": "order must be p95 or queries."}, status=400)
+    try:
+        limit = max(int(request.query_params.get("limit", 20)), 1)
+    except ValueError:
+        return Response({"error": "limit must be a number."}, status=400)
+    key = "p95_ms" if order == "p95" else "avg_queries"
+    routes = sorted(timing.route_summaries(), key=lambda row: row[key], reverse=True)
     return Response(
         {
-            "users": users_count,
-            "books": books_count,
-            "loans": loans_count,
+            "worker": os.getpid(),
+            "sample_rate": timing.sample_rate(),
+            "order": order,
+            "routes": routes[:limit],
         }
     )
 
 
+# Stream a full export for reporting (Admin Only): /export/<books|loans|loan_history>.<ndjson|csv>
+# Loans and loan history accept the LoanFilter parameters, e.g. ?loaned_after=2025-01-01
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+@renderer_classes([JSONRenderer, exports.PassthroughRenderer])
+def export_data(request, dataset, fmt):
+    if dataset == "loans":
+        queryset = LoanFilter().filter_queryset(request, Loan.objects.all(), None)
+        columns, rows = exports.loan_rows(queryset)
+    elif dataset == "loan_history":
+        queryset = LoanFilter().filter_queryset(request, LoanArchive.objects.all(), None)
+        columns, rows = exports.loan_history_rows(queryset)
+    else:
+        columns, rows = exports.book_rows()
+    # The body is streamed after this view returns, so the replica is chosen here
+    rows = rows.using(routing.read_database(request))
+    response = StreamingHttpResponse(
+        exports.STREAMERS[fmt](columns, rows), content_type=exports.CONTENT_TYPES[fmt]
+    )
+    response["Content-Disposition"] = f'attachment; filename="{dataset}-{now():%Y%m%d}.{fmt}"'
+    return response
+
+
 # Create a new user (Admin Only)
 @api_view(["POST"])
 @permission_classes([IsAdminUser])
@@ -70,31 +190,14 @@ def create_user(request):
 def create_loan(request):
     user_id = request.data.get("user_id")
     book_id = request.data.get("book_id")
-    loan_type = request.data.get("loan_type")
+    try:
+        loan_type = parse_loan_type(request)
+    except ValueError as exc:
+        return Response({"error": str(exc)}, status=400)
 
     try:
         user = User.objects.get(id=user_id)
-        book = Book.objects.get(id=book_id)
-
-        if book.inventory <= 0:
-            return Response({"error": "Book out of stock."}, status=400)
-
-        with transaction.atomic():
-            book.inventory -= 1
-            book.save()
-
-            loan_durations = {1: 10, 2: 5, 3: 2}
-            return_date = now().date() + timedelta(
-                days=loan_durations.get(loan_type, 10)
-            )
-
-            loan = Loan.objects.create(
-                user=user,
-                book=book,
-                type=loan_type,
-                return_date=return_date,
-                returned=False,
-            )
+        loan = inventory.borrow(user, book_id, loan_type)
 
         return Response(
             {"message": "Loan created successfully!", "loan_id": loan.id}, status=201
@@ -103,6 +206,8 @@ def create_loan(request):
         return Response({"error": "User not found."}, status=404)
     except Book.DoesNotExist:
         return Response({"error": "Book not found."}, status=404)
+    except inventory.OutOfStock:
+        return Response({"error": "Book out of stock."}, status=400)
 
 
 # Return any loan (Admin Only)
@@ -110,22 +215,16 @@ def create_loan(request):
 @permission_classes([IsAdminUser])
 def return_any_loan(request, loan_id):
     try:
-        loan = Loan.objects.select_related("book").get(id=loan_id)
-
-        if loan.returned:
-            return Response(
-                {"error": "This loan has already been returned."}, status=400
-            )
-
-        with transaction.atomic():
-            loan.returned = True
-            loan.save(update_fields=["returned"])
-            loan.book.inventory += 1
-            loan.book.save(update_fields=["inventory"])
+        loan = Loan.objects.get(id=loan_id)
+        # close_loan refuses loans that were already returned (AlreadyReturned below)
+        inventory.close_loan(loan)
 
         return Response({"message": "Loan marked as returned."}, status=200)
     except Loan.DoesNotExist:
+        metrics.return_failed("not_found")
         return Response({"error": "Loan not found."}, status=404)
+    except inventory.AlreadyReturned:
+        return Response({"error": "This loan has already been returned."}, status=400)
 
 
 # Delete a book (Admin Only)
@@ -141,93 +240,221 @@ def delete_book(request, book_id):
 
 
 # Book API (CRUD for books) - Only Admins can Modify
-class BookViewSet(viewsets.ModelViewSet):
+# List and detail responses are cached and revalidated with ETags (see library/caching.py),
+# read from the replica when one is configured (library/routing.py) and built from `.values()`
+# rows on a cache miss (library/fastread.py)
+class BookViewSet(ReplicaReadsMixin, CatalogCacheMixin, FastReadMixin, viewsets.ModelViewSet):
     queryset = Book.objects.all()
     serializer_class = BookSerializer
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
-    search_fields = ["name", "author", "year_published", "category"]
+    filter_backends = [CatalogSearchFilter, filters.OrderingFilter]
+    search_fields = ["name", "author", "year_published", "category"]  # Indexed by library/search.py
+    # Non-nullable columns only, so each one can serve as a keyset for pagination
+    ordering_fields = ["name", "author", "year_published", "category", "inventory", "id"]
 
     def get_permissions(self):
         if self.action in ["create", "update", "partial_update", "destroy"]:
             return [permissions.IsAdminUser()]
         return [permissions.AllowAny()]
 
+    # Type-ahead suggestions: /books/suggest/?q=<prefix>&limit=<n>
+    @action(detail=False, methods=["get"])
+    def suggest(self, request):
+        query = request.query_params.get("q", "")
+        try:
+            limit = min(int(request.query_params.get("limit", 10)), 25)
+        except ValueError:
+            return Response({"error": "limit must be a number."}, status=400)
+        return Response({"query": query, "results": suggest.suggest(query, max(limit, 1))})
+
 
 # Borrow a book (Regular Users)
 @api_view(["POST"])
 def borrow_book(request, book_id):
     try:
-        book = Book.objects.get(id=book_id)
-        overdue_loans = Loan.objects.filter(
-            user=request.user, returned=False, return_date__lt=now().date()
-        )
-        if overdue_loans.exists():
-            return Response(
-                {"error": "You have overdue books. Return them before borrowing more."},
-                status=400,
-            )
-
-        if book.inventory <= 0:
-            return Response({"error": "This book is out of stock."}, status=400)
-
-        with transaction.atomic():
-            book.inventory -= 1
-            book.save()
-
-            loan = Loan.objects.create(
-                user=request.user,
-                book=book,
-                type=1,  # Default loan type
-                return_date=now().date() + timedelta(days=10),
-                returned=False,
-            )
+        loan = inventory.borrow(request.user, book_id, check_overdue=True)
 
         return Response(
             {"message": "Book borrowed successfully!", "loan_id": loan.id}, status=201
         )
     except Book.DoesNotExist:
         return Response({"error": "Book not found."}, status=404)
+    except inventory.OverdueLoans:
+        return Response(
+            {"error": "You have overdue books. Return them before borrowing more."},
+            status=400,
+        )
+    except inventory.OutOfStock:
+        return Response({"error": "This book is out of stock."}, status=400)
+    except inventory.LoanLimitReached as exc:
+        return Response({"error": str(exc)}, status=400)
 
 
 # Return a book (Regular Users)
 @api_view(["POST"])
 def return_book(request, loan_id):
     try:
-        loan = Loan.objects.select_related("book").get(id=loan_id, user=request.user)
-
-        if loan.returned:
-            return Response(
-                {"error": "This loan has already been returned."}, status=400
-            )
-
-        with transaction.atomic():
-            loan.returned = True
-            loan.save(update_fields=["returned"])
-            loan.book.inventory += 1
-            loan.book.save(update_fields=["inventory"])
+        loan = Loan.objects.get(id=loan_id, user=request.user)
+        # close_loan refuses loans that were already returned (AlreadyReturned below)
+        inventory.close_loan(loan)
 
         return Response({"message": "Book returned successfully!"}, status=200)
     except Loan.DoesNotExist:
+        metrics.return_failed("not_found")
         return Response({"error": "Loan not found."}, status=404)
+    except inventory.AlreadyReturned:
+        return Response({"error": "This loan has already been returned."}, status=400)
 
 
 # Return a loan (Regular Users)
 @api_view(["POST"])
 def return_loan(request, loan_id):
     try:
-        loan = Loan.objects.select_related("book").get(id=loan_id, user=request.user)
-
-        if loan.returned:
-            return Response(
-                {"error": "This loan has already been returned."}, status=400
-            )
-
-        with transaction.atomic():
-            loan.returned = True
-            loan.save(update_fields=["returned"])
-            loan.book.inventory += 1
-            loan.book.save(update_fields=["inventory"])
+        loan = Loan.objects.get(id=loan_id, user=request.user)
+        # close_loan refuses loans that were already returned (AlreadyReturned below)
+        inventory.close_loan(loan)
 
         return Response({"message": "Loan returned successfully!"}, status=200)
     except Loan.DoesNotExist:
+        metrics.return_failed("not_found")
         return Response({"error": "Loan not found."}, status=404)
+    except inventory.AlreadyReturned:
+        return Response({"error": "This loan has already been returned."}, status=400)
+
+
+# Place a hold on an out-of-stock book (Regular Users)
+# Returned copies go to the oldest hold first; poll /my_holds/ instead of the catalog
+@api_view(["POST"])
+@permission_classes([permissions.IsAuthenticated])
+def place_hold(request, book_id):
+    try:
+        hold = inventory.place_hold(request.user, book_id)
+    except Book.DoesNotExist:
+        return Response({"error": "Book not found."}, status=404)
+    except (inventory.InStock, inventory.AlreadyHeld) as exc:
+        return Response({"error": str(exc)}, status=400)
+    position = holds.open_holds(request.user.id).get(pk=hold.pk).position
+    return Response(
+        {"message": "Hold placed.", "hold_id": hold.id, "position": position}, status=201
+    )
+
+
+# List the caller's waiting and ready holds (Regular Users)
+@api_view(["GET"])
+@permission_classes([permissions.IsAuthenticated])
+def my_holds(request):
+    return Response(HoldSerializer(holds.open_holds(request.user.id), many=True).data)
+
+
+# Cancel one of the caller's holds (Regular Users)
+@api_view(["POST"])
+@permission_classes([permissions.IsAuthenticated])
+def cancel_hold(request, hold_id):
+    try:
+        inventory.cancel_hold(hold_id, user=request.user)
+    except Hold.DoesNotExist:
+        return Response({"error": "Hold not found."}, status=404)
+    except inventory.HoldClosed as exc:
+        return Response({"error": str(exc)}, status=400)
+    return Response({"message": "Hold cancelled."}, status=200)
+
+
+# Reads the batch payload: a list of ids under `key` plus the `atomic` flag (default true)
+def parse_batch(request, key):
+    ids = request.data.get(key)
+    if not isinstance(ids, list) or not ids:
+        raise ValueError(f"{key} must be a non-empty list of ids.")
+    if len(ids) > inventory.MAX_BATCH_SIZE:
+        raise ValueError(f"At most {inventory.MAX_BATCH_SIZE} items per request.")
+    try:
+        ids = [int(item) for item in ids]
+    except (TypeError, ValueError):
+        raise ValueError(f"{key} must be a list of ids.")
+    atomic = request.data.get("atomic", True)
+    if not isinstance(atomic, bool):
+        atomic = parse_bool_param(str(atomic))
+    return ids, atomic
+
+
+def parse_loan_type(request):
+    loan_type = request.data.get("loan_type", 1)
+    try:
+        if isinstance(loan_type, bool):
+            raise TypeError
+        loan_type = int(loan_type)
+    except (TypeError, ValueError):
+        loan_type = None
+    choices = dict(Loan.LOAN_CHOICES)
+    if loan_type not in choices:
+        raise ValueError(f"loan_type must be one of {', '.join(map(str, choices))}.")
+    return loan_type
+
+
+def batch_response(results, success_status):
+    status_code = success_status if any("error" not in r for r in results) else 400
+    return Response({"results": results}, status=status_code)
+
+
+def borrow_batch(request, user, check_overdue):
+    try:
+        book_ids, atomic = parse_batch(request, "book_ids")
+        loan_type = parse_loan_type(request)
+    except ValueError as exc:
+        return Response({"error": str(exc)}, status=400)
+    try:
+        results = inventory.borrow_many(
+            user, book_ids, loan_type, check_overdue=check_overdue, atomic=atomic
+        )
+    except inventory.OverdueLoans:
+        return Response(
+            {"error": "You have overdue books. Return them before borrowing more."},
+            status=400,
+        )
+    except inventory.BatchFailed as exc:
+        return Response({"error": str(exc), "results": exc.results}, status=400)
+    except inventory.LoanLimitReached as exc:
+        return Response({"error": str(exc)}, status=400)
+    return batch_response(results, 201)
+
+
+def return_batch(request, user):
+    try:
+        loan_ids, atomic = parse_batch(request, "loan_ids")
+    except ValueError as exc:
+        return Response({"error": str(exc)}, status=400)
+    try:
+        results = inventory.return_many(loan_ids, user=user, atomic=atomic)
+    except inventory.BatchFailed as exc:
+        return Response({"error": str(exc), "results": exc.results}, status=400)
+    return batch_response(results, 200)
+
+
+# Borrow several books at once (Regular Users): {"book_ids": [...], "atomic": true}
+@api_view(["POST"])
+@permission_classes([permissions.IsAuthenticated])
+def borrow_books(request):
+    return borrow_batch(request, request.user, check_overdue=True)
+
+
+# Return several of your loans at once (Regular Users): {"loan_ids": [...], "atomic": true}
+@api_view(["POST"])
+@permission_classes([permissions.IsAuthenticated])
+def return_books(request):
+    return return_batch(request, request.user)
+
+
+# Create several loans for one user (Admin Only): {"user_id": 1, "book_ids": [...], "loan_type": 1}
+@api_view(["POST"])
+@permission_classes([IsAdminUser])
+def create_loans(request):
+    try:
+        user = User.objects.get(id=request.data.get("user_id"))
+    except (User.DoesNotExist, ValueError, TypeError):
+        return Response({"error": "User not found."}, status=404)
+    return borrow_batch(request, user, check_overdue=False)
+
+
+# Return any loans (Admin Only): {"loan_ids": [...], "atomic": true}
+@api_view(["POST"])
+@permission_classes([IsAdminUser])
+def return_any_loans(request):
+    return return_batch(request, None)
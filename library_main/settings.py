@@ -1,6 +1,7 @@
 # library_main/settings.py
 import dj_database_url
 import os
+import sys
 import mimetypes
 from pathlib import Path
 from datetime import timedelta
@@ -16,6 +17,9 @@ load_dotenv()
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Running `manage.py test`
+TESTING = sys.argv[1:2] == ["test"]
+
 # Quick-start development settings - unsuitable for production
 SECRET_KEY = os.getenv("SECRET_KEY")
 DEBUG = False
@@ -41,6 +45,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Outermost, so its Server-Timing total covers every other middleware (library/timing.py)
+    "library.timing.ServerTimingMiddleware",
+    "library.metrics.MetricsMiddleware",  # Prometheus request metrics (library/metrics.py)
+    "library.routing.ReadYourWritesMiddleware",  # Primary-only reads after a write
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
@@ -78,6 +86,34 @@ TEMPLATES = [
 
 WSGI_APPLICATION = "library_main.wsgi.application"
 
+# Database connections. Without DB_POOL each thread keeps its connection for DB_CONN_MAX_AGE
+# seconds. DB_POOL=true (PostgreSQL) hands connections back to a per-process pool at the end
+# of every request instead (library/pool.py): at most DB_POOL_MAX_SIZE per worker, shared by
+# its threads, with idle and lifetime limits. DB_CONN_HEALTH_CHECKS tests a reused connection
+# with `SELECT 1` before the request gets it. Behind PgBouncer in transaction mode also set
+# DB_PGBOUNCER=true: session state does not survive a transaction there, so server-side
+# cursors (exports) are turned off.
+DB_POOL = os.getenv("DB_POOL", "false").lower() == "true"
+DB_CONNECTION_OPTIONS = {
+    "conn_max_age": 0 if DB_POOL else int(os.getenv("DB_CONN_MAX_AGE", 600)),
+    "conn_health_checks": os.getenv("DB_CONN_HEALTH_CHECKS", "true").lower() == "true",
+    "disable_server_side_cursors": os.getenv("DB_PGBOUNCER", "false").lower() == "true",
+}
+
+
+def pooled(database):
+    if DB_POOL and database.get("ENGINE") == "django.db.backends.postgresql":
+        database["ENGINE"] = "library.pooled_postgresql"
+        database["POOL"] = {
+            "min_size": int(os.getenv("DB_POOL_MIN_SIZE", 0)),
+            "max_size": int(os.getenv("DB_POOL_MAX_SIZE", 10)),
+            "timeout": float(os.getenv("DB_POOL_TIMEOUT", 10)),  # Seconds to wait for a connection
+            "max_lifetime": float(os.getenv("DB_POOL_MAX_LIFETIME", 1800)),
+            "max_idle": float(os.getenv("DB_POOL_MAX_IDLE", 300)),
+        }
+    return database
+
+
 DATABASES = {
     # # Django SQLite3 default DB
     # "default": {
@@ -86,21 +122,100 @@ DATABASES = {
     # }
 
     # Setting a external server using .env
-    "default": {
+    "default": pooled({
         **dj_database_url.config(
           default=os.getenv("DATABASE_URL"), # Render provides this in the environment variables
-          conn_max_age=600, # Keeps connections alive longer
+          # Keeps connections alive longer. Set DB_CONN_MAX_AGE=0 (or use DB_POOL) under ASGI
+          # (build_asgi.sh), where requests do not reuse a thread and connections would pile up.
+          **DB_CONNECTION_OPTIONS,
      ),
+    })
+}
+
+# Optional read replica for catalog reads and exports; writes and transactions stay on "default".
+# Users are pinned to the primary for a few seconds after each write they make (library/routing.py).
+LIBRARY_READ_REPLICAS = []
+if os.getenv("DATABASE_REPLICA_URL"):
+    DATABASES["replica"] = pooled({
+        **dj_database_url.parse(os.getenv("DATABASE_REPLICA_URL"), **DB_CONNECTION_OPTIONS),
+        "TEST": {"MIRROR": "default"},  # Tests read the replica through the test primary
+    })
+    LIBRARY_READ_REPLICAS.append("replica")
+if TESTING:
+    # A separate, lagging stand-in replica for ReplicaRoutingTestCase. Only the tests that list
+    # it in `databases` create it, and nothing reads from it unless LIBRARY_READ_REPLICAS says so
+    DATABASES["test_replica"] = {"ENGINE": "django.db.backends.sqlite3", "NAME": ":memory:"}
+DATABASE_ROUTERS = ["library.routing.PrimaryReplicaRouter"]
+LIBRARY_REPLICA_STICKY_SECONDS = int(os.getenv("LIBRARY_REPLICA_STICKY_SECONDS", 5))
+
+# Cache for catalog responses (library/caching.py). The local-memory default is per process;
+# point CACHE_BACKEND/CACHE_LOCATION at Redis or Memcached when running several workers.
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv("CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.getenv("CACHE_LOCATION", "library"),
     }
 }
+# On by default only with a shared backend: with LocMemCache a write bumps the catalog version
+# in its own worker, and every other worker keeps serving the old stock until the timeout
+SHARED_CACHE = CACHES["default"]["BACKEND"] != "django.core.cache.backends.locmem.LocMemCache"
+LIBRARY_CATALOG_CACHE = os.getenv("LIBRARY_CATALOG_CACHE", str(SHARED_CACHE)).lower() == "true"
+LIBRARY_CATALOG_CACHE_TIMEOUT = int(os.getenv("LIBRARY_CATALOG_CACHE_TIMEOUT", 300))
+
+# Book and loan lists/details straight from `.values()` rows, rendered with orjson when it is
+# installed (library/fastread.py); same JSON as the serializers
+LIBRARY_FAST_READS = os.getenv("LIBRARY_FAST_READS", "true").lower() == "true"
+
+# Most loans a patron may hold at once when borrowing (0 = unlimited); see library/summaries.py
+LIBRARY_MAX_ACTIVE_LOANS = int(os.getenv("LIBRARY_MAX_ACTIVE_LOANS", 20))
+
+# Days a returned copy waits for the patron whose hold it was given to (library/holds.py)
+LIBRARY_HOLD_PICKUP_DAYS = int(os.getenv("LIBRARY_HOLD_PICKUP_DAYS", 3))
+
+# Returned loans older than this (by loan date) move to the archive (`manage.py archive_loans`)
+LIBRARY_ARCHIVE_AFTER_DAYS = int(os.getenv("LIBRARY_ARCHIVE_AFTER_DAYS", 365))
+
+# Live inventory deltas for /async/inventory-feed/ (library/feed.py): "local" (one worker),
+# "postgres" (LISTEN/NOTIFY, every worker and server) or "off"
+LIBRARY_INVENTORY_FEED = os.getenv("LIBRARY_INVENTORY_FEED", "local")
+
+# Bearer token Prometheus must send to scrape /metrics (empty = open, e.g. behind a private network)
+LIBRARY_METRICS_TOKEN = os.getenv("LIBRARY_METRICS_TOKEN", "")
+
+# Share of requests measured by library/timing.py (Server-Timing header, log line, aggregates);
+# none under `manage.py test`, whose timing tests set the rate they need
+LIBRARY_TIMING_SAMPLE_RATE = float(
+    os.getenv("LIBRARY_TIMING_SAMPLE_RATE", 0.0 if TESTING else 0.1)
+)
+
+# One JSON line per sampled request on stdout; LIBRARY_TIMING_LOG_LEVEL=WARNING silences them
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {"console": {"class": "logging.StreamHandler"}},
+    "loggers": {
+        "library.timing": {
+            "handlers": ["console"],
+            "level": os.getenv("LIBRARY_TIMING_LOG_LEVEL", "INFO"),
+            "propagate": False,
+        },
+    },
+}
+
+# Seconds a worker trusts its cached is_active/is_staff flags for JWT users
+LIBRARY_AUTH_CACHE_TTL = int(os.getenv("LIBRARY_AUTH_CACHE_TTL", 60))
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        # JWTAuthentication without a user query per request (library/authentication.py)
+        "library.authentication.ClaimsJWTAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.AllowAny",
     ],
+    # Keyset pagination: constant cost per page, no COUNT(*) or OFFSET scans
+    "DEFAULT_PAGINATION_CLASS": "library.pagination.KeysetPagination",
+    "PAGE_SIZE": 50,
 }
 
 # JWT Settings
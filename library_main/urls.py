@@ -1,9 +1,11 @@
 # library_main/urls.py
 from django.contrib import admin
 from django.urls import path, include
+from library.metrics import metrics_view
 
 # Includes Django admin and library API endpoints
 urlpatterns = [
     path("admin/", admin.site.urls), # Django Admin access
     path("api/library/", include("library.urls")), # Your Django API endpoints
+    path("metrics", metrics_view, name="metrics"), # Prometheus scrape endpoint
 ]